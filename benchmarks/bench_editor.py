@@ -0,0 +1,99 @@
+"""Measure opening and saving large files in the editor.
+
+A Python Script project is made with one large program, then we time
+Editor.add_tab opening it in a new editor, and Editor.save_all saving it
+after an edit, up to the file being on disk.
+
+Usage::
+
+    python benchmarks/bench_editor.py [--lines N] [--runs N]
+
+Results are printed as JSON.
+
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+from harness import summarize, timed, get_app
+from puppy.projects import PythonScript
+
+
+PY_FILE = 'big.py'
+
+FUNCTION = '''
+def function_{i}(a, b):
+    """Add {i} to a and b."""
+    total = a + b + {i}
+    return total
+'''
+
+
+def make_source(lines):
+    """Make a Python program of about the given number of lines."""
+    per_function = FUNCTION.count('\n')
+    return ''.join(
+        FUNCTION.format(i=i) for i in range(lines // per_function)
+    )
+
+
+def sample(root):
+    """Open and save the program once, returning the two timings."""
+    from puppy.ui.editor import Editor
+    app = get_app()
+    project = PythonScript(root, {'py_file': PY_FILE})
+    editor = Editor(project)
+
+    open_seconds, _ = timed(editor.add_tab, PY_FILE)
+    pane = editor.tabs.widget(0)
+    pane.append('\n# An edit\n')
+
+    def save():
+        editor.save_all()
+        editor.saver.wait()
+
+    save_seconds, _ = timed(save)
+    editor.saver.close()
+    editor.indexer.close()
+    editor.deleteLater()
+    app.processEvents()
+    return open_seconds, save_seconds
+
+
+def run(lines=50000, runs=3):
+    """Run the benchmark, returning the results as a dict."""
+    get_app()
+    source = make_source(lines)
+    open_times = []
+    save_times = []
+    with tempfile.TemporaryDirectory() as root:
+        for _ in range(runs):
+            with open(os.path.join(root, PY_FILE), 'w', encoding='utf8') as f:
+                f.write(source)
+            open_seconds, save_seconds = sample(root)
+            open_times.append(open_seconds)
+            save_times.append(save_seconds)
+
+    return {
+        'benchmark': 'editor',
+        'lines': source.count('\n'),
+        'bytes': len(source.encode('utf8')),
+        'runs': runs,
+        'add_tab_seconds': summarize(open_times),
+        'save_all_seconds': summarize(save_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--lines', type=int, default=50000)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    json.dump(run(args.lines, args.runs), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
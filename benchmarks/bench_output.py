@@ -0,0 +1,95 @@
+"""Measure how fast the output pane shows a program's output.
+
+A chatty subprocess printing many lines is run in an OutputPane, and timed
+from starting it to the last line being shown. The pane's own buffering is
+also timed without a subprocess, by writing the same output straight to it.
+
+Usage::
+
+    python benchmarks/bench_output.py [--lines N] [--runs N]
+
+Results are printed as JSON.
+
+"""
+import sys
+import json
+import argparse
+
+from harness import summarize, timed, get_app, wait_for
+
+
+CHATTY = '''
+import sys
+for i in range({lines}):
+    print("line", i, "x" * 60)
+'''
+
+# The size of the chunks written when bypassing the subprocess
+WRITE_SIZE = 4096
+
+
+def run_subprocess(lines):
+    """Run a chatty program in a new pane, returning the time it took."""
+    from puppy.ui.outputpane import OutputPane
+    pane = OutputPane()
+    results = []
+    pane.runs.finished.connect(results.append)
+    seconds, _ = timed(lambda: (
+        pane.run(sys.executable, '-c', CHATTY.format(lines=lines)),
+        wait_for(lambda: results)
+    ))
+    pane.deleteLater()
+    return seconds
+
+
+def run_direct(lines):
+    """Write output straight to a new pane, returning the time it took."""
+    from puppy.ui.outputpane import OutputPane
+    pane = OutputPane()
+    text = ''.join('line {} {}\n'.format(i, 'x' * 60) for i in range(lines))
+    chunks = [
+        text[i:i + WRITE_SIZE] for i in range(0, len(text), WRITE_SIZE)
+    ]
+
+    def write_all():
+        for chunk in chunks:
+            pane.write(chunk)
+        while pane.buffer:
+            pane.flush()
+
+    seconds, _ = timed(write_all)
+    pane.deleteLater()
+    return seconds
+
+
+def run(lines=200000, runs=3):
+    """Run the benchmark, returning the results as a dict."""
+    app = get_app()
+    subprocess_times = []
+    direct_times = []
+    for _ in range(runs):
+        subprocess_times.append(run_subprocess(lines))
+        direct_times.append(run_direct(lines))
+        app.processEvents()
+
+    return {
+        'benchmark': 'output',
+        'lines': lines,
+        'runs': runs,
+        'subprocess_seconds': summarize(subprocess_times),
+        'direct_seconds': summarize(direct_times),
+        'lines_per_second': lines / summarize(subprocess_times)['median'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    json.dump(run(args.lines, args.runs), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Measure how ProjectManager copes with a very large projects directory.
+
+A directory of synthetic projects is made, then we time building the
+project index from scratch, loading it again, listing the projects,
+refreshing the index and looking up projects by name.
+
+Usage::
+
+    python benchmarks/bench_projects.py [--projects N] [--runs N]
+
+Results are printed as JSON.
+
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+
+from harness import summarize, timed
+from puppy.project_manager import ProjectManager
+from puppy.project_index import INI_FILENAME, INDEX_DIR
+
+
+INI_TEMPLATE = '''[puppy]
+template = Python Script
+
+[metadata]
+py_file = {name}.py
+'''
+
+
+def make_projects(root, count):
+    """Make count projects in root, returning their names."""
+    names = ['project-{:05d}'.format(i) for i in range(count)]
+    for name in names:
+        os.mkdir(os.path.join(root, name))
+        path = os.path.join(root, name, INI_FILENAME)
+        with open(path, 'w', encoding='utf8') as f:
+            f.write(INI_TEMPLATE.format(name=name))
+    return names
+
+
+def remove_index(root):
+    index_dir = os.path.join(root, INDEX_DIR)
+    for name in os.listdir(index_dir):
+        os.unlink(os.path.join(index_dir, name))
+
+
+def run(projects=10000, lookups=1000, runs=3):
+    """Run the benchmark, returning the results as a dict."""
+    cold, warm, listing, refresh, lookup = [], [], [], [], []
+    with tempfile.TemporaryDirectory() as root:
+        names = make_projects(root, projects)
+        sample = random.Random(0).sample(names, min(lookups, len(names)))
+        for _ in range(runs):
+            if os.path.exists(os.path.join(root, INDEX_DIR)):
+                remove_index(root)
+            seconds, _ = timed(lambda: list(ProjectManager(root)))
+            cold.append(seconds)
+
+            seconds, pm = timed(ProjectManager, root)
+            warm.append(seconds)
+            seconds, _ = timed(list, pm)
+            listing.append(seconds)
+            seconds, _ = timed(pm.refresh)
+            refresh.append(seconds)
+            seconds, _ = timed(lambda: [pm[name] for name in sample])
+            lookup.append(seconds / len(sample))
+
+    return {
+        'benchmark': 'projects',
+        'projects': projects,
+        'runs': runs,
+        'cold_index_seconds': summarize(cold),
+        'warm_load_seconds': summarize(warm),
+        'list_seconds': summarize(listing),
+        'refresh_seconds': summarize(refresh),
+        'lookup_seconds': summarize(lookup),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--projects', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    json.dump(run(args.projects, runs=args.runs), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Measure how fast the REPL pane shows what a micro:bit sends.
+
+Serial data is fed to REPLPane.process_bytes in chunks, as it would arrive
+from the port. By default a synthetic trace of a REPL session is used: typed
+commands echoed a character at a time, edits with backspace and cursor
+movement, program output including non-ASCII text, and tracebacks. A trace
+recorded from a real micro:bit can be given instead.
+
+The VT100 parser is also timed on its own, to separate parsing from
+updating the widget.
+
+Usage::
+
+    python benchmarks/bench_repl.py [--trace FILE] [--chunk N] [--runs N]
+
+Results are printed as JSON.
+
+"""
+import sys
+import json
+import argparse
+
+from harness import summarize, timed, get_app
+
+
+# The size of the reads from the serial port
+DEFAULT_CHUNK = 64
+
+
+def synthetic_trace(commands=2000):
+    """Make a trace of a REPL session, as bytes."""
+    out = bytearray()
+    for i in range(commands):
+        out += b'>>> '
+        command = 'print("line", {}, "café → ok")'.format(i)
+        # The REPL echoes each character as it is typed
+        for ch in command.encode('utf8'):
+            out.append(ch)
+        if i % 10 == 0:
+            # A typo, corrected with backspace
+            out += b'x\x08\x1b[K'
+        if i % 25 == 0:
+            # Moving back along the line to fix something
+            out += b'\x1b[5D\x1b[5C'
+        out += b'\r\n'
+        out += 'line {} café → ok\r\n'.format(i).encode('utf8')
+        if i % 50 == 0:
+            out += (
+                b'Traceback (most recent call last):\r\n'
+                b'  File "<stdin>", line 1, in <module>\r\n'
+                b"NameError: name 'x' isn't defined\r\n"
+            )
+    out += b'>>> '
+    return bytes(out)
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def run(trace=None, chunk=DEFAULT_CHUNK, runs=5):
+    """Run the benchmark, returning the results as a dict."""
+    app = get_app()
+    from puppy.ui.replpane import REPLPane
+    from puppy.ui.vt100 import VT100Parser
+
+    data = trace or synthetic_trace()
+    pieces = split(data, chunk)
+
+    parse_times = []
+    pane_times = []
+    for _ in range(runs):
+        parser = VT100Parser()
+        seconds, _ = timed(lambda: [parser.feed(p) for p in pieces])
+        parse_times.append(seconds)
+
+        # There is no such port, so the pane only displays what we feed it
+        pane = REPLPane('puppy-benchmark')
+        seconds, _ = timed(lambda: [pane.process_bytes(p) for p in pieces])
+        pane_times.append(seconds)
+        pane.kill()
+        pane.deleteLater()
+        app.processEvents()
+
+    median = summarize(pane_times)['median']
+    return {
+        'benchmark': 'repl',
+        'bytes': len(data),
+        'chunks': len(pieces),
+        'runs': runs,
+        'parse_seconds': summarize(parse_times),
+        'process_bytes_seconds': summarize(pane_times),
+        'bytes_per_second': len(data) / median,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--trace', help="A file of recorded serial data")
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    trace = None
+    if args.trace:
+        with open(args.trace, 'rb') as f:
+            trace = f.read()
+    json.dump(run(trace, args.chunk, args.runs), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Measure how long Puppy takes to start.
+
+Each sample runs Puppy in a fresh interpreter, with Qt's offscreen platform
+and an empty home directory, and times it from the start of importing
+puppy.__main__ to the main window being shown and the event loop starting.
+
+Usage::
+
+    python benchmarks/bench_startup.py [--runs N]
+
+Results are printed as JSON.
+
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from harness import REPO_ROOT, summarize
+
+
+# Run in the child interpreter: start Puppy, but replace QApplication with a
+# subclass whose event loop records the time and quits straight away.
+CHILD = r'''
+import sys
+import time
+import json
+t0 = time.perf_counter()
+
+import puppy.__main__ as puppy_main
+t_import = time.perf_counter()
+
+class BenchApplication(puppy_main.QApplication):
+    def exec_(self):
+        self.processEvents()
+        t_shown = time.perf_counter()
+        print(json.dumps({
+            'import': t_import - t0,
+            'shown': t_shown - t0,
+            'modules': sorted(m for m in sys.modules if m.startswith('PyQt5')),
+        }))
+        return 0
+
+puppy_main.QApplication = BenchApplication
+try:
+    puppy_main.main()
+except SystemExit:
+    pass
+'''
+
+
+def sample():
+    """Start Puppy once, returning the timings it reports."""
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ)
+        env.update({
+            'QT_QPA_PLATFORM': 'offscreen',
+            'HOME': home,
+            'PYTHONPATH': REPO_ROOT,
+        })
+        out = subprocess.check_output(
+            [sys.executable, '-c', CHILD],
+            env=env,
+            cwd=REPO_ROOT,
+        )
+    return json.loads(out.decode('utf8').strip().splitlines()[-1])
+
+
+def run(runs=5):
+    """Run the benchmark, returning the results as a dict."""
+    samples = [sample() for _ in range(runs)]
+    return {
+        'benchmark': 'startup',
+        'runs': runs,
+        'import_seconds': summarize([s['import'] for s in samples]),
+        'shown_seconds': summarize([s['shown'] for s in samples]),
+        'qt_modules_loaded': samples[-1]['modules'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    json.dump(run(args.runs), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
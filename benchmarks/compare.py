@@ -0,0 +1,72 @@
+"""Compare two sets of benchmark results from run_benchmarks.py.
+
+For each timing in both sets, the median of the new results is shown
+relative to the old. The exit status is 1 if anything got slower by more
+than the threshold, so this can be used to catch regressions in CI.
+
+Usage::
+
+    python benchmarks/compare.py OLD.json NEW.json [--threshold 0.1]
+
+"""
+import sys
+import json
+import argparse
+
+
+def timings(report):
+    """Get the median of each timing in a report, keyed by name."""
+    found = {}
+    for bench, results in report['results'].items():
+        for key, value in results.items():
+            if key.endswith('_seconds') and isinstance(value, dict):
+                found[bench + '.' + key] = value['median']
+    return found
+
+
+def compare(old, new, threshold):
+    """Print a comparison, returning the names of any regressions."""
+    old_times = timings(old)
+    new_times = timings(new)
+    print("{:<40} {:>12} {:>12} {:>8}".format(
+        'timing', 'old', 'new', 'change'
+    ))
+    regressions = []
+    for name in sorted(old_times.keys() & new_times.keys()):
+        before = old_times[name]
+        after = new_times[name]
+        change = (after - before) / before if before else 0
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print("{:<40} {:>12.6f} {:>12.6f} {:>+7.1%}{}".format(
+            name, before, after, change, flag
+        ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help="The fractional slowdown counted as a regression"
+    )
+    args = parser.parse_args()
+    with open(args.old, encoding='utf8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf8') as f:
+        new = json.load(f)
+    if old.get('quick') != new.get('quick'):
+        print("Warning: comparing quick results with full ones",
+              file=sys.stderr)
+    if compare(old, new, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Helpers shared by the benchmarks.
+
+The benchmarks that need Qt run it with the offscreen platform, so they work
+without a display, e.g. on a CI server.
+
+"""
+import os
+import sys
+import time
+import statistics
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+_app = None
+
+
+def summarize(values):
+    return {
+        'min': min(values),
+        'median': statistics.median(values),
+        'max': max(values),
+    }
+
+
+def timed(func, *args, **kwargs):
+    """Call func, returning the time it took in seconds and its result."""
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - t0, result
+
+
+def get_app():
+    """Get a QApplication using the offscreen platform."""
+    global _app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    _app = QApplication.instance() or QApplication([])
+    return _app
+
+
+def wait_for(predicate, timeout=60):
+    """Run the event loop until predicate() is true.
+
+    Raise RuntimeError if it is still false after timeout seconds.
+
+    """
+    from PyQt5.QtCore import QEventLoop
+    app = get_app()
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise RuntimeError("Timed out waiting for the benchmark")
+        app.processEvents(QEventLoop.AllEvents, 50)
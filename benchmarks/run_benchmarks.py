@@ -0,0 +1,98 @@
+"""Run all of Puppy's benchmarks, writing the results as JSON.
+
+The results record the git commit and Python version they were made with,
+so that results from two versions can be compared with compare.py.
+
+Usage::
+
+    python benchmarks/run_benchmarks.py [-o FILE] [--quick] [NAME ...]
+
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+
+from harness import REPO_ROOT
+
+import bench_startup
+import bench_repl
+import bench_output
+import bench_projects
+import bench_editor
+
+
+BENCHMARKS = {
+    'startup': bench_startup.run,
+    'repl': bench_repl.run,
+    'output': bench_output.run,
+    'projects': bench_projects.run,
+    'editor': bench_editor.run,
+}
+
+# Smaller workloads, for a quick check
+QUICK = {
+    'startup': dict(runs=2),
+    'repl': dict(runs=2),
+    'output': dict(lines=20000, runs=2),
+    'projects': dict(projects=1000, runs=2),
+    'editor': dict(lines=5000, runs=2),
+}
+
+
+def git_commit():
+    try:
+        out = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode('ascii').strip()
+
+
+def run(names, quick=False):
+    results = {}
+    for name in names:
+        print("Running", name, file=sys.stderr)
+        kwargs = QUICK[name] if quick else {}
+        results[name] = BENCHMARKS[name](**kwargs)
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'quick': quick,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        'names', nargs='*',
+        help="The benchmarks to run: {} (default: all)".format(
+            ', '.join(BENCHMARKS)
+        )
+    )
+    parser.add_argument('-o', '--output', help="Write results to this file")
+    parser.add_argument(
+        '--quick', action='store_true', help="Use smaller workloads"
+    )
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmark: " + ', '.join(sorted(unknown)))
+    report = run(args.names or list(BENCHMARKS), args.quick)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,8 @@ from PyQt5.QtWidgets import (
 from .resources import load_icon, load_pixmap, load_stylesheet
 from .project_manager import ProjectManager
 from .ui.projectmanagerpane import ProjectManagerPane
+from .workspace import Workspace
+from . import instrument
 
 # We should probably create a default directory within this directory.
 ROOT = os.path.expanduser('~/puppy-projects/')
@@ -43,8 +45,9 @@ class Puppy(QStackedWidget):
         # Ensure we have a minimal sensible size for the application.
         self.setMinimumSize(800, 600)
         self.project_manager = ProjectManager(ROOT)
-        self.open_projects = {}
-        self.addWidget(ProjectManagerPane(self, self.project_manager))
+        self.manager_pane = ProjectManagerPane(self, self.project_manager)
+        self.addWidget(self.manager_pane)
+        self.workspace = Workspace(self)
 
     def update_title(self, project=None):
         title = "Puppy IDE"
@@ -52,24 +55,17 @@ class Puppy(QStackedWidget):
             title += ' - ' + project.root
         self.setWindowTitle(title)
 
+    @instrument.timed('Puppy.add_project')
     def add_project(self, project):
         """Add a project to the UI and show it."""
-        if project.name in self.open_projects:
-            return
-
-        ui = project.build_ui(self)
-        self.open_projects[project.name] = ui
-
-        self.addWidget(ui)
-        self.setCurrentWidget(ui)
-        self.update_title(project)
+        self.workspace.open(project)
 
     def close_project(self, project):
-        if project.name not in self.open_projects:
-            return
-        ui = self.open_projects.pop(project.name)
-        self.removeWidget(ui)
-        self.update_title()
+        self.workspace.close(project)
+
+    def show_project_manager(self):
+        """Go back to the list of projects, leaving open projects open."""
+        self.setCurrentWidget(self.manager_pane)
 
     def autosize_window(self):
         screen = QDesktopWidget().screenGeometry()
@@ -98,6 +94,10 @@ def main():
     # Make the editor with the Puppy class defined above.
     the_editor = Puppy()
 
+    if instrument.enabled:
+        from .ui.perfpane import install
+        install(the_editor)
+
     the_editor.show()
     the_editor.autosize_window()
 
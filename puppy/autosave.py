@@ -0,0 +1,141 @@
+"""Save the user's work automatically as they type.
+
+Saves are put off until the user pauses typing, so that a burst of edits
+becomes a single write; but someone who never stops typing still gets saved
+every so often. Saves of each project are also spaced out, with a little
+random jitter, so that a room full of students sharing one file server don't
+all hit it at once.
+
+If an autosave fails, the user is told without interrupting their typing,
+and autosaves are put off for longer after each failure, rather than failing
+again every few seconds.
+
+"""
+import time
+import random
+from functools import partial
+from PyQt5.QtCore import QObject, QTimer
+
+
+# How long to wait after the last edit before saving, in milliseconds
+IDLE_DELAY = 2000
+
+# The longest we will put off saving while edits keep arriving
+MAX_DELAY = 30000
+
+# The shortest time between autosaves of a project
+MIN_INTERVAL = 10000
+
+# The fraction by which the idle delay is randomly varied
+JITTER = 0.25
+
+# How long to wait before trying again after an autosave fails; this doubles
+# after each further failure, up to MAX_RETRY_DELAY
+RETRY_DELAY = 30000
+MAX_RETRY_DELAY = 300000
+
+
+class Autosaver(QObject):
+    """Automatically save the files open in an Editor.
+
+    The files edited since they were last saved are kept track of here, and
+    only those are autosaved. A file whose edits have all been undone is
+    still submitted, but SavePipeline sees that it is unchanged and doesn't
+    write it.
+
+    """
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        # Files edited since they were last saved
+        self.edited = set()
+        # Files autosaved but not yet written
+        self.saving = set()
+        # The number of autosaves that have failed in a row
+        self.failures = 0
+        self.first_edit = None
+        self.last_save = None
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.save)
+        editor.saver.saved.connect(self.on_saved)
+
+    def watch(self, pane):
+        """Start autosaving the file in an EditorPane."""
+        pane.textChanged.connect(partial(self.on_edit, pane.path))
+
+    def on_edit(self, path):
+        """Called on every edit to a watched file."""
+        self.edited.add(path)
+        if self.first_edit is None:
+            self.first_edit = time.monotonic()
+        self.schedule()
+
+    def retry_delay(self):
+        """Get the least time between autosaves, in milliseconds."""
+        if not self.failures:
+            return MIN_INTERVAL
+        return min(RETRY_DELAY * 2 ** (self.failures - 1), MAX_RETRY_DELAY)
+
+    def schedule(self):
+        """(Re)start the timer for the next autosave."""
+        now = time.monotonic()
+        delay = IDLE_DELAY * random.uniform(1 - JITTER, 1 + JITTER) / 1000
+        delay = min(delay, self.first_edit + MAX_DELAY / 1000 - now)
+        if self.last_save is not None:
+            next_save = self.last_save + self.retry_delay() / 1000
+            delay = max(delay, next_save - now)
+        self.timer.start(max(0, int(delay * 1000)))
+
+    def save(self):
+        """Save the edited files now.
+
+        The files are written by the Editor's SavePipeline, so this never
+        waits for the disk.
+
+        """
+        if not self.edited:
+            return
+        paths, self.edited = self.edited, set()
+        self.first_edit = None
+        self.last_save = time.monotonic()
+        self.saving |= paths
+        self.editor.save_files(paths)
+
+    def on_saved(self, paths):
+        self.saving.difference_update(paths)
+        if self.failures:
+            self.failures = 0
+            self.editor.clear_status()
+
+    def on_failed(self, failures):
+        """Handle files that could not be saved, given as {path: error}.
+
+        Return True if they were all autosaved, in which case the user has
+        been told, and they will be tried again later.
+
+        """
+        if not self.saving.issuperset(failures):
+            return False
+        self.saving.difference_update(failures)
+        self.failures += 1
+        self.edited.update(failures)
+        if self.first_edit is None:
+            self.first_edit = time.monotonic()
+        path, error = sorted(failures.items())[0]
+        self.editor.show_status(
+            "Could not save {}: {}. Trying again in {} seconds.".format(
+                path, error, self.retry_delay() // 1000
+            )
+        )
+        self.schedule()
+        return True
+
+    def clear(self):
+        """Forget about edits that have now been saved."""
+        self.edited.clear()
+        self.saving.clear()
+        self.first_edit = None
+        self.last_save = time.monotonic()
+        self.timer.stop()
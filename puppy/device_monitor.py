@@ -0,0 +1,103 @@
+"""Watch for micro:bits being plugged in and unplugged.
+
+Enumerating serial ports can take a while, so it is done on a worker thread
+every so often. The results are compared with the previous scan and changes
+are reported with signals, so that the user interface can connect to a
+micro:bit as soon as it is plugged in.
+
+"""
+from PyQt5.QtCore import QObject, QThread, QCoreApplication, pyqtSignal
+from PyQt5.QtSerialPort import QSerialPortInfo
+
+MICROBIT_PID = 516
+MICROBIT_VID = 3368
+
+# How often to check for devices, in milliseconds
+SCAN_INTERVAL = 1000
+
+
+def is_microbit(port):
+    """Return True if the QSerialPortInfo port is a micro:bit."""
+    return port.productIdentifier() == MICROBIT_PID and \
+        port.vendorIdentifier() == MICROBIT_VID
+
+
+def scan_microbits():
+    """Get the system locations of all the micro:bits connected."""
+    return sorted(
+        port.systemLocation()
+        for port in QSerialPortInfo.availablePorts()
+        if is_microbit(port)
+    )
+
+
+class PortScanner(QThread):
+    """Repeatedly scan for micro:bits on a worker thread."""
+    scanned = pyqtSignal(list)
+
+    def __init__(self, interval=SCAN_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.interval = interval
+
+    def run(self):
+        while not self.isInterruptionRequested():
+            self.scanned.emit(scan_microbits())
+            # Sleep in short steps so that we can be stopped promptly
+            for _ in range(self.interval // 100):
+                if self.isInterruptionRequested():
+                    return
+                self.msleep(100)
+
+
+class DeviceMonitor(QObject):
+    """Keep track of the micro:bits that are connected.
+
+    The attached and detached signals are emitted with the system location
+    of a device (such as /dev/ttyACM0) when it is plugged in or unplugged.
+
+    """
+    attached = pyqtSignal(str)
+    detached = pyqtSignal(str)
+
+    def __init__(self, interval=SCAN_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.ports = []
+        self.scanner = PortScanner(interval, parent=self)
+        self.scanner.scanned.connect(self.on_scanned)
+
+    def start(self):
+        if not self.scanner.isRunning():
+            self.scanner.start()
+
+    def stop(self):
+        self.scanner.requestInterruption()
+        self.scanner.wait()
+
+    def devices(self):
+        """Get the devices found by the last scan, without scanning again."""
+        return list(self.ports)
+
+    def on_scanned(self, ports):
+        old = self.ports
+        self.ports = ports
+        for port in old:
+            if port not in ports:
+                self.detached.emit(port)
+        for port in ports:
+            if port not in old:
+                self.attached.emit(port)
+
+
+_monitor = None
+
+
+def get_device_monitor():
+    """Get the shared DeviceMonitor, starting it if necessary."""
+    global _monitor
+    if _monitor is None:
+        _monitor = DeviceMonitor()
+        app = QCoreApplication.instance()
+        if app:
+            app.aboutToQuit.connect(_monitor.stop)
+        _monitor.start()
+    return _monitor
@@ -0,0 +1,54 @@
+"""Flash .hex files to a micro:bit in the background.
+
+Writing to the micro:bit's USB drive can take several seconds, during which
+the GUI would freeze, so the .hex file is written by a worker thread, as
+SavePipeline writes files (see saving.py).
+
+"""
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from .hexbuilder import HexError
+
+
+class Flasher(QObject):
+    """Write .hex files to micro:bit drives on a worker thread."""
+
+    #: Emitted with whether the flash worked, and a message for the user
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, builder, parent=None):
+        super().__init__(parent)
+        self.builder = builder
+        self.thread = None
+
+    def busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def flash(self, script, drive):
+        """Start flashing script (bytes) to drive.
+
+        Return False if a flash is already in progress.
+
+        """
+        if self.busy():
+            return False
+        self.thread = threading.Thread(
+            target=self.work, args=(script, drive),
+            name='flash', daemon=True
+        )
+        self.thread.start()
+        return True
+
+    def work(self, script, drive):
+        try:
+            self.builder.flash(script, drive)
+        except (HexError, OSError) as e:
+            self.finished.emit(False, str(e))
+        else:
+            self.finished.emit(True, "Flashed your micro:bit")
+
+    def wait(self):
+        """Wait for any flash in progress to finish."""
+        if self.thread:
+            self.thread.join()
@@ -0,0 +1,272 @@
+"""Build .hex files to flash onto a micro:bit.
+
+A .hex file for the micro:bit is the MicroPython runtime, in Intel HEX
+format, with the user's script embedded near the end at a fixed address.
+This is the same format produced by uFlash.
+
+The runtime is large (~600KB), so rather than read and copy it for every
+build we memory-map it, and check it only the first time we see it, caching
+where the script must be inserted. Each build then writes the two halves of
+the runtime straight from the map around the encoded script, and the script
+is only re-encoded when it changes.
+
+"""
+import os
+import os.path
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import binascii
+
+from .templating import cache_dir
+
+
+# Where the script is stored in the micro:bit's flash
+SCRIPT_ADDR = 0x3e000
+
+# The largest script that fits, including its 4 byte header
+MAX_SCRIPT_SIZE = 8188
+
+# The script is inserted before this many lines at the end of the runtime
+TAIL_LINES = 5
+
+# The name of the file written to the MICROBIT drive
+HEX_FILENAME = 'micropython.hex'
+
+
+class HexError(Exception):
+    """The runtime or script could not be made into a .hex file."""
+
+
+def runtime_cache_dir():
+    return cache_dir('runtime')
+
+
+def find_runtime():
+    """Find a MicroPython runtime .hex file, or return None.
+
+    We look at the PUPPY_MICROPYTHON_HEX environment variable, then for a
+    file in Puppy's resources, then for the runtime bundled with uFlash.
+
+    """
+    path = os.environ.get('PUPPY_MICROPYTHON_HEX')
+    if path and os.path.exists(path):
+        return path
+
+    path = os.path.join(
+        os.path.dirname(__file__), 'resources', 'firmware', HEX_FILENAME
+    )
+    if os.path.exists(path):
+        return path
+
+    try:
+        import uflash
+    except ImportError:
+        return None
+    # Keep a copy on disk, so that we can map it
+    path = os.path.join(
+        runtime_cache_dir(),
+        'uflash-{}.hex'.format(uflash.get_version())
+    )
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='ascii') as f:
+            f.write(uflash._RUNTIME)
+        os.replace(tmp, path)
+    return path
+
+
+def check_records(data):
+    """Check that data is valid Intel HEX, raising HexError if not."""
+    for num, line in enumerate(data.split(), start=1):
+        if not line.startswith(b':'):
+            raise HexError("Line {} is not a HEX record".format(num))
+        try:
+            record = binascii.unhexlify(line[1:])
+        except binascii.Error:
+            raise HexError("Line {} is not valid hex".format(num))
+        if sum(record) & 0xff:
+            raise HexError("Line {} has a bad checksum".format(num))
+
+
+def hexlify(script):
+    """Encode a script (bytes) as the HEX records to embed in the runtime."""
+    script = script.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    # Add a header and pad to a multiple of 16 bytes
+    data = b'MP' + struct.pack('<H', len(script)) + script
+    data += b'\x00' * (16 - len(data) % 16)
+    if len(data) > MAX_SCRIPT_SIZE:
+        raise HexError("Your program is too big to fit on the micro:bit")
+
+    # Set the upper 16 bits of the address with an extended address record
+    output = [b':020000040003F7']
+    addr = SCRIPT_ADDR
+    for i in range(0, len(data), 16):
+        chunk = data[i:i + 16]
+        record = struct.pack('>BHB', len(chunk), addr & 0xffff, 0) + chunk
+        checksum = -sum(record) & 0xff
+        output.append(
+            b':' + binascii.hexlify(record).upper() +
+            b'%02X' % checksum
+        )
+        addr += 16
+    return b'\n'.join(output) + b'\n'
+
+
+class RuntimeHex:
+    """A MicroPython runtime .hex file, mapped into memory.
+
+    The file is checked the first time it is used; the result, and the
+    offset at which scripts are inserted, are cached on disk keyed by the
+    file's size and modification time.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.split = self.load_split()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def cache_path(self):
+        st = os.stat(self.path)
+        key = '{}:{}:{}'.format(
+            os.path.abspath(self.path), st.st_size, st.st_mtime_ns
+        )
+        name = hashlib.sha1(key.encode('utf8')).hexdigest() + '.json'
+        return os.path.join(runtime_cache_dir(), name)
+
+    def load_split(self):
+        """Get the offset at which scripts are inserted."""
+        cache = self.cache_path()
+        try:
+            with open(cache, encoding='utf8') as f:
+                return json.load(f)['split']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        check_records(self.map[:])
+        split = self.find_split()
+        try:
+            os.makedirs(os.path.dirname(cache), exist_ok=True)
+            with open(cache, 'w', encoding='utf8') as f:
+                json.dump({'split': split}, f)
+        except OSError:
+            pass
+        return split
+
+    def find_split(self):
+        """Find the start of the last TAIL_LINES lines of the runtime."""
+        end = len(self.map)
+        while end and self.map[end - 1:end] in (b'\n', b'\r'):
+            end -= 1
+        pos = end
+        for _ in range(TAIL_LINES):
+            pos = self.map.rfind(b'\n', 0, pos)
+            if pos == -1:
+                raise HexError("The runtime is too short")
+        return pos + 1
+
+    def head(self):
+        return memoryview(self.map)[:self.split]
+
+    def tail(self):
+        return memoryview(self.map)[self.split:]
+
+
+class HexBuilder:
+    """Build .hex files from a runtime and a script."""
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.script = None
+        self.encoded = None
+
+    def encode(self, script):
+        """Encode script, reusing the last encoding if it is unchanged."""
+        if script != self.script:
+            self.encoded = hexlify(script)
+            self.script = script
+        return self.encoded
+
+    def write(self, script, f):
+        """Write the .hex file for script to the binary file f."""
+        encoded = self.encode(script)
+        f.write(self.runtime.head())
+        f.write(encoded)
+        f.write(self.runtime.tail())
+
+    def flash(self, script, drive):
+        """Write the .hex file for script to a micro:bit's drive."""
+        path = os.path.join(drive, HEX_FILENAME)
+        with open(path, 'wb') as f:
+            self.write(script, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+_builder = None
+
+
+def get_builder():
+    """Get a HexBuilder for the runtime we can find, or None."""
+    global _builder
+    if _builder is None:
+        path = find_runtime()
+        if path:
+            _builder = HexBuilder(RuntimeHex(path))
+    return _builder
+
+
+def find_microbit_drive():
+    """Get the path at which a micro:bit's drive is mounted, or None."""
+    if sys.platform == 'win32':
+        return find_drive_windows()
+    try:
+        with open('/proc/mounts', encoding='utf8') as f:
+            mounts = [line.split()[1] for line in f]
+    except OSError:
+        mounts = [
+            os.path.join(base, name)
+            for base in ('/Volumes', '/media', '/run/media')
+            if os.path.isdir(base)
+            for name in os.listdir(base)
+        ]
+        # Removable media are often mounted under the user's name too
+        user = os.environ.get('USER')
+        if user:
+            for base in ('/media', '/run/media'):
+                d = os.path.join(base, user)
+                if os.path.isdir(d):
+                    mounts.extend(os.path.join(d, n) for n in os.listdir(d))
+    for mount in mounts:
+        mount = mount.replace('\\040', ' ')
+        if os.path.basename(mount) == 'MICROBIT':
+            return mount
+    return None
+
+
+def find_drive_windows():
+    import ctypes
+    import string
+    kernel32 = ctypes.windll.kernel32
+    old_mode = kernel32.SetErrorMode(1)
+    try:
+        for letter in string.ascii_uppercase:
+            path = letter + ':\\'
+            if not os.path.exists(path):
+                continue
+            name = ctypes.create_unicode_buffer(1024)
+            if kernel32.GetVolumeInformationW(
+                    ctypes.c_wchar_p(path), name, ctypes.sizeof(name),
+                    None, None, None, None, 0) and \
+                    name.value == 'MICROBIT':
+                return path
+    finally:
+        kernel32.SetErrorMode(old_mode)
+    return None
@@ -0,0 +1,226 @@
+"""Keep the history of every file saved in a project.
+
+Each version of a file is stored once, compressed, under the hash of its
+contents, so saving the same contents again costs nothing and the space used
+grows only with the changes actually made. For each file there is also an
+append-only index of fixed-size (timestamp, hash) records in time order, so
+any version can be found by binary search without reading the whole index.
+
+The history lives in a hidden directory inside the project::
+
+    .puppy/history/
+        paths               the paths of the files, one per line
+        index/<n>.idx       the index for the file on line n of paths
+        objects/ab/cdef...  the compressed contents with hash abcdef...
+
+"""
+import os
+import os.path
+import zlib
+import time
+import struct
+import hashlib
+import threading
+
+
+# An index record: the timestamp in nanoseconds and the SHA-1 of the contents
+RECORD = struct.Struct('<q20s')
+
+
+class FileIndex:
+    """The index of the saved versions of a single file.
+
+    Records are read from disk on demand, so an index can be searched
+    without loading it.
+
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path) // RECORD.size
+        except OSError:
+            return 0
+
+    def __getitem__(self, i):
+        """Get the (timestamp, hash) record at index i."""
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        with open(self.path, 'rb') as f:
+            f.seek(i * RECORD.size)
+            return RECORD.unpack(f.read(RECORD.size))
+
+    def __iter__(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = len(data) - len(data) % RECORD.size
+        yield from RECORD.iter_unpack(data[:end])
+
+    def append(self, timestamp, digest):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'ab') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end % RECORD.size:
+                # A crash left part of a record at the end; drop it, so that
+                # this record is aligned with the rest
+                f.truncate(end - end % RECORD.size)
+            f.write(RECORD.pack(timestamp, digest))
+
+    def find(self, timestamp):
+        """Get the index of the last record at or before timestamp.
+
+        Return -1 if there is none.
+
+        """
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid][0] <= timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+
+class History:
+    """The saved versions of all the files in a project.
+
+    root is the directory the history is kept in.
+
+    """
+    def __init__(self, root, encoding='utf8'):
+        self.root = root
+        self.encoding = encoding
+        self.lock = threading.Lock()
+        self.path_ids = None
+        # Whether the last attempt to record a version failed, and the
+        # (path, error) of a failure not yet reported
+        self.failing = False
+        self.error = None
+
+    def load_paths(self):
+        if self.path_ids is not None:
+            return
+        self.path_ids = {}
+        try:
+            with open(os.path.join(self.root, 'paths'), encoding='utf8') as f:
+                for i, line in enumerate(f):
+                    self.path_ids[line.rstrip('\n')] = i
+        except FileNotFoundError:
+            pass
+
+    def paths(self):
+        """Get the paths of all the files with a history."""
+        with self.lock:
+            self.load_paths()
+            return sorted(self.path_ids)
+
+    def index(self, path, create=False):
+        """Get the FileIndex for path, or None if it has no history."""
+        self.load_paths()
+        try:
+            path_id = self.path_ids[path]
+        except KeyError:
+            if not create:
+                return None
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, 'paths'), 'a',
+                      encoding='utf8') as f:
+                f.write(path + '\n')
+            path_id = self.path_ids[path] = len(self.path_ids)
+        return FileIndex(
+            os.path.join(self.root, 'index', '{}.idx'.format(path_id))
+        )
+
+    def blob_path(self, digest):
+        h = digest.hex()
+        return os.path.join(self.root, 'objects', h[:2], h[2:])
+
+    def record(self, path, data):
+        """Record data as a new version of path.
+
+        Return False if it is the same as the latest version.
+
+        """
+        raw = data.encode(self.encoding)
+        digest = hashlib.sha1(raw).digest()
+        with self.lock:
+            index = self.index(path, create=True)
+            last = index[-1] if len(index) else None
+            if last and last[1] == digest:
+                return False
+
+            blob = self.blob_path(digest)
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                tmp = blob + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(zlib.compress(raw))
+                os.replace(tmp, blob)
+
+            # Keep the index in order even if the clock goes backwards
+            timestamp = time.time_ns()
+            if last and timestamp <= last[0]:
+                timestamp = last[0] + 1
+            index.append(timestamp, digest)
+        return True
+
+    def versions(self, path):
+        """Get a list of the (timestamp, hash) of each version of path."""
+        with self.lock:
+            index = self.index(path)
+        return list(index) if index else []
+
+    def find(self, path, timestamp):
+        """Get the number of the latest version of path saved by timestamp.
+
+        Timestamps are in nanoseconds since the epoch, as from time.time_ns().
+        Return -1 if there was no version then.
+
+        """
+        with self.lock:
+            index = self.index(path)
+        return index.find(timestamp) if index else -1
+
+    def restore(self, path, version=-1):
+        """Get the contents of path as of the given version number."""
+        with self.lock:
+            index = self.index(path)
+        if not index:
+            raise KeyError(path)
+        timestamp, digest = index[version]
+        with open(self.blob_path(digest), 'rb') as f:
+            return zlib.decompress(f.read()).decode(self.encoding)
+
+    def safe_record(self, path, data):
+        """Record a version of path, keeping rather than raising errors.
+
+        Failing to keep history should never stop the user saving their work.
+        The first error after the history was last working is kept, to be
+        reported, until take_error() is called.
+
+        """
+        try:
+            recorded = self.record(path, data)
+        except OSError as e:
+            with self.lock:
+                if not self.failing:
+                    self.failing = True
+                    self.error = (path, e)
+            return False
+        with self.lock:
+            self.failing = False
+        return recorded
+
+    def take_error(self):
+        """Get and forget the (path, error) of a failure, or None."""
+        with self.lock:
+            error, self.error = self.error, None
+        return error
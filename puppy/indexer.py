@@ -0,0 +1,181 @@
+"""Keep a project's SymbolIndex up to date in the background.
+
+When a project is opened its Python files are found, read and parsed on a
+worker thread. After that, only a file being edited is parsed again, once the user
+pauses typing, using the text in the editor rather than the file on disk.
+
+Each file is also checked for syntax errors as it is indexed, so that they
+can be shown in the editor before the user tries to run their program.
+
+Big files are parsed and compiled in a child process (see parsing.py), as
+doing it on the worker thread would hold the GIL and stall the GUI.
+
+"""
+import os
+import os.path
+import threading
+from functools import partial
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from .parsing import Parser
+from .projects import ENCODING
+from .project_index import ignored_dir
+from .symbol_index import SymbolIndex
+from .syntax_check import SyntaxChecker
+
+
+# How long to wait after an edit before indexing the file, in milliseconds
+INDEX_DELAY = 500
+
+
+def python_files(root):
+    """Find the Python files in a project, as paths relative to root."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not ignored_dir(dirpath, d)]
+        for name in filenames:
+            if name.endswith('.py'):
+                yield os.path.relpath(os.path.join(dirpath, name), root)
+
+
+class SymbolIndexer(QObject):
+    """Index the Python files of a project on a worker thread."""
+
+    #: Emitted with a path when the names it defines have changed
+    updated = pyqtSignal(str)
+
+    #: Emitted with a path and its SyntaxProblem, or None, when it is checked
+    checked = pyqtSignal(str, object)
+
+    def __init__(self, project, parent=None):
+        super().__init__(parent)
+        self.project = project
+        self.parser = Parser()
+        self.index = SymbolIndex(parse=self.parser.extract_symbols)
+        self.checker = SyntaxChecker(find=self.parser.find_problem)
+        # path -> the SyntaxProblem last found in it, or None
+        self.problems = {}
+        self.checked.connect(self.on_checked)
+        # path -> source to index, or None to read it from disk
+        self.pending = {}
+        # Whether the worker should look for the project's files
+        self.scan_wanted = False
+        self.cond = threading.Condition()
+        self.closed = False
+        self.thread = None
+
+        self.panes = {}
+        self.edited = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(INDEX_DELAY)
+        self.timer.timeout.connect(self.index_edited)
+
+    def scan(self):
+        """Queue all the project's Python files to be indexed.
+
+        The files are found by the worker, as walking a big project, or one
+        on a network share, can take a while.
+
+        """
+        with self.cond:
+            self.scan_wanted = True
+            self.start()
+
+    def find_files(self):
+        """Queue the project's Python files; run on the worker."""
+        for path in python_files(self.project.root):
+            with self.cond:
+                if self.closed:
+                    return
+                # Text from the editor is newer than the file on disk
+                self.pending.setdefault(path, None)
+
+    def submit(self, path, source):
+        """Queue source, the text of the file at path, to be indexed."""
+        if self.index.is_current(path, source):
+            return
+        with self.cond:
+            self.pending[path] = source
+            self.start()
+
+    def start(self):
+        if not self.thread:
+            self.thread = threading.Thread(
+                target=self.work,
+                name='index-' + self.project.name,
+                daemon=True
+            )
+            self.thread.start()
+        self.cond.notify_all()
+
+    def watch(self, pane):
+        """Re-index the file in an EditorPane when it is edited."""
+        self.panes[pane.path] = pane
+        pane.textChanged.connect(partial(self.on_edit, pane.path))
+        if pane.path in self.problems:
+            pane.show_syntax_problem(self.problems[pane.path])
+
+    def on_edit(self, path):
+        self.edited.add(path)
+        self.timer.start()
+
+    def index_edited(self):
+        for path in self.edited:
+            pane = self.panes.get(path)
+            if pane:
+                self.submit(path, pane.text())
+        self.edited.clear()
+
+    def on_checked(self, path, problem):
+        self.problems[path] = problem
+        pane = self.panes.get(path)
+        if pane:
+            pane.show_syntax_problem(problem)
+
+    def close(self):
+        """Stop the worker thread, abandoning anything not yet indexed."""
+        self.timer.stop()
+        with self.cond:
+            self.closed = True
+            self.pending.clear()
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.parser.close()
+
+    def read(self, path):
+        try:
+            with open(self.project.abspath(path), encoding=ENCODING) as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def work(self):
+        """Index queued files until closed."""
+        while True:
+            with self.cond:
+                self.cond.wait_for(
+                    lambda: self.pending or self.scan_wanted or self.closed
+                )
+                if self.closed:
+                    return
+                scan, self.scan_wanted = self.scan_wanted, False
+                if not scan:
+                    path, source = self.pending.popitem()
+
+            if scan:
+                self.find_files()
+                continue
+
+            if source is None:
+                if path in self.index:
+                    # It is open in the editor, and has been indexed from
+                    # there already
+                    continue
+                source = self.read(path)
+                if source is None:
+                    continue
+            self.checked.emit(path, self.checker.check(source, path))
+            if self.index.update(path, source):
+                self.updated.emit(path)
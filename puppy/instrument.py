@@ -0,0 +1,162 @@
+"""Optional timing of Puppy's hot paths.
+
+When the environment variable PUPPY_INSTRUMENT is set, the functions
+decorated with @timed, and any code wrapped in a span, record how long they
+take. The timings can be seen as percentiles in a hidden debug window (press
+Ctrl+Shift+P; see ui/perfpane.py), and saved as a trace file in Chrome's
+trace event format, to be loaded in chrome://tracing or Perfetto. If
+PUPPY_TRACE is set to a path, the trace is also written there when Puppy
+exits.
+
+When instrumentation is not enabled, @timed returns the function unchanged,
+so it costs nothing.
+
+"""
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+
+
+enabled = bool(os.environ.get('PUPPY_INSTRUMENT'))
+
+# The most events kept for the trace; older events are discarded
+MAX_EVENTS = 100000
+
+# The most timings of each span kept for the percentiles
+MAX_SAMPLES = 10000
+
+# The percentiles shown in summaries
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, p):
+    """Get the pth percentile of a sorted list, by the nearest-rank method."""
+    rank = max(1, -(-len(values) * p // 100))
+    return values[rank - 1]
+
+
+class Recorder:
+    """Collect the timings of spans, from any thread."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            # (name, start, duration, thread id); times in seconds
+            self.events = deque(maxlen=MAX_EVENTS)
+            self.samples = {}
+            self.threads = {}
+
+    def record(self, name, start, duration):
+        thread = threading.current_thread()
+        with self.lock:
+            self.events.append((name, start, duration, thread.ident))
+            self.threads[thread.ident] = thread.name
+            try:
+                samples = self.samples[name]
+            except KeyError:
+                samples = self.samples[name] = deque(maxlen=MAX_SAMPLES)
+            samples.append(duration)
+
+    def names(self):
+        with self.lock:
+            return sorted(self.samples)
+
+    def stats(self, name):
+        """Summarize the timings of a span, in seconds."""
+        with self.lock:
+            values = sorted(self.samples.get(name, ()))
+        if not values:
+            return None
+        stats = {'count': len(values), 'max': values[-1]}
+        for p in PERCENTILES:
+            stats['p{}'.format(p)] = percentile(values, p)
+        return stats
+
+    def chrome_trace(self):
+        """Get the recorded events in Chrome's trace event format."""
+        pid = os.getpid()
+        with self.lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        trace = [
+            {
+                'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                'args': {'name': name},
+            }
+            for tid, name in threads.items()
+        ]
+        for name, start, duration, tid in events:
+            trace.append({
+                'name': name, 'cat': 'puppy', 'ph': 'X',
+                'ts': start * 1e6, 'dur': duration * 1e6,
+                'pid': pid, 'tid': tid,
+            })
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        """Write the trace to a file."""
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf8') as f:
+            json.dump(self.chrome_trace(), f)
+        os.replace(tmp, path)
+
+
+recorder = Recorder()
+
+
+class span:
+    """A context manager that times the code within it."""
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            recorder.record(
+                self.name, self.start, time.perf_counter() - self.start
+            )
+
+
+def timed(name):
+    """Decorate a function to record a span each time it is called."""
+    def decorator(func):
+        if not enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.record(name, start, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def begin(name):
+    """Start a span that ends somewhere else, such as in a callback.
+
+    Pass the result to end(). Returns None if instrumentation is disabled.
+
+    """
+    if enabled:
+        return name, time.perf_counter()
+    return None
+
+
+def end(token):
+    """End a span started with begin()."""
+    if token:
+        name, start = token
+        recorder.record(name, start, time.perf_counter() - start)
@@ -0,0 +1,111 @@
+"""Read large files without locking up the editor.
+
+Programs that students write often produce big CSV files or logs, and
+reading one of those into a single string, then handing it all to the
+editor, can freeze Puppy for a long time. Instead, large files are
+memory-mapped and decoded in chunks, so that the editor can add them a
+piece at a time, and huge files are shown a page at a time, read-only.
+
+"""
+import os
+import mmap
+import codecs
+import hashlib
+
+
+# Files bigger than this are loaded in chunks, without syntax highlighting
+LARGE_FILE_SIZE = 1024 * 1024
+
+# Files bigger than this are shown read-only, a page at a time
+HUGE_FILE_SIZE = 16 * 1024 * 1024
+
+# The number of bytes decoded at a time when loading a large file
+CHUNK_SIZE = 256 * 1024
+
+# The approximate number of bytes in each page of a huge file
+PAGE_SIZE = 512 * 1024
+
+
+def normalize_newlines(text):
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def read_chunks(path, encoding, on_done=None, size=CHUNK_SIZE):
+    """Read a text file in chunks, with newlines translated to \\n.
+
+    This yields the same text as reading the file in text mode would, in
+    pieces. Once the whole file has been read, on_done is called with the
+    SHA-1 digest of the text, encoded, as projects.digest() would give it.
+
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        length = os.fstat(f.fileno()).st_size
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+            if length else b''
+        try:
+            held = ''
+            for pos in range(0, length, size):
+                text = held + decoder.decode(data[pos:pos + size])
+                # A \r at the end might be the first half of a \r\n
+                held = ''
+                if text.endswith('\r'):
+                    text, held = text[:-1], '\r'
+                text = normalize_newlines(text)
+                if text:
+                    sha1.update(text.encode(encoding))
+                    yield text
+            text = normalize_newlines(held + decoder.decode(b'', final=True))
+            if text:
+                sha1.update(text.encode(encoding))
+                yield text
+        finally:
+            if length:
+                data.close()
+    if on_done:
+        on_done(sha1.digest())
+
+
+class FilePager:
+    """Read a huge text file a page at a time.
+
+    Pages start and end on line boundaries where possible, so they are
+    roughly, not exactly, PAGE_SIZE bytes.
+
+    """
+    def __init__(self, path, encoding, page_size=PAGE_SIZE):
+        self.path = path
+        self.encoding = encoding
+        self.page_size = page_size
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # The byte offset at which each page starts, found when needed
+        self.starts = {0: 0}
+
+    def __len__(self):
+        return max(1, -(-self.size // self.page_size))
+
+    def start(self, n):
+        """Get the offset of the start of page n."""
+        if n >= len(self):
+            return self.size
+        try:
+            return self.starts[n]
+        except KeyError:
+            pass
+        pos = n * self.page_size
+        newline = self.map.find(b'\n', pos, pos + self.page_size)
+        start = pos if newline == -1 else newline + 1
+        self.starts[n] = start
+        return start
+
+    def page(self, n):
+        """Get the text of page n."""
+        data = self.map[self.start(n):self.start(n + 1)]
+        return normalize_newlines(data.decode(self.encoding, 'replace'))
+
+    def close(self):
+        self.map.close()
+        self.file.close()
@@ -0,0 +1,89 @@
+"""Start a program in its own process group, with resource limits.
+
+RunManager starts every program through this script, as
+
+    python3 -I -S launcher.py REPORT CPU MEMORY PROGRAM [ARGS...]
+
+It makes a new session, so that the program and anything it starts can be
+killed together, then forks. The child sets the limits and runs PROGRAM; the
+parent waits for it, writes its exit code and peak memory use to the file
+REPORT as JSON, and exits with the same code (or 128 plus the signal number,
+if it was killed by a signal).
+
+CPU is a limit in seconds of CPU time, and MEMORY in bytes of address space;
+either may be '-' for no limit.
+
+Like zygote.py, this is run as a script, so it must only use the standard
+library.
+
+"""
+import os
+import sys
+import json
+import signal
+import resource
+
+
+def set_limits(cpu, memory):
+    if cpu is not None:
+        # Leave a second's grace, so that the program gets SIGXCPU (and we
+        # can tell the user why) before it is killed
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    if memory is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+
+def parse_limit(arg):
+    return None if arg == '-' else int(arg)
+
+
+def main():
+    report, cpu, memory = sys.argv[1:4]
+    argv = sys.argv[4:]
+    try:
+        os.setsid()
+    except PermissionError:
+        # We already lead a process group, which is all we need
+        pass
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            set_limits(parse_limit(cpu), parse_limit(memory))
+        except (OSError, ValueError) as e:
+            print("Could not set resource limits:", e, file=sys.stderr)
+        try:
+            os.execvp(argv[0], argv)
+        except OSError as e:
+            print("Could not start {}: {}".format(argv[0], e), file=sys.stderr)
+        os._exit(127)
+
+    # Leave interrupts to the child; we only need to report how it ended
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            _, status, rusage = os.wait4(pid, 0)
+            break
+        except InterruptedError:
+            continue
+    code = os.waitstatus_to_exitcode(status)
+
+    max_rss = rusage.ru_maxrss
+    if sys.platform != 'darwin':
+        # Linux and the BSDs report kilobytes, macOS bytes
+        max_rss *= 1024
+    try:
+        with open(report, 'w', encoding='utf8') as f:
+            json.dump({'exit': code, 'max_rss': max_rss}, f)
+    except OSError:
+        pass
+
+    if code < 0:
+        # Exit as a shell would, rather than raising the signal ourselves
+        # and perhaps dumping core in the user's project
+        code = 128 - code
+    sys.exit(code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Keep a copy of everything shown in an output pane in a log file.
+
+Output panes only keep the most recent lines, so that they don't use ever
+more memory; the log lets the full output be inspected later. Logs are
+rotated once they reach a certain size, so they are bounded on disk too.
+
+Logging is optional (see Project.log_path()). If the log can't be written,
+for instance because the disk is full, logging is turned off rather than
+interrupting the program's output.
+
+"""
+import os
+import os.path
+
+
+# The size at which a log file is rotated, in bytes
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+# The number of old log files kept, as output.log.1, output.log.2, ...
+DEFAULT_BACKUPS = 3
+
+
+class OutputLog:
+    """A text log file that is rotated when it grows too large.
+
+    If writing fails, the log is turned off and on_error, if given, is
+    called once with the OSError.
+
+    """
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES,
+                 backups=DEFAULT_BACKUPS, encoding='utf8', on_error=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.encoding = encoding
+        self.on_error = on_error
+        self.file = None
+        self.size = 0
+        # The error that turned the log off, if any
+        self.error = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a', encoding=self.encoding)
+        self.size = self.file.tell()
+
+    def write(self, text):
+        """Append text to the log."""
+        if not text or self.error:
+            return
+        try:
+            if self.file is None:
+                self.open()
+            if self.size >= self.max_bytes:
+                self.rotate()
+            self.file.write(text)
+        except OSError as e:
+            self.fail(e)
+            return
+        self.size += len(text.encode(self.encoding))
+
+    def fail(self, error):
+        """Turn the log off after an error."""
+        self.error = error
+        self.close()
+        if self.on_error:
+            self.on_error(error)
+
+    def rotate(self):
+        """Move the current log aside and start a new one."""
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = '{}.{}'.format(self.path, i)
+            if os.path.exists(src):
+                os.replace(src, '{}.{}'.format(self.path, i + 1))
+        if self.backups:
+            os.replace(self.path, self.path + '.1')
+        else:
+            os.unlink(self.path)
+        self.open()
+
+    def flush(self):
+        if self.file:
+            try:
+                self.file.flush()
+            except OSError as e:
+                self.fail(e)
+
+    def close(self):
+        if self.file is None:
+            return
+        file, self.file = self.file, None
+        try:
+            file.close()
+        except OSError as e:
+            if not self.error:
+                self.fail(e)
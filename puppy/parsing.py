@@ -0,0 +1,68 @@
+"""Parse and compile Python source in a child process.
+
+ast.parse() and compile() hold the GIL until they finish, so even on the
+indexer's worker thread a big file would stall the GUI thread while it is
+parsed. Instead the work is sent to a child process, and the worker thread
+waits for the result without holding the GIL. Small files are still parsed
+in-thread, as that is quicker than sending them to the child.
+
+Like symbol_index.py and syntax_check.py, this module doesn't need Qt, so the
+child process doesn't have to load it.
+
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .symbol_index import extract_symbols
+from .syntax_check import find_problem
+
+
+# Sources shorter than this, in characters, are parsed in the calling thread
+SMALL_SOURCE = 10000
+
+
+class Parser:
+    """Run extract_symbols() and find_problem() in a child process.
+
+    The child is started when it is first needed. If it can't be started, or
+    dies, the work is done in the calling thread instead.
+
+    """
+    def __init__(self, small=SMALL_SOURCE):
+        self.small = small
+        self.executor = None
+        self.failed = False
+
+    def extract_symbols(self, source):
+        return self.call(extract_symbols, source)
+
+    def find_problem(self, source, filename='<string>'):
+        return self.call(find_problem, source, filename)
+
+    def call(self, function, source, *args):
+        """Return function(source, *args), run in the child if source is big.
+
+        Exceptions raised by function, such as SyntaxError, are re-raised.
+
+        """
+        if len(source) < self.small or self.failed:
+            return function(source, *args)
+        try:
+            if self.executor is None:
+                # Spawn rather than fork: Puppy's process has Qt and threads
+                self.executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self.executor.submit(function, source, *args).result()
+        except (OSError, BrokenProcessPool):
+            self.close()
+            self.failed = True
+            return function(source, *args)
+
+    def close(self):
+        """Stop the child process."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,212 @@
+"""A persistent index of the projects in the projects directory.
+
+Reading every project's ini file each time the project list is shown is slow
+when the projects directory is on a network share. Instead we keep a small
+JSON manifest recording each project's template, metadata and the
+modification time of its ini file.
+
+The manifest lives in a subdirectory of the projects root, so that saving it
+does not itself change the modification time of the root. If the root's
+modification time is unchanged then no projects have been added or removed
+and the project list can be taken straight from the manifest.
+
+"""
+import os
+import os.path
+import json
+from configparser import ConfigParser
+
+from .projects import ENCODING, DATA_DIR
+
+
+# The name of the ini file within each project containing the metadata
+INI_FILENAME = 'puppy-project.ini'
+
+# Where the index is stored, relative to the projects root
+INDEX_DIR = DATA_DIR
+INDEX_FILENAME = 'projects.json'
+
+# Kinds of change reported by ProjectIndex.refresh_project()
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+# Bump this to discard indexes written by older versions
+INDEX_VERSION = 1
+
+
+def read_ini(path):
+    """Read a project's ini file, returning the template name and metadata."""
+    c = ConfigParser()
+    c.read([path], encoding='utf8')
+    template = c.get('puppy', 'template')
+    metadata = dict(c.items('metadata'))
+    return template, metadata
+
+
+def ignored_dir(parent, name):
+    """Return True for directories that can't hold projects or their code.
+
+    These are Puppy's own directories, anything else hidden, and virtualenvs,
+    which hold thousands of files the user didn't write.
+
+    """
+    return name.startswith('.') or \
+        os.path.exists(os.path.join(parent, name, 'pyvenv.cfg'))
+
+
+def mtime(path):
+    """Return the modification time of path in ns, or None if it is missing."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ProjectIndex:
+    """The cached details of every project under a root directory."""
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, INDEX_DIR, INDEX_FILENAME)
+        self.root_mtime = None
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """Load the index from disk, if it can be read."""
+        try:
+            with open(self.path, encoding=ENCODING) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != INDEX_VERSION:
+            return
+        self.root_mtime = data['root_mtime']
+        self.entries = data['projects']
+
+    def save(self):
+        """Write the index to disk."""
+        data = {
+            'version': INDEX_VERSION,
+            'root_mtime': self.root_mtime,
+            'projects': self.entries,
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding=ENCODING) as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            # The index is only a cache; we can manage without it.
+            pass
+
+    def inipath(self, name):
+        return os.path.join(self.root, name, INI_FILENAME)
+
+    def names(self):
+        """Get the names of all projects, rescanning the root if it changed."""
+        root_mtime = mtime(self.root)
+        if root_mtime != self.root_mtime:
+            self.scan()
+            self.root_mtime = root_mtime
+            self.save()
+        return sorted(self.entries)
+
+    def scan(self):
+        """Re-read the list of projects from the root directory.
+
+        Only the ini files of new or modified projects are parsed.
+
+        """
+        entries = {}
+        for name in os.listdir(self.root):
+            if name == INDEX_DIR:
+                continue
+            entry = self.check(name)
+            if entry:
+                entries[name] = entry
+        self.entries = entries
+
+    def refresh(self):
+        """Rescan the root for changes.
+
+        Return sets of the names of the projects that were added, removed and
+        changed since the index was last updated.
+
+        """
+        old = self.entries
+        self.scan()
+        self.root_mtime = mtime(self.root)
+        self.save()
+        new = self.entries
+        added = new.keys() - old.keys()
+        removed = old.keys() - new.keys()
+        changed = {
+            name for name in new.keys() & old.keys()
+            if new[name] is not old[name]
+        }
+        return added, removed, changed
+
+    def refresh_project(self, name):
+        """Re-check a single project for changes.
+
+        Return ADDED, REMOVED or CHANGED, or None if nothing changed.
+
+        """
+        old = self.entries.get(name)
+        new = self.check(name)
+        if new is old:
+            return None
+        if new is None:
+            del self.entries[name]
+            kind = REMOVED
+        else:
+            self.entries[name] = new
+            kind = CHANGED if old else ADDED
+        self.save()
+        return kind
+
+    def check(self, name):
+        """Get the index entry for a project, re-reading it if out of date.
+
+        Return None if there is no such project.
+
+        """
+        inipath = self.inipath(name)
+        ini_mtime = mtime(inipath)
+        if ini_mtime is None:
+            return None
+        entry = self.entries.get(name)
+        if entry and entry['mtime'] == ini_mtime:
+            return entry
+        try:
+            template, metadata = read_ini(inipath)
+        except Exception:
+            return None
+        return {
+            'template': template,
+            'metadata': metadata,
+            'mtime': ini_mtime,
+        }
+
+    def get(self, name):
+        """Get the up-to-date entry for a project, or raise KeyError."""
+        entry = self.check(name)
+        if entry is None:
+            if self.entries.pop(name, None):
+                self.save()
+            raise KeyError(name)
+        if self.entries.get(name) is not entry:
+            self.entries[name] = entry
+            self.save()
+        return entry
+
+    def update(self, name, template, metadata):
+        """Record that a project's ini file has just been written."""
+        self.entries[name] = {
+            'template': template,
+            'metadata': dict(metadata),
+            'mtime': mtime(self.inipath(name)),
+        }
+        self.save()
@@ -3,10 +3,8 @@ import os.path
 from configparser import ConfigParser
 
 from .projects import PROJECTS, ENCODING
-
-
-# The name of the ini file within each project containing the metadata
-INI_FILENAME = 'puppy-project.ini'
+from .project_index import ProjectIndex, INI_FILENAME, mtime
+from .instrument import timed
 
 
 class ProjectManager:
@@ -15,35 +13,56 @@ class ProjectManager:
         self.root = root
         if not os.path.exists(self.root):
             os.makedirs(self.root)
+        self.index = ProjectIndex(self.root)
 
     def __iter__(self):
         """Iterate over the names of existing projects, yielding strings."""
-        for p in os.listdir(self.root):
-            if os.path.exists(os.path.join(self.root, p, INI_FILENAME)):
-                yield p
+        return iter(self.index.names())
+
+    def refresh(self):
+        """Check for projects that were added, removed or changed on disk.
+
+        Return sets of the names of the added, removed and changed projects.
+
+        """
+        return self.index.refresh()
 
+    def refresh_project(self, name):
+        """Check a single project for changes on disk.
+
+        Return 'added', 'removed' or 'changed', or None if nothing changed.
+
+        """
+        return self.index.refresh_project(name)
+
+    def watch(self, parent=None):
+        """Get a ProjectWatcher that signals when projects change on disk."""
+        from .project_watcher import ProjectWatcher
+        return ProjectWatcher(self, parent=parent)
+
+    @timed('ProjectManager.__getitem__')
     def __getitem__(self, key):
         """Get a project by name."""
-        inipath = os.path.join(self.root, key, INI_FILENAME)
-        if not os.path.exists(inipath):
-            raise KeyError(key)
-
-        return self.project_from_ini(inipath)
+        entry = self.index.get(key)
+        return self.build_project(
+            os.path.join(self.root, key),
+            entry['template'],
+            entry['metadata']
+        )
 
-    def project_from_ini(self, path):
-        """Read a project from its ini file."""
-        c = ConfigParser()
-        c.read([path], encoding='utf8')
-        template = c.get('puppy', 'template')
-        metadata = dict(c.items('metadata'))
+    def ini_mtime(self, name):
+        """Get the modification time of a project's ini file, or None."""
+        return mtime(os.path.join(self.root, name, INI_FILENAME))
 
+    def build_project(self, root, template, metadata):
+        """Construct a project of the named template."""
         for p in PROJECTS:
             if p.NAME == template:
                 break
         else:
             raise ValueError("Unknown project template")
 
-        return p(os.path.dirname(path), metadata)
+        return p(root, dict(metadata))
 
     def write_ini(self, project):
         """Write an ini file with metadata for the project."""
@@ -56,6 +75,7 @@ class ProjectManager:
             config.set('metadata', k, v)
         with open(path, 'w', encoding=ENCODING) as f:
             config.write(f)
+        self.index.update(project.name, project.NAME, project.metadata)
 
     def init_project(self, name, project_class, metadata={}):
         proj_root = os.path.join(self.root, name)
@@ -0,0 +1,188 @@
+"""Notice when projects are added, removed or changed on disk.
+
+This lets a teacher drop projects into a shared folder and have them appear in
+the project list without restarting Puppy.
+
+"""
+import os
+import os.path
+from collections import deque
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from .project_index import (
+    INI_FILENAME, ADDED, REMOVED, CHANGED, ignored_dir, mtime
+)
+
+
+# How often to check a batch of the projects we can't watch, in milliseconds,
+# and how many to check each time. Each check is a stat() of an ini file, which
+# may be slow on a network share, so they are spread out.
+POLL_INTERVAL = 500
+POLL_BATCH = 25
+
+# The most paths we watch. Each one uses up one of the system's limited
+# number of watches (on Linux, shared by every program the user runs), so
+# beyond this we poll instead.
+MAX_WATCHES = 1000
+
+
+class ProjectWatcher(QObject):
+    """Emit signals when the projects in a ProjectManager change.
+
+    We watch the projects root, each directory within it and each project's
+    ini file. A change to one of these is checked against the project index,
+    so only the affected project is re-read.
+
+    The directories are watched first, as they tell us about ini files being
+    created, removed or replaced. If there are more than MAX_WATCHES paths
+    to watch, or the filesystem can't watch some of them, the projects whose
+    ini files aren't watched are polled instead, a few at a time.
+
+    """
+    project_added = pyqtSignal(str)
+    project_removed = pyqtSignal(str)
+    project_changed = pyqtSignal(str)
+
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.root = manager.root
+        self.subdirs = set()
+        # The paths being watched
+        self.watched = set()
+        # The projects whose ini files are polled, and those still to be
+        # checked in the current round of polling
+        self.polled = set()
+        self.poll_queue = deque()
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(POLL_INTERVAL)
+        self.poll_timer.timeout.connect(self.poll)
+
+        self.root_watched = self.add_watch(self.root)
+        self.root_mtime = mtime(self.root)
+        self.watch_subdirs()
+
+    def add_watch(self, path):
+        """Watch path, returning False if we can't."""
+        if len(self.watched) >= MAX_WATCHES or \
+                not self.watcher.addPath(path):
+            return False
+        self.watched.add(path)
+        return True
+
+    def remove_watch(self, path):
+        if path in self.watched:
+            self.watched.discard(path)
+            self.watcher.removePath(path)
+
+    def inipath(self, name):
+        return os.path.join(self.root, name, INI_FILENAME)
+
+    def list_subdirs(self):
+        """Get the names of the directories in the root."""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return set()
+        return {
+            name for name in names
+            if not ignored_dir(self.root, name) and
+            os.path.isdir(os.path.join(self.root, name))
+        }
+
+    def watch_subdirs(self):
+        """Start or stop watching directories added to or removed from root.
+
+        Return the names of the directories that were added or removed.
+
+        """
+        current = self.list_subdirs()
+        added = current - self.subdirs
+        removed = self.subdirs - current
+        for name in removed:
+            self.remove_watch(self.inipath(name))
+            self.remove_watch(os.path.join(self.root, name))
+            self.polled.discard(name)
+        self.subdirs = current
+        for name in sorted(added):
+            self.add_watch(os.path.join(self.root, name))
+        for name in sorted(added):
+            self.watch_ini(name)
+        self.update_polling()
+        return added | removed
+
+    def watch_ini(self, name):
+        """Watch a project's ini file, or poll it if we can't."""
+        inipath = self.inipath(name)
+        if inipath in self.watched:
+            return
+        if os.path.exists(inipath):
+            watched = self.add_watch(inipath)
+        else:
+            # Its creation will show up as a change to the directory
+            watched = os.path.join(self.root, name) in self.watched
+        if watched:
+            self.polled.discard(name)
+        else:
+            self.polled.add(name)
+
+    def update_polling(self):
+        """Poll if there is anything we can't watch."""
+        if self.polled or not self.root_watched:
+            if not self.poll_timer.isActive():
+                self.poll_timer.start()
+        else:
+            self.poll_timer.stop()
+            self.poll_queue.clear()
+
+    def on_directory_changed(self, path):
+        if os.path.normpath(path) == os.path.normpath(self.root):
+            for name in self.watch_subdirs():
+                self.check(name)
+        else:
+            self.check(os.path.basename(path))
+
+    def on_file_changed(self, path):
+        # Editors often replace a file rather than writing to it, which stops
+        # it from being watched; if so, watch (or poll) the new file.
+        if path not in self.watcher.files():
+            self.watched.discard(path)
+        self.check(os.path.basename(os.path.dirname(path)))
+
+    def check(self, name):
+        """Check a single project for changes, emitting a signal if needed."""
+        kind = self.manager.refresh_project(name)
+        if name in self.subdirs:
+            self.watch_ini(name)
+            self.update_polling()
+        if kind == ADDED:
+            self.project_added.emit(name)
+        elif kind == REMOVED:
+            self.project_removed.emit(name)
+        elif kind == CHANGED:
+            self.project_changed.emit(name)
+
+    def poll(self):
+        """Check the next few of the projects we can't watch.
+
+        If the root itself can't be watched, check whether it has changed
+        too.
+
+        """
+        if not self.root_watched:
+            root_mtime = mtime(self.root)
+            if root_mtime != self.root_mtime:
+                self.root_mtime = root_mtime
+                for name in self.watch_subdirs():
+                    self.check(name)
+        if not self.poll_queue:
+            self.poll_queue.extend(sorted(self.polled))
+        for _ in range(min(POLL_BATCH, len(self.poll_queue))):
+            name = self.poll_queue.popleft()
+            if name in self.polled:
+                self.check(name)
@@ -1,19 +1,49 @@
 import os.path
 import os
+import stat
+import hashlib
+import tempfile
 import datetime
-from jinja2 import Environment, PackageLoader
-from .ui.editor import Editor
-from .ui.outputpane import OutputPane
-from .ui.replpane import REPLPane, find_microbit
-from .resources import load_svg
+from .history import History
+from .templating import get_env
+from .instrument import timed, span
+from . import large_files
+
+# The user interface modules pull in QScintilla, QtSvg and QtSerialPort, which
+# are slow to load, so they are imported in build_ui() when a project is
+# opened rather than at startup.
 
 # The encoding to use for reading/writing files
 ENCODING = 'utf8'
 
+# Where Puppy keeps its own files: in each project, and in the projects root
+# for the project index
+DATA_DIR = '.puppy'
+
+# Where a project's file history is kept, and the full output of its
+# programs logged, if that is turned on
+HISTORY_DIR = os.path.join(DATA_DIR, 'history')
+LOG_DIR = os.path.join(DATA_DIR, 'logs')
+
+# Values of flags in the metadata, or the environment, that mean 'yes'
+TRUE_VALUES = {'1', 'yes', 'true', 'on'}
+
+
+def get_umask():
+    # The umask can only be read by setting it, which affects every thread,
+    # so this is only done once, at startup
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
 
-env = Environment(
-    loader=PackageLoader(__name__, 'templates')
-)
+# The permissions given to newly created files, as open() would give them
+NEW_FILE_MODE = 0o666 & ~get_umask()
+
+
+def digest(data):
+    """Get a hash of the text data, to tell whether it needs saving."""
+    return hashlib.sha1(data.encode(ENCODING)).digest()
 
 
 class Project:
@@ -21,17 +51,180 @@ class Project:
         self.root = root
         self.name = os.path.basename(root)
         self.metadata = metadata
+        # Hashes of the contents of files as last read or written
+        self.digests = {}
+        self.history = History(os.path.join(root, HISTORY_DIR), ENCODING)
 
     def abspath(self, path):
         return os.path.join(self.root, path)
 
+    def run_limits(self):
+        """Get the resource limits for running the project's programs.
+
+        These may be set as cpu_limit (seconds) and memory_limit (megabytes)
+        in the project's metadata. Raise ValueError if either isn't a whole
+        number.
+
+        """
+        limits = {}
+        for key, scale in (('cpu_limit', 1), ('memory_limit', 2 ** 20)):
+            value = self.metadata.get(key)
+            if not value:
+                continue
+            try:
+                value = int(value)
+            except ValueError:
+                value = -1
+            if value < 0:
+                raise ValueError(
+                    "{} in {} must be a whole number, not {!r}".format(
+                        key, self.name, self.metadata[key]
+                    )
+                )
+            if value:
+                limits[key] = value * scale
+        return limits
+
+    def save_for_run(self, path):
+        """Save the project's files, waiting until path has been written.
+
+        Return None if it was, or the error if it could not be saved, in
+        which case it shouldn't be run: that would run an older version.
+
+        """
+        self.ui.save_all()
+        self.ui.saver.wait([path])
+        return self.ui.saver.failures([path]).get(path)
+
+    def save_and_run(self, path):
+        """Save the project's files, then run path if it was saved."""
+        with span('Project.run waiting for saves'):
+            error = self.save_for_run(path)
+        if error:
+            self.outputpane.show_message(
+                "{} was not run, as it could not be saved: {}".format(
+                    path, error
+                )
+            )
+            return
+        self.run_program(path)
+
+    def run_program(self, path):
+        """Run a Python file in the output pane, within the limits."""
+        try:
+            limits = self.run_limits()
+        except ValueError as e:
+            self.outputpane.show_message(str(e))
+            return
+        self.outputpane.run('python3', path, cwd=self.root, **limits)
+
+    def log_path(self, name):
+        """Get the path of the log file for an output pane, or None.
+
+        Output is only logged if log_output is set in the project's metadata,
+        or PUPPY_LOG_OUTPUT in the environment.
+
+        """
+        flag = self.metadata.get(
+            'log_output', os.environ.get('PUPPY_LOG_OUTPUT', '')
+        )
+        if flag.lower() not in TRUE_VALUES:
+            return None
+        return os.path.join(self.root, LOG_DIR, name + '.log')
+
+    @timed('Project.read_file')
     def read_file(self, path):
-        with open(self.abspath(path), 'rU', encoding=ENCODING) as f:
-            return f.read()
+        with open(self.abspath(path), 'r', encoding=ENCODING) as f:
+            data = f.read()
+        self.digests[path] = digest(data)
+        return data
+
+    def file_size(self, path):
+        return os.path.getsize(self.abspath(path))
+
+    def read_chunks(self, path):
+        """Read a large file as a series of strings.
 
+        The file is recorded as read, for needs_write(), once all of it has
+        been read.
+
+        """
+        def done(d):
+            self.digests[path] = d
+        return large_files.read_chunks(self.abspath(path), ENCODING, done)
+
+    def open_pager(self, path):
+        """Get a FilePager to view a huge file a page at a time."""
+        return large_files.FilePager(self.abspath(path), ENCODING)
+
+    def needs_write(self, path, data):
+        """Return True if data differs from what we last read or wrote."""
+        return self.digests.get(path) != digest(data)
+
+    @timed('Project.write_file')
     def write_file(self, path, data):
-        with open(self.abspath(path), 'w', encoding=ENCODING) as f:
-            f.write(data)
+        self.write_files([(path, data)])
+
+    @timed('Project.write_files')
+    def write_files(self, files):
+        """Write a batch of files, given as (path, data) pairs.
+
+        Each file is written to a temporary file alongside it and only
+        renamed over the original once all of them are safely on disk, so a
+        crash can never leave a file half-written.
+
+        """
+        staged = []
+        try:
+            for path, data in files:
+                dest = self.abspath(path)
+                fd, tmp = tempfile.mkstemp(
+                    prefix='.' + os.path.basename(dest),
+                    suffix='.tmp',
+                    dir=os.path.dirname(dest)
+                )
+                try:
+                    f = open(fd, 'w', encoding=ENCODING)
+                except BaseException:
+                    os.close(fd)
+                    os.unlink(tmp)
+                    raise
+                staged.append((path, data, dest, tmp, f))
+                f.write(data)
+
+            for path, data, dest, tmp, f in staged:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+                try:
+                    mode = stat.S_IMODE(os.stat(dest).st_mode)
+                except FileNotFoundError:
+                    mode = NEW_FILE_MODE
+                os.chmod(tmp, mode)
+
+            for path, data, dest, tmp, f in staged:
+                os.replace(tmp, dest)
+                self.digests[path] = digest(data)
+                self.history.safe_record(path, data)
+        finally:
+            for path, data, dest, tmp, f in staged:
+                f.close()
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+
+        # Make the renames durable too
+        for d in {os.path.dirname(dest) for _, _, dest, _, _ in staged}:
+            try:
+                fd = os.open(d, os.O_RDONLY)
+            except OSError:
+                # Not possible on all platforms
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
 
     def ensure_root(self):
         """Ensure the root directory for this project exists."""
@@ -42,7 +235,7 @@ class Project:
 
     def from_template(self, path_template, contents_template_name, **params):
         """Render a templated source file to theself project directory."""
-        tmpl = env.get_template(contents_template_name)
+        tmpl = get_env().get_template(contents_template_name)
         template_params = {
             'project': self,
         }
@@ -68,22 +261,81 @@ class HelloWorld(Project):
         self.from_template('hello_world.py', 'hello_world.py.tmpl')
 
     def build_ui(self, parent=None):
+        from .ui.editor import Editor
+        from .ui.outputpane import OutputPane
+        from .ui.replpane import MicrobitConnector
+        from .device_monitor import get_device_monitor
+        from .resources import load_svg
+
         self.ui = Editor(self, parent=parent)
         self.ui.add_svg('About Hello World', load_svg('about_hello_world.svg'))
         self.ui.add_tab('hello_world.py')
-        self.outputpane = OutputPane(parent=self.ui)
+        self.outputpane = OutputPane(
+            parent=self.ui, log_path=self.log_path('output')
+        )
         self.ui.add_pane(self.outputpane)
-        mb_port = find_microbit()
-        if mb_port:
-            port = '/dev/{}'.format(mb_port)
-            print(port)
-            self.replpane = REPLPane(port=port, parent=self.ui)
-            self.ui.add_pane(self.replpane)
+        # Connect to any micro:bits as they are plugged in
+        self.microbits = MicrobitConnector(self.ui, get_device_monitor())
+        # Made when the program is first flashed
+        self.flasher = None
         return self.ui
 
+    def build(self):
+        """Put the program onto the micro:bit.
+
+        If the micro:bit's drive is mounted, and we have a MicroPython
+        runtime, we flash a .hex file to it, in the background. Otherwise we
+        copy the program over the serial connection as main.py.
+
+        """
+        from .hexbuilder import get_builder, find_microbit_drive, HexError
+        from .flashing import Flasher
+
+        error = self.save_for_run('hello_world.py')
+        if error:
+            self.ui.finish_progress(False, (
+                "hello_world.py was not put onto the micro:bit, as it could "
+                "not be saved: {}".format(error)
+            ))
+            return
+        data = self.read_file('hello_world.py').encode(ENCODING)
+
+        drive = find_microbit_drive()
+        try:
+            builder = get_builder() if drive else None
+        except (HexError, OSError) as e:
+            self.ui.finish_progress(False, str(e))
+            return
+        if not builder:
+            self.copy_to_microbits(data)
+            return
+        if self.flasher is None:
+            self.flasher = Flasher(builder, parent=self.ui)
+            self.flasher.finished.connect(self.ui.finish_progress)
+        if self.flasher.flash(data, drive):
+            # We can't tell how far it has got, so show that it is busy
+            self.ui.show_progress("Flashing micro:bit", 0, 0)
+
+    def copy_to_microbits(self, data):
+        """Copy data to every micro:bit plugged in, as main.py."""
+        from .transfer import FileTransfer
+
+        panes = self.microbits.connected_panes()
+        if not panes:
+            self.ui.finish_progress(False, "Please plug in your micro:bit.")
+            return
+        for pane in panes:
+            transfer = FileTransfer(pane.writer, 'main.py', data, parent=pane)
+            transfer.progress.connect(
+                lambda done, total: self.ui.show_progress(
+                    "Copying to micro:bit", done, total
+                )
+            )
+            transfer.finished.connect(self.ui.finish_progress)
+            transfer.start()
+
     def run(self):
-        self.ui.save_all()
-        self.outputpane.run('python3', 'hello_world.py', cwd=self.root)
+        self.save_and_run('hello_world.py')
 
 
 class PythonScript(Project):
@@ -116,16 +368,18 @@ class PythonScript(Project):
         self.from_template('README.md', 'readme.md.tmpl')
 
     def build_ui(self, parent=None):
+        from .ui.editor import Editor
+        from .ui.outputpane import OutputPane
+
         self.ui = Editor(self, parent=parent)
-        self.outputpane = OutputPane()
+        self.outputpane = OutputPane(log_path=self.log_path('output'))
         self.ui.add_tab('README.md')
         self.ui.add_tab(self.py_file)
         self.ui.add_pane(self.outputpane)
         return self.ui
 
     def run(self):
-        self.ui.save_all()
-        self.outputpane.run('python3', self.py_file, cwd=self.root)
+        self.save_and_run(self.py_file)
 
 
 # This is a list of all the project templates we know how to build
@@ -1,15 +1,32 @@
-from pkg_resources import resource_filename, resource_string
+import os.path
 
 from PyQt5.QtGui import QPixmap, QIcon
 from PyQt5.QtCore import QDir
 
-QDir.addSearchPath('images', resource_filename(__name__, 'images'))
-QDir.addSearchPath('css', resource_filename(__name__, 'css'))
-QDir.addSearchPath('svg', resource_filename(__name__, 'svg'))
+# Resources are plain files beside this module, so we can find them directly
+# rather than going through pkg_resources, which is slow to import.
+RESOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_search_paths_registered = False
+
+
+def resource_filename(name):
+    """Get the full path to a file in the resources directory."""
+    return os.path.join(RESOURCE_DIR, name)
+
+
+def register_search_paths():
+    """Let Qt find resources with paths like 'images:icon.png'."""
+    global _search_paths_registered
+    if _search_paths_registered:
+        return
+    for prefix in ('images', 'css', 'svg'):
+        QDir.addSearchPath(prefix, resource_filename(prefix))
+    _search_paths_registered = True
 
 
 def path(name):
-    return resource_filename(__name__, "images/" + name)
+    return resource_filename("images/" + name)
 
 
 def load_icon(name):
@@ -24,9 +41,13 @@ def load_pixmap(name):
 
 def load_stylesheet(name):
     """Load a CSS stylesheet from the resources directory."""
-    return resource_string(__name__, "css/" + name).decode('utf8')
+    # Stylesheets may refer to other resources by search path
+    register_search_paths()
+    with open(resource_filename("css/" + name), encoding='utf8') as f:
+        return f.read()
 
 
 def load_svg(name):
     """Load SVG text from the resources directory."""
-    return resource_string(__name__, "svg/" + name)
+    with open(resource_filename("svg/" + name), 'rb') as f:
+        return f.read()
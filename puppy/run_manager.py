@@ -0,0 +1,222 @@
+"""Run a project's programs, one at a time.
+
+Runs are started through launcher.py (or zygote.py, for the warm runner),
+which puts them in their own process group, so that when the user runs the
+program again, or closes the project, the old run and anything it started can
+all be killed and reaped rather than left behind. The launcher also applies
+any limits on the CPU time and memory a run may use, and reports its peak
+memory use. The launcher's own interpreter skips importing site, so it
+starts quickly. When a run ends we report its exit code and how long it
+took.
+
+"""
+import os
+import os.path
+import sys
+import json
+import time
+import signal
+import tempfile
+from collections import namedtuple
+from PyQt5.QtCore import QObject, QProcess, QIODevice, QCoreApplication
+from PyQt5.QtCore import pyqtSignal
+
+
+LAUNCHER_SCRIPT = os.path.join(os.path.dirname(__file__), 'launcher.py')
+
+# Options for the interpreter running launcher.py: isolated mode (so the
+# user's PYTHON* variables don't affect it) without importing site
+LAUNCHER_OPTIONS = ['-I', '-S']
+
+# How long to wait for a killed process to exit, in milliseconds
+KILL_TIMEOUT = 1000
+
+# The result of a run. exit_code is None if the run was killed before it
+# could report one, and max_rss (in bytes) is None where it isn't known.
+RunResult = namedtuple('RunResult', 'exit_code wall_time max_rss')
+
+
+def launcher_available():
+    """Return True if programs can be started through launcher.py."""
+    return os.name == 'posix' and hasattr(os, 'fork')
+
+
+def limit_arg(limit):
+    return '-' if limit is None else str(limit)
+
+
+def describe(result):
+    """Describe how a run ended, for the user."""
+    code = result.exit_code
+    if code is None:
+        status = "Stopped"
+    elif code == -getattr(signal, 'SIGXCPU', 0):
+        status = "Stopped: CPU time limit exceeded"
+    elif code < 0:
+        try:
+            status = "Killed by {}".format(signal.Signals(-code).name)
+        except ValueError:
+            status = "Killed by signal {}".format(-code)
+    else:
+        status = "Exited with code {}".format(code)
+    parts = [status, "after {:.2f}s".format(result.wall_time)]
+    if result.max_rss:
+        parts.append("peak memory {:.1f} MB".format(result.max_rss / 2 ** 20))
+    return '[{}]'.format(', '.join(parts))
+
+
+def exit_code_of(process):
+    """Return the exit code of a finished QProcess.
+
+    As with subprocess, a process killed by a signal has the negated signal
+    number as its code; on POSIX, Qt gives the signal as the exit code.
+
+    """
+    if process.exitStatus() == QProcess.NormalExit:
+        return process.exitCode()
+    if os.name == 'posix' and process.exitCode() > 0:
+        return -process.exitCode()
+    return None
+
+
+def read_report(path):
+    """Read and remove the report written by launcher.py."""
+    try:
+        with open(path, encoding='utf8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        report = {}
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+    return report
+
+
+class RunManager(QObject):
+    """Run programs one at a time, killing the last run to start another.
+
+    finished is emitted with a RunResult when a run ends by itself; runs
+    stopped with stop() end silently.
+
+    """
+    finished = pyqtSignal(object)
+
+    def __init__(self, runner=None, parent=None):
+        super().__init__(parent)
+        # A WarmRunner to use for Python scripts, if enabled
+        self.runner = runner
+        self.process = None
+        self.started_at = None
+        # The file launcher.py writes its report to, for the current run
+        self.report = None
+        # Whether the current run has a process group of its own
+        self.grouped = False
+        app = QCoreApplication.instance()
+        if app:
+            app.aboutToQuit.connect(self.stop)
+
+    def is_running(self):
+        return self.process is not None
+
+    def start(self, program, args, env, cwd=None,
+              cpu_limit=None, memory_limit=None, tty=None):
+        """Start a run, stopping any run in progress; return its process.
+
+        cpu_limit is in whole seconds of CPU time, memory_limit in bytes.
+        tty is the path of a pseudo-terminal for the program's stdin, stdout
+        and stderr (see terminal.py).
+
+        """
+        self.stop()
+        report = None
+        grouped = False
+        if self.runner and self.runner.can_run(program):
+            process = self.runner.process_for(self)
+            process.set_limits(cpu_limit, memory_limit)
+            process.set_tty(tty)
+        else:
+            process = QProcess(self)
+            if tty:
+                process.setStandardInputFile(tty)
+                process.setStandardOutputFile(tty)
+                process.setStandardErrorFile(tty)
+            if launcher_available():
+                fd, report = tempfile.mkstemp(
+                    prefix='puppy-run-', suffix='.json'
+                )
+                os.close(fd)
+                args = LAUNCHER_OPTIONS + [
+                    LAUNCHER_SCRIPT, report,
+                    limit_arg(cpu_limit), limit_arg(memory_limit),
+                    program
+                ] + list(args)
+                program = sys.executable or 'python3'
+                grouped = True
+        process.setProcessEnvironment(env)
+        if cwd:
+            process.setWorkingDirectory(cwd)
+        process.finished.connect(
+            lambda *args, p=process: self.on_finished(p)
+        )
+        self.process = process
+        self.report = report
+        self.grouped = grouped
+        self.started_at = time.monotonic()
+        process.start(program, list(args), QIODevice.ReadWrite)
+        return process
+
+    def on_finished(self, process):
+        if process is not self.process:
+            return
+        wall_time = time.monotonic() - self.started_at
+        report, self.report = self.report, None
+        self.process = None
+        if isinstance(process, QProcess):
+            exit_code = exit_code_of(process)
+            max_rss = None
+            if report:
+                info = read_report(report)
+                exit_code = info.get('exit', exit_code)
+                max_rss = info.get('max_rss')
+        else:
+            exit_code, max_rss = process.exit_code, process.max_rss
+        process.deleteLater()
+        self.finished.emit(RunResult(exit_code, wall_time, max_rss))
+
+    def stop(self):
+        """Kill the current run, if any, and everything it started."""
+        process = self.process
+        if process is None:
+            return
+        self.process = None
+        report, self.report = self.report, None
+        for signal_ in (process.readyReadStandardOutput,
+                        process.readyReadStandardError,
+                        process.finished):
+            try:
+                signal_.disconnect()
+            except TypeError:
+                pass
+
+        if not isinstance(process, QProcess):
+            # WarmProcess kills its process group itself, and tidies up once
+            # the zygote tells it the child has gone.
+            process.finished.connect(process.deleteLater)
+            process.kill()
+            return
+
+        pid = process.processId()
+        try:
+            if pid and self.grouped:
+                os.killpg(pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            # The launcher has not made its process group yet
+            process.kill()
+        # Reap it now, so that it doesn't linger as a zombie
+        process.waitForFinished(KILL_TIMEOUT)
+        process.deleteLater()
+        if report:
+            read_report(report)
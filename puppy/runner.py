@@ -0,0 +1,371 @@
+"""Run Python scripts by forking them from a warm interpreter.
+
+This is an optional alternative to starting a new interpreter with QProcess
+for every run, enabled by setting the environment variable PUPPY_WARM_RUNNER.
+See zygote.py for the process that does the forking.
+
+WarmProcess provides the parts of the QProcess interface that OutputPane
+uses, so the two can be used interchangeably.
+
+"""
+import os
+import os.path
+import json
+import time
+import signal
+import socket
+import tempfile
+from PyQt5.QtCore import (
+    QObject, QProcess, QProcessEnvironment, QSocketNotifier, QCoreApplication,
+    QTimer, pyqtSignal
+)
+from .terminal import FdWriter
+
+
+ZYGOTE_SCRIPT = os.path.join(os.path.dirname(__file__), 'zygote.py')
+
+# The size of the chunks in which we read the child's output
+READ_SIZE = 65536
+
+# How long to wait for the zygote to start listening, and how often to try
+# to connect to it meanwhile, in milliseconds
+START_TIMEOUT = 5000
+CONNECT_INTERVAL = 50
+
+
+def warm_runner_enabled():
+    """Return True if the user has asked for the warm runner."""
+    return bool(os.environ.get('PUPPY_WARM_RUNNER')) and \
+        hasattr(socket, 'send_fds') and hasattr(os, 'fork')
+
+
+class WarmProcess(QObject):
+    """A script running in a child of the zygote."""
+    readyReadStandardOutput = pyqtSignal()
+    readyReadStandardError = pyqtSignal()
+    finished = pyqtSignal(int)
+
+    def __init__(self, runner, parent=None):
+        super().__init__(parent)
+        self.runner = runner
+        self.env = QProcessEnvironment.systemEnvironment()
+        self.cwd = None
+        self.limits = None
+        self.tty = None
+        self.pid = None
+        self.exit_code = None
+        self.max_rss = None
+        self.control = None
+        self.stdin = None
+        self.channels = {}
+        self.buffers = {}
+        # The request and the child's file descriptors, while we wait to
+        # send them to the zygote
+        self.request = None
+        self.child_fds = None
+        self.deadline = None
+
+    def setProcessEnvironment(self, env):
+        self.env = env
+
+    def setWorkingDirectory(self, cwd):
+        self.cwd = cwd
+
+    def set_limits(self, cpu=None, memory=None):
+        """Limit the CPU seconds and bytes of memory the script may use."""
+        self.limits = {'cpu': cpu, 'memory': memory}
+
+    def set_tty(self, tty):
+        """Run the script with the pseudo-terminal at path tty, if not None."""
+        self.tty = tty
+
+    def start(self, program, args, mode=None):
+        """Ask the zygote to run the script named by args[0]."""
+        env = {}
+        for entry in self.env.toStringList():
+            k, _, v = entry.partition('=')
+            env[k] = v
+        request = {
+            'argv': list(args),
+            'cwd': self.cwd or os.getcwd(),
+            'env': env,
+            'limits': self.limits,
+        }
+
+        for name in ('stdout', 'stderr'):
+            self.buffers[name] = bytearray()
+        if self.tty:
+            # The terminal's owner reads the output and writes the input
+            try:
+                fd = os.open(self.tty, os.O_RDWR | os.O_NOCTTY)
+            except OSError as e:
+                self.fail_to_start(e)
+                return
+            child_fds = [fd, os.dup(fd), os.dup(fd)]
+        else:
+            stdin_r, stdin_w = os.pipe()
+            self.stdin = FdWriter(stdin_w, parent=self)
+            child_fds = [stdin_r]
+            for name, signal_ in (
+                    ('stdout', self.readyReadStandardOutput),
+                    ('stderr', self.readyReadStandardError)):
+                r, w = os.pipe()
+                child_fds.append(w)
+                notifier = QSocketNotifier(r, QSocketNotifier.Read, self)
+                notifier.activated.connect(
+                    lambda fd, name=name, sig=signal_: self.on_read(name, sig)
+                )
+                self.channels[name] = (r, notifier)
+
+        self.request = request
+        self.child_fds = child_fds
+        self.deadline = time.monotonic() + START_TIMEOUT / 1000
+        self.send_request()
+
+    def send_request(self):
+        """Send the request to the zygote, once it is listening.
+
+        The zygote may still be starting up, so rather than block the GUI
+        waiting for it, we try again every so often until START_TIMEOUT.
+
+        """
+        if self.child_fds is None:
+            # Killed while we were waiting
+            return
+        try:
+            self.control = self.runner.connect()
+            if self.control is None:
+                if time.monotonic() < self.deadline:
+                    QTimer.singleShot(CONNECT_INTERVAL, self.send_request)
+                    return
+                raise TimeoutError("Python took too long to start")
+            socket.send_fds(
+                self.control,
+                [json.dumps(self.request).encode('utf8')],
+                self.child_fds
+            )
+            self.pid = json.loads(self.readline())['pid']
+        except (OSError, ValueError, KeyError) as e:
+            self.close_child_fds()
+            self.fail_to_start(e)
+            return
+        self.close_child_fds()
+
+        notifier = QSocketNotifier(
+            self.control.fileno(), QSocketNotifier.Read, self
+        )
+        notifier.activated.connect(self.on_control_read)
+        self.control_notifier = notifier
+
+    def close_child_fds(self):
+        """Close our copies of the child's file descriptors."""
+        for fd in self.child_fds:
+            os.close(fd)
+        self.child_fds = None
+        self.request = None
+
+    def fail_to_start(self, error):
+        """Report that the script could not be started, as QProcess would."""
+        for fd, notifier in self.channels.values():
+            notifier.setEnabled(False)
+            os.close(fd)
+        self.channels = {}
+        if self.stdin:
+            self.stdin.close()
+            self.stdin = None
+        if self.control:
+            self.control.close()
+        self.buffers['stderr'] += 'Could not start: {}\n'.format(
+            error
+        ).encode('utf8')
+        self.exit_code = -1
+        QTimer.singleShot(0, self.readyReadStandardError.emit)
+        QTimer.singleShot(0, self.check_finished)
+
+    def readline(self):
+        """Read a line from the zygote, blocking until it arrives."""
+        line = b''
+        while not line.endswith(b'\n'):
+            chunk = self.control.recv(1)
+            if not chunk:
+                raise ConnectionError("Zygote closed the connection")
+            line += chunk
+        return line
+
+    def on_read(self, name, signal_):
+        fd, notifier = self.channels[name]
+        data = os.read(fd, READ_SIZE)
+        if data:
+            self.buffers[name] += data
+            signal_.emit()
+        else:
+            notifier.setEnabled(False)
+            os.close(fd)
+            self.channels[name] = (None, None)
+            self.check_finished()
+
+    def on_control_read(self):
+        self.control_notifier.setEnabled(False)
+        try:
+            msg = json.loads(self.readline())
+            self.exit_code = msg['exit']
+            self.max_rss = msg.get('max_rss')
+        except (ConnectionError, ValueError, KeyError):
+            self.exit_code = -signal.SIGKILL
+        self.control.close()
+        self.check_finished()
+
+    def check_finished(self):
+        """Emit finished once the child has exited and all output is read."""
+        if self.exit_code is None:
+            return
+        if any(fd is not None for fd, _ in self.channels.values()):
+            return
+        if self.stdin:
+            self.stdin.close()
+            self.stdin = None
+        self.finished.emit(self.exit_code)
+
+    def read_buffer(self, name):
+        data = bytes(self.buffers[name])
+        self.buffers[name].clear()
+        return data
+
+    def readAllStandardOutput(self):
+        return self.read_buffer('stdout')
+
+    def readAllStandardError(self):
+        return self.read_buffer('stderr')
+
+    def write(self, data):
+        """Write to the script's stdin without blocking."""
+        if self.stdin:
+            self.stdin.write(bytes(data))
+
+    def closeWriteChannel(self):
+        """Close the script's stdin once everything written has been sent."""
+        if self.stdin:
+            self.stdin.finish()
+            self.stdin = None
+
+    def kill(self):
+        """Kill the child and any processes it started."""
+        if self.child_fds is not None:
+            # It hasn't been started yet, and now won't be. Closing the
+            # child's ends of the pipes ends the output.
+            self.close_child_fds()
+            self.exit_code = -signal.SIGKILL
+            QTimer.singleShot(0, self.check_finished)
+            return
+        if self.pid is None or self.exit_code is not None:
+            return
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # The child may not have made its process group yet
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+class WarmRunner(QObject):
+    """Manage a zygote process and start scripts from it."""
+    def __init__(self, python='python3', parent=None):
+        super().__init__(parent)
+        self.python = python
+        self.process = None
+        self.env = {}
+        self.tmpdir = None
+        self.sock_path = None
+
+    def can_run(self, program):
+        """Return True if we can run program's scripts."""
+        return program == self.python
+
+    def start(self, env=None):
+        """Start the zygote, if it is not already running.
+
+        env gives extra environment variables for the zygote; it must
+        include any that affect how the interpreter starts up, such as
+        PYTHONIOENCODING.
+
+        """
+        if env:
+            self.env.update(env)
+        if self.process and self.process.state() != QProcess.NotRunning:
+            return
+        self.stop()
+        self.tmpdir = tempfile.mkdtemp(prefix='puppy-runner-')
+        self.sock_path = os.path.join(self.tmpdir, 'zygote.sock')
+        self.process = QProcess(self)
+        qenv = QProcessEnvironment.systemEnvironment()
+        for k, v in self.env.items():
+            qenv.insert(k, v)
+        self.process.setProcessEnvironment(qenv)
+        self.process.setProcessChannelMode(QProcess.ForwardedChannels)
+        self.process.start(self.python, [ZYGOTE_SCRIPT, self.sock_path])
+
+    def connect(self):
+        """Connect to the zygote, starting it if necessary.
+
+        Return None if it is still starting up; raise OSError if it has
+        stopped.
+
+        """
+        self.start()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.sock_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if self.process.state() == QProcess.NotRunning:
+                raise ConnectionError("The Python process has stopped")
+            return None
+        return sock
+
+    def process_for(self, parent=None):
+        """Create a WarmProcess to run a script."""
+        return WarmProcess(self, parent=parent)
+
+    def stop(self):
+        """Stop the zygote."""
+        if self.process:
+            # The zygote exits when its stdin is closed
+            self.process.closeWriteChannel()
+            if not self.process.waitForFinished(1000):
+                self.process.kill()
+            self.process = None
+        if self.tmpdir:
+            try:
+                os.unlink(self.sock_path)
+            except OSError:
+                pass
+            try:
+                os.rmdir(self.tmpdir)
+            except OSError:
+                pass
+            self.tmpdir = None
+
+
+_runner = None
+
+
+def get_runner(env=None):
+    """Get the shared WarmRunner, or None if it is not enabled.
+
+    The zygote is started straight away, so that it is warm by the time the
+    user first clicks Run. env gives extra environment variables for it; see
+    WarmRunner.start().
+
+    """
+    global _runner
+    if not warm_runner_enabled():
+        return None
+    if _runner is None:
+        _runner = WarmRunner()
+        app = QCoreApplication.instance()
+        if app:
+            app.aboutToQuit.connect(_runner.stop)
+    _runner.start(env)
+    return _runner
@@ -0,0 +1,140 @@
+"""Save files in the background.
+
+Writing files can be slow, particularly when the projects directory is on a
+network share, so files are saved by a worker thread rather than the GUI
+thread. Files queued while the worker is busy are written together in the
+next batch.
+
+"""
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class SavePipeline(QObject):
+    """Write the files of a project on a worker thread."""
+
+    #: Emitted with a list of paths when they have been written
+    saved = pyqtSignal(list)
+
+    #: Emitted with {path: error message} for the files of a batch that could
+    #: not be saved
+    failed = pyqtSignal(dict)
+
+    #: Emitted with a path and an error message if a file was saved, but its
+    #: history could not be kept
+    history_failed = pyqtSignal(str, str)
+
+    def __init__(self, project, parent=None):
+        super().__init__(parent)
+        self.project = project
+        self.pending = {}
+        self.in_progress = set()
+        # Path -> error message, for files whose last save failed
+        self.errors = {}
+        self.cond = threading.Condition()
+        self.closed = False
+        self.thread = None
+
+    def submit(self, path, data):
+        """Queue data to be written to path.
+
+        Return False if there was nothing to do because the file already has
+        those contents. Files can't be submitted once the pipeline is closed.
+
+        """
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("SavePipeline is closed")
+            if path in self.pending:
+                if self.pending[path] == data:
+                    return False
+            elif not self.project.needs_write(path, data):
+                return False
+            self.pending[path] = data
+            if not self.thread:
+                self.thread = threading.Thread(
+                    target=self.work,
+                    name='save-' + self.project.name,
+                    daemon=True
+                )
+                self.thread.start()
+            self.cond.notify_all()
+        return True
+
+    def busy(self, paths=None):
+        """Return True if any of paths (or any file) is waiting to be saved."""
+        outstanding = self.pending.keys() | self.in_progress
+        if paths is None:
+            return bool(outstanding)
+        return not outstanding.isdisjoint(paths)
+
+    def wait(self, paths=None, timeout=None):
+        """Wait until the given paths (or all files) have been saved.
+
+        Return False if the timeout expired first.
+
+        """
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: not self.busy(paths),
+                timeout=timeout
+            )
+
+    def failures(self, paths=None):
+        """Get {path: error} for the given paths (or all files) whose last
+        save failed."""
+        with self.cond:
+            return {
+                path: error for path, error in self.errors.items()
+                if paths is None or path in paths
+            }
+
+    def close(self):
+        """Save everything outstanding and stop the worker thread."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+            thread = self.thread
+        if thread:
+            thread.join()
+
+    def work(self):
+        """Write batches of queued files until closed."""
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending or self.closed)
+                if not self.pending:
+                    # Let the next submit() start a new worker
+                    self.thread = None
+                    return
+                batch = self.pending
+                self.pending = {}
+                self.in_progress = set(batch)
+
+            try:
+                self.project.write_files(batch.items())
+            except Exception as e:
+                # Some of the files may have been replaced before the error;
+                # those no longer need writing
+                failed = {
+                    path: str(e) for path, data in batch.items()
+                    if self.project.needs_write(path, data)
+                }
+            else:
+                failed = {}
+            saved = [path for path in batch if path not in failed]
+
+            with self.cond:
+                for path in saved:
+                    self.errors.pop(path, None)
+                self.errors.update(failed)
+                self.in_progress = set()
+                self.cond.notify_all()
+            if saved:
+                self.saved.emit(saved)
+            if failed:
+                self.failed.emit(failed)
+            history_error = self.project.history.take_error()
+            if history_error:
+                path, e = history_error
+                self.history_failed.emit(path, str(e))
@@ -0,0 +1,381 @@
+"""Send data to a micro:bit at a pace it can keep up with.
+
+The MicroPython REPL reads from a small input buffer, and characters sent
+faster than it can echo them are lost. SerialWriter queues outgoing bytes,
+coalescing the many small writes made by typing or pasting, and sends them in
+small chunks spaced out in time.
+
+Code can also be executed through the raw REPL. This uses MicroPython's
+raw-paste mode, in which the device tells us how much it is ready to receive,
+where available, and falls back to the plain raw REPL where it isn't.
+
+"""
+import struct
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+# The most bytes sent at once when pacing output, and the time between
+# chunks in milliseconds. 32 bytes every 10ms is comfortably slower than the
+# micro:bit can echo characters at 115200 baud.
+CHUNK_SIZE = 32
+CHUNK_INTERVAL = 10
+
+# Chunk size and interval used when the device lacks raw-paste mode
+RAW_CHUNK_SIZE = 256
+RAW_CHUNK_INTERVAL = 10
+
+# Give up on the device if it says nothing for this long, in milliseconds
+RESPONSE_TIMEOUT = 5000
+
+# Control characters understood by the MicroPython REPL
+CTRL_A = b'\x01'   # enter raw REPL
+CTRL_B = b'\x02'   # leave raw REPL
+CTRL_C = b'\x03'   # interrupt the running program
+CTRL_D = b'\x04'   # end of data
+CTRL_E = b'\x05'   # enter paste mode, or raw-paste mode if in the raw REPL
+
+RAW_PROMPT = b'raw REPL; CTRL-B to exit\r\n>'
+RAW_PASTE_REQUEST = CTRL_E + b'A' + CTRL_A
+
+# States of a RawREPLJob
+ENTER_RAW = 'enter raw'
+PASTE_QUERY = 'paste query'
+PASTE_FALLBACK = 'paste fallback'
+PASTE_SEND = 'paste send'
+PASTE_END = 'paste end'
+RAW_SEND = 'raw send'
+WAIT_OK = 'wait ok'
+OUTPUT = 'output'
+ERROR_OUTPUT = 'error output'
+PROMPT = 'prompt'
+DONE = 'done'
+
+
+class RawREPLJob(QObject):
+    """Execute blocks of code on the device through the raw REPL.
+
+    The blocks are run one after another without leaving the raw REPL, and
+    block_done is emitted with the index, output and error output of each.
+    If a block fails the rest are skipped. finished is emitted at the end
+    with whether all the blocks ran without error, and the output and error
+    output of the last block run.
+
+    """
+    progress = pyqtSignal(int, int)
+    block_done = pyqtSignal(int, bytes, bytes)
+    finished = pyqtSignal(bool, bytes, bytes)
+
+    def __init__(self, writer, blocks):
+        super().__init__(writer)
+        self.writer = writer
+        self.blocks = blocks
+        self.index = 0
+        self.code = blocks[0]
+        self.sent = 0
+        self.total_sent = 0
+        self.total = sum(len(b) for b in blocks)
+        self.raw_paste = None
+        self.window = 0
+        self.window_remain = 0
+        self.buffer = bytearray()
+        self.output = b''
+        self.error = b''
+        self.state = None
+
+        self.timeout = QTimer(self)
+        self.timeout.setSingleShot(True)
+        self.timeout.setInterval(RESPONSE_TIMEOUT)
+        self.timeout.timeout.connect(
+            lambda: self.fail(b'No response from the device')
+        )
+        self.raw_timer = QTimer(self)
+        self.raw_timer.setInterval(RAW_CHUNK_INTERVAL)
+        self.raw_timer.timeout.connect(self.send_raw_chunk)
+
+    def start(self):
+        # Interrupt anything running, then enter the raw REPL
+        self.state = ENTER_RAW
+        self.writer.send_now(b'\r' + CTRL_C + CTRL_C + CTRL_A)
+        self.timeout.start()
+
+    def feed(self, data):
+        """Handle data received from the device."""
+        self.buffer += data
+        self.timeout.start()
+        while self.state != DONE and self.step():
+            pass
+
+    def step(self):
+        """Consume what we can from the buffer; return True on progress."""
+        buf = self.buffer
+        if self.state == ENTER_RAW:
+            idx = buf.find(RAW_PROMPT)
+            if idx == -1:
+                return False
+            del buf[:idx + len(RAW_PROMPT)]
+            self.writer.send_now(RAW_PASTE_REQUEST)
+            self.state = PASTE_QUERY
+
+        elif self.state == PASTE_QUERY:
+            if len(buf) < 2:
+                return False
+            if buf[:2] == b'R\x01':
+                if len(buf) < 4:
+                    return False
+                self.raw_paste = True
+                self.window, = struct.unpack('<H', buf[2:4])
+                self.window_remain = self.window
+                del buf[:4]
+                self.state = PASTE_SEND
+                self.send_window()
+            elif buf[:2] == b'R\x00':
+                # Raw-paste mode is understood but not supported
+                del buf[:2]
+                self.raw_paste = False
+                self.start_raw_send()
+            else:
+                # Older firmware doesn't know raw-paste mode at all, and
+                # just shows the raw REPL prompt again
+                self.state = PASTE_FALLBACK
+
+        elif self.state == PASTE_FALLBACK:
+            idx = buf.find(RAW_PROMPT[-10:])
+            if idx == -1:
+                return False
+            del buf[:idx + 10]
+            self.raw_paste = False
+            self.start_raw_send()
+
+        elif self.state == PASTE_SEND:
+            if not buf:
+                return False
+            b = buf[:1]
+            del buf[:1]
+            if b == CTRL_A:
+                # The device has room for another window of data
+                self.window_remain += self.window
+                self.send_window()
+            elif b == CTRL_D:
+                # The device wants us to stop
+                self.writer.send_now(CTRL_D)
+                self.state = OUTPUT
+            else:
+                self.fail(b'Unexpected response in raw-paste mode')
+
+        elif self.state == PASTE_END:
+            idx = buf.find(CTRL_D)
+            if idx == -1:
+                return False
+            del buf[:idx + 1]
+            self.state = OUTPUT
+
+        elif self.state == WAIT_OK:
+            if len(buf) < 2:
+                return False
+            if buf[:2] != b'OK':
+                self.fail(b'Device did not accept the code')
+                return False
+            del buf[:2]
+            self.state = OUTPUT
+
+        elif self.state == OUTPUT:
+            idx = buf.find(CTRL_D)
+            if idx == -1:
+                return False
+            self.output = bytes(buf[:idx])
+            del buf[:idx + 1]
+            self.state = ERROR_OUTPUT
+
+        elif self.state == ERROR_OUTPUT:
+            idx = buf.find(CTRL_D)
+            if idx == -1:
+                return False
+            self.error = bytes(buf[:idx])
+            del buf[:idx + 1]
+            self.state = PROMPT
+
+        elif self.state == PROMPT:
+            idx = buf.find(b'>')
+            if idx == -1:
+                return False
+            del buf[:idx + 1]
+            self.block_done.emit(self.index, self.output, self.error)
+            if self.state == DONE:
+                # A handler of block_done has failed the job
+                return False
+            if self.error:
+                self.finish(False)
+            elif self.index + 1 < len(self.blocks):
+                self.next_block()
+            else:
+                self.finish(True)
+
+        else:
+            return False
+        return True
+
+    def next_block(self):
+        """Start sending the next block of code."""
+        self.index += 1
+        self.code = self.blocks[self.index]
+        self.sent = 0
+        self.output = self.error = b''
+        if self.raw_paste:
+            self.writer.send_now(RAW_PASTE_REQUEST)
+            self.state = PASTE_QUERY
+        else:
+            self.start_raw_send()
+
+    def sent_bytes(self, n):
+        self.sent += n
+        self.total_sent += n
+        self.progress.emit(self.total_sent, self.total)
+
+    def send_window(self):
+        """Send as much code as the device has room for."""
+        n = min(self.window_remain, len(self.code) - self.sent)
+        if n:
+            self.writer.send_now(self.code[self.sent:self.sent + n])
+            self.window_remain -= n
+            self.sent_bytes(n)
+        if self.sent == len(self.code) and self.state == PASTE_SEND:
+            self.writer.send_now(CTRL_D)
+            self.state = PASTE_END
+
+    def start_raw_send(self):
+        self.state = RAW_SEND
+        self.raw_timer.start()
+
+    def send_raw_chunk(self):
+        """Send the next chunk of code without flow control."""
+        chunk = self.code[self.sent:self.sent + RAW_CHUNK_SIZE]
+        if chunk:
+            self.writer.send_now(chunk)
+            self.sent_bytes(len(chunk))
+            self.timeout.start()
+            return
+        self.raw_timer.stop()
+        self.writer.send_now(CTRL_D)
+        self.state = WAIT_OK
+
+    def fail(self, message):
+        self.error = message
+        self.finish(False)
+
+    def finish(self, ok):
+        if self.state == DONE:
+            return
+        self.state = DONE
+        self.timeout.stop()
+        self.raw_timer.stop()
+        # Go back to the normal REPL
+        self.writer.send_now(CTRL_B)
+        self.finished.emit(ok, self.output, self.error)
+        self.writer.job_done(self)
+
+
+class SerialWriter(QObject):
+    """Queue and pace the data written to a serial port.
+
+    While a RawREPLJob is running, typed input is held back until it has
+    finished, and data received from the device should be passed through
+    receive() so that the job can see it. idle is emitted when the last job
+    in the queue has finished.
+
+    """
+    idle = pyqtSignal()
+
+    def __init__(self, serial, parent=None):
+        super().__init__(parent)
+        self.serial = serial
+        self.queue = bytearray()
+        self.jobs = deque()
+        self.job = None
+        self.leftover = b''
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.pump)
+
+    def write(self, data):
+        """Queue data to be sent."""
+        self.queue += data
+        if not self.timer.isActive():
+            # Wait until control returns to the event loop, so that writes
+            # made in quick succession are sent together.
+            self.timer.start(0)
+
+    def paste(self, text):
+        """Send a block of text to the REPL as if it had been typed.
+
+        Multiple lines are sent using the REPL's paste mode, so that they are
+        not auto-indented.
+
+        """
+        data = text.replace('\r\n', '\n').replace('\n', '\r').encode('utf8')
+        if b'\r' in data:
+            data = CTRL_E + data + CTRL_D
+        self.write(data)
+
+    def pump(self):
+        """Send the next chunk of queued data."""
+        if self.job or not self.queue:
+            return
+        if self.serial.bytesToWrite():
+            # The last chunk has not gone yet
+            self.timer.start(CHUNK_INTERVAL)
+            return
+        chunk = bytes(self.queue[:CHUNK_SIZE])
+        del self.queue[:CHUNK_SIZE]
+        self.serial.write(chunk)
+        if self.queue:
+            self.timer.start(CHUNK_INTERVAL)
+
+    def send_now(self, data):
+        """Write data immediately, bypassing the queue."""
+        self.serial.write(data)
+
+    def execute(self, code):
+        """Run code on the device through the raw REPL.
+
+        code may be bytes, or a list of bytes to be run as separate blocks.
+        Return the RawREPLJob; connect to its signals to follow it.
+
+        """
+        if isinstance(code, bytes):
+            code = [code]
+        job = RawREPLJob(self, code)
+        self.jobs.append(job)
+        if not self.job:
+            QTimer.singleShot(0, self.next_job)
+        return job
+
+    def next_job(self):
+        if self.job or not self.jobs:
+            return
+        self.job = self.jobs.popleft()
+        self.job.start()
+
+    def job_done(self, job):
+        self.leftover = bytes(job.buffer)
+        self.job = None
+        job.deleteLater()
+        if self.jobs:
+            self.next_job()
+        else:
+            self.timer.start(0)
+            self.idle.emit()
+
+    def busy(self):
+        """Return True if any jobs are running or waiting to run."""
+        return self.job is not None or bool(self.jobs)
+
+    def receive(self, data):
+        """Handle data from the device, returning what should be shown."""
+        if self.job:
+            self.job.feed(data)
+            data = b''
+        data = self.leftover + data
+        self.leftover = b''
+        return data
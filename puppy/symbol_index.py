@@ -0,0 +1,159 @@
+"""An index of the names defined in a project's Python files.
+
+Each file is parsed with the ast module, and the names it defines (functions,
+classes, variables, arguments and imports) are recorded along with a hash of
+the file's contents, so that a file is only parsed again when it changes.
+Counts of how many files define each name are kept up to date as files are
+added and changed, and the sorted list of all names is only rebuilt when a
+name appears or disappears, so completing a prefix is a binary search.
+
+This module does no I/O and doesn't need Qt; see indexer.py for the worker
+that keeps an index up to date as the user edits.
+
+"""
+import ast
+import keyword
+import builtins
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+from .projects import digest
+
+
+# Names offered for completion in every project
+BUILTIN_NAMES = keyword.kwlist + list(vars(builtins))
+
+Symbol = namedtuple('Symbol', 'name kind line')
+
+
+def extract_symbols(source):
+    """Get the names defined in Python source, as a dict of Symbols.
+
+    Where a name is defined more than once, the first definition is kept.
+    Raises SyntaxError if source can't be parsed.
+
+    """
+    tree = ast.parse(source)
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            found.append(Symbol(node.name, 'function', node.lineno))
+        elif isinstance(node, ast.ClassDef):
+            found.append(Symbol(node.name, 'class', node.lineno))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == '*':
+                    continue
+                name = alias.asname or alias.name.split('.')[0]
+                found.append(Symbol(name, 'import', node.lineno))
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            found.append(Symbol(node.id, 'variable', node.lineno))
+        elif isinstance(node, ast.Attribute) and \
+                isinstance(node.ctx, ast.Store):
+            found.append(Symbol(node.attr, 'attribute', node.lineno))
+        elif isinstance(node, ast.arg):
+            found.append(Symbol(node.arg, 'argument', node.lineno))
+
+    # ast.walk() goes breadth first, so sort to find the first definitions
+    symbols = {}
+    for symbol in sorted(found, key=lambda s: s.line):
+        symbols.setdefault(symbol.name, symbol)
+    return symbols
+
+
+class SymbolIndex:
+    """The names defined in a set of files.
+
+    update() and remove() may be called on a worker thread while the GUI
+    thread calls completions() and definitions(). parse is called to get
+    the symbols in a file's source, and raises SyntaxError if it can't.
+
+    """
+    def __init__(self, extra=BUILTIN_NAMES, parse=extract_symbols):
+        self.parse = parse
+        self.lock = threading.Lock()
+        # path -> (digest of contents, {name: Symbol})
+        self.files = {}
+        # name -> number of files defining it
+        self.counts = {}
+        self.extra = frozenset(extra)
+        self.names = sorted(self.extra)
+
+    def __contains__(self, path):
+        return path in self.files
+
+    def is_current(self, path, source):
+        """Return True if path has already been indexed with source."""
+        entry = self.files.get(path)
+        return entry is not None and entry[0] == digest(source)
+
+    def update(self, path, source):
+        """Index the source of the file at path.
+
+        Return True if the names it defines have changed. If the source
+        can't be parsed we keep the names from the last version that could,
+        as the user is probably in the middle of typing.
+
+        """
+        d = digest(source)
+        old = self.files.get(path)
+        if old is not None and old[0] == d:
+            return False
+        old_symbols = old[1] if old else {}
+        try:
+            symbols = self.parse(source)
+        except (SyntaxError, ValueError):
+            symbols = old_symbols
+        with self.lock:
+            self.files[path] = (d, symbols)
+            self.count(old_symbols, symbols)
+        return symbols != old_symbols
+
+    def remove(self, path):
+        """Forget the file at path."""
+        with self.lock:
+            old = self.files.pop(path, None)
+            if old:
+                self.count(old[1], {})
+
+    def count(self, old, new):
+        """Update the name counts for a file changing from old to new."""
+        counts = self.counts
+        changed = False
+        for name in old.keys() - new.keys():
+            counts[name] -= 1
+            if not counts[name]:
+                del counts[name]
+                changed = True
+        for name in new.keys() - old.keys():
+            if name not in counts:
+                counts[name] = 0
+                changed = True
+            counts[name] += 1
+        if changed:
+            # Replace the list rather than changing it, so that readers on
+            # other threads always see a complete one.
+            self.names = sorted(self.extra.union(counts))
+
+    def completions(self, prefix, limit=None):
+        """Get the names starting with prefix, in sorted order."""
+        names = self.names
+        i = bisect_left(names, prefix)
+        result = []
+        while i < len(names) and names[i].startswith(prefix):
+            if names[i] != prefix:
+                result.append(names[i])
+                if limit and len(result) >= limit:
+                    break
+            i += 1
+        return result
+
+    def definitions(self, name):
+        """Get the (path, Symbol) of each definition of name."""
+        with self.lock:
+            return [
+                (path, symbols[name])
+                for path, (_, symbols) in sorted(self.files.items())
+                if name in symbols
+            ]
@@ -0,0 +1,63 @@
+"""Check Python source for syntax errors, without running it.
+
+Results are cached by a hash of the source, so going back to an earlier
+version of a file (by undoing, say) doesn't compile it again.
+
+"""
+import warnings
+from collections import OrderedDict, namedtuple
+
+from .projects import digest
+
+
+# The number of results kept in the cache
+CACHE_SIZE = 256
+
+# Where a syntax error was found. line and column count from 1; column and
+# end_column may be None if Python doesn't tell us.
+SyntaxProblem = namedtuple('SyntaxProblem', 'line column end_column message')
+
+
+def find_problem(source, filename='<string>'):
+    """Compile source, returning a SyntaxProblem or None if there is none."""
+    try:
+        with warnings.catch_warnings():
+            # Warnings like "invalid escape sequence" would otherwise be
+            # printed to Puppy's stderr
+            warnings.simplefilter('ignore')
+            compile(source, filename, 'exec', dont_inherit=True)
+    except SyntaxError as e:
+        end_column = None
+        if getattr(e, 'end_lineno', None) == e.lineno:
+            end_column = e.end_offset
+        return SyntaxProblem(e.lineno or 1, e.offset, end_column, e.msg)
+    except ValueError as e:
+        # Such as source containing null bytes
+        return SyntaxProblem(1, None, None, str(e))
+    return None
+
+
+class SyntaxChecker:
+    """Find syntax errors, remembering the results for recent sources.
+
+    find is called with a source and filename to check sources not cached.
+
+    """
+    def __init__(self, size=CACHE_SIZE, find=find_problem):
+        self.size = size
+        self.find = find
+        self.cache = OrderedDict()
+
+    def check(self, source, filename='<string>'):
+        """Get the SyntaxProblem in source, or None."""
+        key = digest(source)
+        try:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        except KeyError:
+            pass
+        problem = self.find(source, filename)
+        self.cache[key] = problem
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return problem
@@ -0,0 +1,48 @@
+"""The Jinja environment shared by all of Puppy's templates.
+
+Compiled templates are cached on disk, so each template is only compiled once
+rather than every time Puppy starts. Jinja itself is imported when a template
+is first needed, so that it doesn't slow down startup.
+
+"""
+import os
+import os.path
+
+
+_env = None
+
+
+def cache_dir(name):
+    """Get the path of a directory in which Puppy may cache data."""
+    base = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'puppy', name)
+
+
+def get_env():
+    """Get the Jinja environment, creating it on first use."""
+    global _env
+    if _env is None:
+        from jinja2 import (
+            Environment, ChoiceLoader, PackageLoader, FileSystemBytecodeCache
+        )
+        try:
+            path = cache_dir('jinja')
+            os.makedirs(path, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(path)
+        except OSError:
+            bytecode_cache = None
+        _env = Environment(
+            loader=ChoiceLoader([
+                PackageLoader('puppy', 'templates'),
+                PackageLoader('puppy.ui', 'templates'),
+            ]),
+            bytecode_cache=bytecode_cache,
+            auto_reload=False,
+        )
+    return _env
+
+
+def render(template_name, **params):
+    """Render the named template with the given parameters."""
+    return get_env().get_template(template_name).render(**params)
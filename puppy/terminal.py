@@ -0,0 +1,158 @@
+"""Connect programs run from the output pane to a pseudo-terminal.
+
+When a program's output goes to a pipe, Python and the C library buffer it
+in big blocks, so it shows up in the output pane in bursts rather than a line
+at a time as it would in a terminal. Running the program with a
+pseudo-terminal (pty) as its stdin, stdout and stderr makes it behave as if
+it were in a terminal, and lets the user type input to it.
+
+The pty's echo is turned off, as the output pane shows what the user types
+itself, and so is output processing, so that newlines aren't turned into
+\\r\\n.
+
+"""
+import os
+import errno
+from PyQt5.QtCore import QObject, QSocketNotifier, pyqtSignal
+
+
+# The size of the chunks in which we read the program's output
+READ_SIZE = 65536
+
+# The character that signals end of file on a terminal
+EOF_CHAR = b'\x04'
+
+
+def pty_available():
+    """Return True if we can run programs with a pseudo-terminal."""
+    return os.name == 'posix' and hasattr(os, 'openpty')
+
+
+class FdWriter(QObject):
+    """Write to a file descriptor without blocking, and close it when done.
+
+    Data that can't be written straight away is queued, and written when
+    the descriptor is ready for more.
+
+    """
+    def __init__(self, fd, parent=None):
+        super().__init__(parent)
+        self.fd = fd
+        self.queue = bytearray()
+        self.closing = False
+        os.set_blocking(fd, False)
+        self.notifier = QSocketNotifier(fd, QSocketNotifier.Write, self)
+        self.notifier.setEnabled(False)
+        self.notifier.activated.connect(self.write_queued)
+
+    def write(self, data):
+        if self.fd is None or self.closing:
+            return
+        self.queue += data
+        self.write_queued()
+
+    def write_queued(self):
+        try:
+            n = os.write(self.fd, self.queue)
+        except BlockingIOError:
+            n = 0
+        except OSError:
+            # The reader has gone away
+            self.queue.clear()
+            n = 0
+        del self.queue[:n]
+        if self.queue:
+            self.notifier.setEnabled(True)
+        elif self.closing:
+            self.close()
+        else:
+            self.notifier.setEnabled(False)
+
+    def finish(self):
+        """Close the descriptor once everything queued has been written."""
+        self.closing = True
+        if not self.queue:
+            self.close()
+
+    def close(self):
+        """Close the descriptor now, dropping anything still queued."""
+        if self.fd is None:
+            return
+        self.notifier.setEnabled(False)
+        self.queue.clear()
+        os.close(self.fd)
+        self.fd = None
+
+
+class PseudoTerminal(QObject):
+    """A pty for a program to run in.
+
+    Pass slave_name to the program, which should open it as its stdin,
+    stdout and stderr. readyRead is emitted when there is output to read
+    with read_all().
+
+    """
+    readyRead = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        import termios
+        self.master, self.slave = os.openpty()
+        self.slave_name = os.ttyname(self.slave)
+        attrs = termios.tcgetattr(self.slave)
+        attrs[1] &= ~termios.OPOST
+        attrs[3] &= ~(termios.ECHO | termios.ECHONL)
+        termios.tcsetattr(self.slave, termios.TCSANOW, attrs)
+
+        self.buffer = bytearray()
+        os.set_blocking(self.master, False)
+        self.notifier = QSocketNotifier(
+            self.master, QSocketNotifier.Read, self
+        )
+        self.notifier.activated.connect(self.on_read)
+        self.writer = FdWriter(os.dup(self.master), parent=self)
+
+    def on_read(self):
+        if self.read_available():
+            self.readyRead.emit()
+
+    def read_available(self):
+        """Read what the program has written so far; return True if any."""
+        read = False
+        while self.master is not None:
+            try:
+                data = os.read(self.master, READ_SIZE)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                # EIO means every process has closed the slave
+                if e.errno != errno.EIO:
+                    raise
+                self.notifier.setEnabled(False)
+                break
+            if not data:
+                break
+            self.buffer += data
+            read = True
+        return read
+
+    def read_all(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+    def write(self, data):
+        """Send data to the program's stdin."""
+        self.writer.write(data)
+
+    def send_eof(self):
+        self.writer.write(EOF_CHAR)
+
+    def close(self):
+        if self.master is None:
+            return
+        self.notifier.setEnabled(False)
+        self.writer.close()
+        os.close(self.master)
+        os.close(self.slave)
+        self.master = self.slave = None
@@ -0,0 +1,140 @@
+"""Copy files onto a micro:bit over its serial REPL.
+
+The file is sent as a series of small blocks of Python code, each of which
+writes a chunk of the file and prints the number of bytes written and their
+checksum. The blocks are run one after another in the raw REPL (see
+serial_writer.py), and each reply is checked, so a corrupted chunk is noticed
+straight away. Finally the whole file is read back and checked.
+
+The file is written under a temporary name, and only replaces the file of
+the given name once it has been checked, so that a failed copy doesn't leave
+a truncated main.py to be run when the micro:bit is next reset.
+
+"""
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+# The number of bytes of the file written by each block. Each block must be
+# compiled on the device, so this is limited by the micro:bit's small heap.
+CHUNK_SIZE = 512
+
+# Added to the name of the file while it is being written
+TEMP_SUFFIX = '.tmp'
+
+
+def checksum(data):
+    """A checksum that is cheap to compute in MicroPython."""
+    return sum(data) & 0xffff
+
+
+class FileTransfer(QObject):
+    """Copy a file to a device using a SerialWriter.
+
+    progress is emitted with the number of bytes sent and the total, and
+    finished with whether the copy succeeded and a message for the user.
+
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, writer, name, data, parent=None):
+        super().__init__(parent)
+        self.writer = writer
+        self.name = name
+        self.temp_name = name + TEMP_SUFFIX
+        self.data = data
+        self.chunks = [
+            data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)
+        ]
+        self.job = None
+
+    def blocks(self):
+        """Generate the code to run on the device, as a list of bytes."""
+        blocks = [
+            'f = open({!r}, "wb")\nw = f.write\n'.format(self.temp_name)
+            .encode()
+        ]
+        for chunk in self.chunks:
+            blocks.append(
+                'b = {!r}\nprint(w(b), sum(b) & 0xffff)\n'.format(chunk)
+                .encode()
+            )
+        # Read the file back a chunk at a time, as the micro:bit hasn't the
+        # memory to hold much of it at once
+        blocks.append(
+            'f.close()\n'
+            'f = open({tmp!r}, "rb")\n'
+            'r = f.read\n'
+            'n = c = 0\n'
+            'b = r({size})\n'
+            'while b:\n'
+            ' n += len(b)\n'
+            ' c = (c + sum(b)) & 0xffff\n'
+            ' b = r({size})\n'
+            'f.close()\n'
+            'print(n, c)\n'
+            'del f, w, r, b, n, c\n'.format(
+                tmp=self.temp_name, size=CHUNK_SIZE
+            ).encode()
+        )
+        # Only run once the checksum above has been checked. The micro:bit's
+        # os module has no rename(), so there the checked file is copied over
+        # the old one instead. That isn't atomic: if the micro:bit is reset
+        # part way through, the file is left truncated. But the checked copy
+        # is only removed once it has been copied, so it can be copied again.
+        blocks.append(
+            'import os\n'
+            'try:\n'
+            ' os.rename({tmp!r}, {name!r})\n'
+            'except AttributeError:\n'
+            ' f = open({tmp!r}, "rb")\n'
+            ' g = open({name!r}, "wb")\n'
+            ' b = f.read({size})\n'
+            ' while b:\n'
+            '  g.write(b)\n'
+            '  b = f.read({size})\n'
+            ' g.close()\n'
+            ' f.close()\n'
+            ' del f, g, b\n'
+            ' os.remove({tmp!r})\n'.format(
+                tmp=self.temp_name, name=self.name, size=CHUNK_SIZE
+            ).encode()
+        )
+        return blocks
+
+    def expected(self, index):
+        """Get the reply expected to the block at index, or None."""
+        if index == 0 or index > len(self.chunks) + 1:
+            return None
+        if index <= len(self.chunks):
+            chunk = self.chunks[index - 1]
+        else:
+            chunk = self.data
+        return '{} {}'.format(len(chunk), checksum(chunk)).encode()
+
+    def start(self):
+        self.job = self.writer.execute(self.blocks())
+        self.job.progress.connect(self.on_progress)
+        self.job.block_done.connect(self.on_block_done)
+        self.job.finished.connect(self.on_finished)
+
+    def on_progress(self, sent, total):
+        # Report progress in terms of the file rather than the code
+        self.progress.emit(len(self.data) * sent // total, len(self.data))
+
+    def on_block_done(self, index, output, error):
+        expected = self.expected(index)
+        if error or expected is None:
+            return
+        if output.strip() != expected:
+            self.job.fail(b'Checksum mismatch; the file was not copied')
+
+    def on_finished(self, ok, output, error):
+        if ok:
+            self.finished.emit(True, "Copied {} to the micro:bit".format(
+                self.name
+            ))
+        else:
+            self.finished.emit(False, "Could not copy {}: {}".format(
+                self.name, error.decode('utf8', 'replace').strip()
+            ))
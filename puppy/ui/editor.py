@@ -1,11 +1,23 @@
+from functools import partial
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QTabWidget, QToolBar, QAction, QScrollArea,
-    QSplitter
+    QSplitter, QMessageBox, QProgressBar, QShortcut, QMenu, QToolButton,
+    QLabel
 )
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtCore import Qt, QSize, QTimer
+from PyQt5.QtGui import QKeySequence
 from PyQt5.QtSvg import QSvgWidget
-from .editorpane import EditorPane
+from .editorpane import EditorPane, PagedPane
 from ..resources import load_icon
+from ..saving import SavePipeline
+from ..autosave import Autosaver
+from ..indexer import SymbolIndexer
+from ..instrument import timed
+from ..large_files import LARGE_FILE_SIZE, HUGE_FILE_SIZE
+
+# The range of zoom levels QScintilla allows
+MIN_ZOOM = -10
+MAX_ZOOM = 20
 
 
 class ButtonBar(QToolBar):
@@ -43,11 +55,11 @@ class ButtonBar(QToolBar):
             "Run", self,
             statusTip="Run your Python file",
             triggered=self.editor.project.run)
-        # self.build_python_file_act = QAction(
-        #     load_icon("build"),
-        #     "Build", self,
-        #     statusTip="Build Python into Hex file",
-        #     triggered=self._build_python_file)
+        self.build_python_file_act = QAction(
+            load_icon("build"),
+            "Flash", self,
+            statusTip="Put your program onto the micro:bit",
+            triggered=self._build_python_file)
         self.zoom_in_act = QAction(
             load_icon("zoom-in"),
             "Zoom in", self,
@@ -58,17 +70,44 @@ class ButtonBar(QToolBar):
             "Zoom out", self,
             statusTip="Make the text smaller",
             triggered=self.editor.zoom_out)
+        self.projects_menu = QMenu(self)
+        self.projects_menu.aboutToShow.connect(self._fill_projects_menu)
+        self.projects_act = QAction(
+            load_icon("open"),
+            "Projects", self,
+            statusTip="Switch to another project")
+        self.projects_act.setMenu(self.projects_menu)
 
         # Add the actions to the button bar.
 
         self.addAction(self.close_project_act)
+        self.addAction(self.projects_act)
+        self.widgetForAction(self.projects_act).setPopupMode(
+            QToolButton.InstantPopup
+        )
         self.addAction(self.save_python_file_act)
         self.addAction(self.run_python_file_act)
-        # self.addAction(self.build_python_file_act)
+        if hasattr(self.editor.project, 'build'):
+            self.addAction(self.build_python_file_act)
         self.addSeparator()
         self.addAction(self.zoom_in_act)
         self.addAction(self.zoom_out_act)
 
+    def _fill_projects_menu(self):
+        """List the open projects, to switch between them."""
+        menu = self.projects_menu
+        menu.clear()
+        window = self.editor.parentWidget()
+        for entry in window.workspace:
+            name = entry.project.name
+            act = menu.addAction(
+                name, partial(window.workspace.switch_to, name)
+            )
+            act.setCheckable(True)
+            act.setChecked(entry.project is self.editor.project)
+        menu.addSeparator()
+        menu.addAction("All projects...", window.show_project_manager)
+
     def _new_python_file():
         """
         Handle the creation of a new Python file.
@@ -93,11 +132,25 @@ class ButtonBar(QToolBar):
         """
         pass
 
-    def _build_python_file():
+    def _build_python_file(self):
         """
-        Generate a .hex file to flash onto a micro:bit.
+        Put the program onto a micro:bit.
         """
-        pass
+        self.editor.project.build()
+
+
+class PendingTab(QWidget):
+    """A placeholder for a file tab that has not been opened yet.
+
+    Reading the file and setting up an EditorPane for it is put off until the
+    tab is first shown.
+
+    """
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        # The cursor and scroll position to restore, from a snapshot
+        self.view_state = None
 
 
 class TabPane(QTabWidget):
@@ -118,6 +171,16 @@ class Editor(QWidget):
     def __init__(self, project, parent=None):
         super().__init__(parent)
         self.project = project
+        self.saver = SavePipeline(project, parent=self)
+        self.saver.failed.connect(self.on_save_failed)
+        # Save failures not yet reported, and whether they are being shown
+        self.save_failures = {}
+        self.reporting_failures = False
+        self.saver.history_failed.connect(self.on_history_failed)
+        self.autosaver = Autosaver(self)
+        # Index the project's Python files, for completion
+        self.indexer = SymbolIndexer(project, parent=self)
+        self.indexer.scan()
 
         # Vertical box layout.
         self.layout = QVBoxLayout()
@@ -131,6 +194,19 @@ class Editor(QWidget):
         self.layout.addWidget(self.buttons)
         self.layout.addWidget(self.splitter)
         self.splitter.addWidget(self.tabs)
+        # Shows the progress of long jobs, such as flashing a micro:bit
+        self.progress = QProgressBar()
+        self.progress.hide()
+        self.layout.addWidget(self.progress)
+        # Shows problems the user should know about, such as failed autosaves
+        self.status = QLabel()
+        self.status.setObjectName('status')
+        self.status.setWordWrap(True)
+        self.status.hide()
+        self.layout.addWidget(self.status)
+        self.tabs.currentChanged.connect(self.load_tab)
+        self.zoom = 0
+        QShortcut(QKeySequence(Qt.Key_F12), self, self.goto_definition)
         # Ensure we have a minimal sensible size for the application.
         self.setMinimumSize(800, 600)
 
@@ -138,9 +214,107 @@ class Editor(QWidget):
         self.splitter.addWidget(pane)
 
     def add_tab(self, path):
-        text = self.project.read_file(path)
-        editor = EditorPane(path, text)
-        self.tabs.addTab(editor, path)
+        """Add a tab for the file at path; it is loaded when first shown."""
+        index = self.tabs.addTab(PendingTab(path), path)
+        if index == self.tabs.currentIndex():
+            self.load_tab(index)
+
+    def load_tab(self, index):
+        """Replace the placeholder at index, if any, with an EditorPane."""
+        tab = self.tabs.widget(index)
+        if not isinstance(tab, PendingTab):
+            return
+        size = self.project.file_size(tab.path)
+        if size > HUGE_FILE_SIZE:
+            editor = PagedPane(tab.path, self.project.open_pager(tab.path))
+        elif size > LARGE_FILE_SIZE:
+            editor = EditorPane(tab.path, '', large=True)
+            self.style_pane(editor)
+            # Only watch it for edits once it has all been loaded
+            editor.loaded.connect(partial(self.autosaver.watch, editor))
+            editor.load_chunks(self.project.read_chunks(tab.path))
+            if tab.view_state:
+                editor.loaded.connect(
+                    partial(editor.restore_view_state, tab.view_state)
+                )
+        else:
+            text = self.project.read_file(tab.path)
+            editor = EditorPane(tab.path, text)
+            self.style_pane(editor)
+            self.autosaver.watch(editor)
+            if tab.path.endswith('.py'):
+                editor.set_symbols(self.indexer.index)
+                self.indexer.watch(editor)
+            if tab.view_state:
+                editor.restore_view_state(tab.view_state)
+
+        current = self.tabs.currentIndex()
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, editor, tab.path)
+        self.tabs.setCurrentIndex(current)
+        self.tabs.blockSignals(False)
+        tab.deleteLater()
+        return editor
+
+    def style_pane(self, editor):
+        """Give a new EditorPane the current zoom."""
+        if self.zoom:
+            editor.zoomTo(self.zoom)
+
+    def editor_panes(self):
+        """Iterate over the EditorPanes for the files that have been opened."""
+        for tab in self.tabs:
+            if isinstance(tab, EditorPane):
+                yield tab
+
+    def find_tab(self, path):
+        """Get the index of the tab for path, or -1."""
+        for index, tab in enumerate(self.tabs):
+            if getattr(tab, 'path', None) == path:
+                return index
+        return -1
+
+    def goto_definition(self):
+        """Show where the name under the cursor is defined."""
+        pane = self.tabs.currentWidget()
+        if not isinstance(pane, EditorPane):
+            return
+        definitions = self.indexer.index.definitions(pane.word_at_cursor())
+        if not definitions:
+            return
+        # Prefer a definition in the file being edited
+        path, symbol = next(
+            (d for d in definitions if d[0] == pane.path), definitions[0]
+        )
+        index = self.find_tab(path)
+        if index == -1:
+            self.add_tab(path)
+            index = self.find_tab(path)
+        self.tabs.setCurrentIndex(index)
+        target = self.tabs.widget(index)
+        if not isinstance(target, EditorPane):
+            return
+        target.setCursorPosition(symbol.line - 1, 0)
+        target.ensureLineVisible(symbol.line - 1)
+        target.setFocus()
+
+    def show_progress(self, message, done, total):
+        """Show the progress of a long-running job."""
+        self.progress.setFormat(message + ' %p%')
+        self.progress.setRange(0, total)
+        self.progress.setValue(done)
+        self.progress.show()
+
+    def finish_progress(self, ok, message):
+        """Show that a job has finished, with a message for the user."""
+        if ok:
+            self.progress.setFormat(message)
+            self.progress.setValue(self.progress.maximum())
+            QTimer.singleShot(3000, self.progress.hide)
+        else:
+            self.progress.hide()
+            QMessageBox.warning(self, "Something went wrong", message)
 
     def add_svg(self, title, data):
         svg = QSvgWidget()
@@ -150,28 +324,173 @@ class Editor(QWidget):
         self.tabs.addTab(scrollpane, title)
 
     def close(self):
-        """Close this project."""
+        """Close this project, unless its files could not be saved."""
+        if self.shutdown():
+            self.parentWidget().close_project(self.project)
+
+    def shutdown(self):
+        """Save everything and stop all background work, before closing.
+
+        If any file could not be saved, nothing is stopped and False is
+        returned, so that the project can stay open for the user to try
+        again; on_save_failed() will have told them what went wrong.
+
+        """
         self.save_all()
-        self.parentWidget().close_project(self.project)
+        self.saver.wait()
+        if self.saver.failures():
+            return False
+        self.saver.close()
+        self.indexer.close()
+        flasher = getattr(self.project, 'flasher', None)
+        if flasher:
+            # Don't leave a half-written .hex file on the micro:bit
+            flasher.wait()
+        # Unmap huge files, which would otherwise stay mapped (and, on
+        # Windows, locked) until Puppy exits
+        for tab in self.tabs:
+            if isinstance(tab, PagedPane):
+                tab.release()
+        # Stop any program still running, and release serial ports
+        for i in range(self.splitter.count()):
+            pane = self.splitter.widget(i)
+            if hasattr(pane, 'kill'):
+                pane.kill()
+        return True
+
+    def snapshot(self):
+        """Get the state of the editor, to be restored by restore()."""
+        tabs = []
+        for tab in self.tabs:
+            if isinstance(tab, EditorPane):
+                tabs.append((tab.path, tab.view_state()))
+            elif isinstance(tab, PendingTab):
+                tabs.append((tab.path, tab.view_state))
+        return {
+            'tabs': tabs,
+            'current': self.tabs.currentIndex(),
+            'zoom': self.zoom,
+            'splitter': self.splitter.sizes(),
+        }
+
+    def restore(self, snapshot):
+        """Restore a snapshot of a previous editor for the project.
+
+        Tabs are reopened as placeholders, so that only the current tab's
+        file is read straight away.
+
+        """
+        if snapshot['zoom']:
+            self.set_zoom(snapshot['zoom'])
+        for path, view_state in snapshot['tabs']:
+            index = self.find_tab(path)
+            if index == -1:
+                index = self.tabs.addTab(PendingTab(path), path)
+            tab = self.tabs.widget(index)
+            if isinstance(tab, PendingTab):
+                tab.view_state = view_state
+            elif isinstance(tab, EditorPane) and view_state:
+                tab.restore_view_state(view_state)
+        self.tabs.setCurrentIndex(snapshot['current'])
+        self.splitter.setSizes(snapshot['splitter'])
+
+    def update_panes(self, func):
+        """Call func on every open EditorPane, repainting only once."""
+        self.tabs.setUpdatesEnabled(False)
+        try:
+            for tab in self.editor_panes():
+                func(tab)
+        finally:
+            self.tabs.setUpdatesEnabled(True)
+
+    def set_zoom(self, zoom):
+        """Set the zoom level of all the editors."""
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        self.zoom = zoom
+        self.update_panes(lambda tab: tab.zoomTo(zoom))
 
     def zoom_in(self):
         """Make the text BIGGER."""
-        for tab in self.tabs:
-            if hasattr(tab, 'zoomIn'):
-                tab.zoomIn(2)
+        self.set_zoom(self.zoom + 2)
 
     def zoom_out(self):
         """Make the text smaller."""
-        for tab in self.tabs:
-            if hasattr(tab, 'zoomOut'):
-                tab.zoomOut(2)
+        self.set_zoom(self.zoom - 2)
 
+    @timed('Editor.save_all')
     def save_all(self):
-        """Save all files."""
-        for tab in self.tabs:
-            # FIXME: need a better definition of which tabs should be saved
-            # Or create a signal for the saving of this whole component and
-            # register callbacks on the panes when they are created
-            if isinstance(tab, EditorPane) and tab.isModified():
-                self.project.write_file(tab.path, tab.text())
+        """Save all files.
+
+        Tabs that have never been shown cannot have been modified, so only
+        the files that have been opened need to be checked. Files that could
+        not be saved last time are tried again: the editor widgets can't be
+        marked as modified again once they have been saved. The files are
+        written in the background; use self.saver.wait() to wait for them.
+
+        """
+        paths = {tab.path for tab in self.editor_panes() if tab.isModified()}
+        paths |= self.autosaver.edited
+        paths |= self.saver.failures().keys()
+        self.save_files(paths)
+        self.autosaver.clear()
+
+    def save_files(self, paths):
+        """Save the open files at paths, in the background."""
+        paths = set(paths)
+        for tab in self.editor_panes():
+            if tab.path in paths and not tab.is_loading():
+                self.saver.submit(tab.path, tab.text())
                 tab.setModified(False)
+
+    def show_status(self, message):
+        """Show a message below the editor, without interrupting the user."""
+        self.status.setText(message)
+        self.status.show()
+
+    def clear_status(self):
+        self.status.hide()
+
+    def on_save_failed(self, failures):
+        """Called with {path: error} for files that could not be saved."""
+        if self.autosaver.on_failed(failures):
+            # Autosave failures are shown without a dialog, so as not to
+            # interrupt the user's typing
+            return
+        self.save_failures.update(failures)
+        if not self.reporting_failures:
+            # Wait for any other failures from the same save
+            QTimer.singleShot(0, self.report_save_failures)
+
+    def report_save_failures(self):
+        """Tell the user about every file that could not be saved, at once."""
+        if self.reporting_failures:
+            return
+        self.reporting_failures = True
+        try:
+            # Saves may fail again while the message is shown
+            while self.save_failures:
+                failures, self.save_failures = self.save_failures, {}
+                if len(failures) == 1:
+                    [(path, error)] = failures.items()
+                    message = "{} could not be saved:\n\n{}".format(
+                        path, error
+                    )
+                else:
+                    message = "These files could not be saved:\n\n" + \
+                        '\n'.join(
+                            "{}: {}".format(path, error)
+                            for path, error in sorted(failures.items())
+                        )
+                QMessageBox.warning(self, "Could not save", message)
+        finally:
+            self.reporting_failures = False
+
+    def on_history_failed(self, path, error):
+        """Called if a file was saved but its history could not be kept."""
+        QMessageBox.warning(
+            self,
+            "Could not keep history",
+            "{} was saved, but its history could not be kept:\n\n{}".format(
+                path, error
+            )
+        )
@@ -1,8 +1,15 @@
 import sys
 import keyword
+import builtins
 import os.path
-from PyQt5.Qsci import QsciScintilla, QsciLexerPython
+from PyQt5.Qsci import (
+    QsciScintilla, QsciLexerPython, QsciAbstractAPIs, QsciStyle
+)
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
+)
 from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtCore import QTimer, pyqtSignal
 
 
 # FONT related constants:
@@ -14,6 +21,15 @@ if sys.platform == 'win32':
 elif sys.platform == 'darwin':
     DEFAULT_FONT = 'Monaco'
 
+# The most completions offered at once
+COMPLETION_LIMIT = 200
+
+# The margin, marker and indicator used to show syntax errors
+SYNTAX_MARGIN = 1
+SYNTAX_MARKER = 8
+SYNTAX_INDICATOR = 8
+SYNTAX_COLOR = '#d00000'
+
 
 class Font:
     def __init__(self, color='black', paper='white', bold=False, italic=False):
@@ -24,29 +40,59 @@ class Font:
 
 ALL_STYLES = -1
 
+# Style tables built by Theme.styles(), keyed by (theme, lexer class)
+_style_tables = {}
+
 
 class Theme:
     @classmethod
-    def apply_to(cls, lexer):
-        # Apply a font for all styles
-        font = QFont(DEFAULT_FONT, DEFAULT_FONT_SIZE)
-        font.setBold(False)
-        font.setItalic(False)
-        lexer.setFont(font, ALL_STYLES)
+    def styles(cls, lexer_class):
+        """Get the default font and a table of styles for a lexer class.
+
+        Each row of the table is (style number, color, paper, font), where
+        font is None if the style uses the default font. The table is built
+        once per theme and lexer class and shared by every editor.
 
+        """
+        key = (cls, lexer_class)
+        try:
+            return _style_tables[key]
+        except KeyError:
+            pass
+
+        default_font = QFont(DEFAULT_FONT, DEFAULT_FONT_SIZE)
+        default_font.setBold(False)
+        default_font.setItalic(False)
+
+        table = []
         for name, font in cls.__dict__.items():
             if not isinstance(font, Font):
                 continue
 
-            style_num = getattr(lexer, name)
-            lexer.setColor(QColor(font.color), style_num)
-            lexer.setEolFill(True, style_num)
-            lexer.setPaper(QColor(font.paper), style_num)
+            style_num = getattr(lexer_class, name)
+            f = None
             if font.bold or font.italic:
                 f = QFont(DEFAULT_FONT, DEFAULT_FONT_SIZE)
                 f.setBold(font.bold)
                 f.setItalic(font.italic)
-                lexer.setFont(f, style_num)
+            table.append(
+                (style_num, QColor(font.color), QColor(font.paper), f)
+            )
+        _style_tables[key] = default_font, table
+        return default_font, table
+
+    @classmethod
+    def apply_to(cls, lexer):
+        default_font, table = cls.styles(type(lexer))
+        # Apply a font for all styles
+        lexer.setFont(default_font, ALL_STYLES)
+
+        for style_num, color, paper, font in table:
+            lexer.setColor(color, style_num)
+            lexer.setEolFill(True, style_num)
+            lexer.setPaper(paper, style_num)
+            if font:
+                lexer.setFont(font, style_num)
 
 
 class PythonTheme(Theme):
@@ -64,6 +110,13 @@ class PythonTheme(Theme):
 
 
 class PythonLexer(QsciLexerPython):
+    # The keyword lists are the same for every lexer, so we only build them
+    # once.
+    KEYWORDS = {
+        1: ' '.join(keyword.kwlist + ['self', 'cls']),
+        2: ' '.join(vars(builtins)),
+    }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setHighlightSubidentifiers(False)
@@ -72,25 +125,41 @@ class PythonLexer(QsciLexerPython):
         """
         Returns a list of Python keywords.
         """
+        return self.KEYWORDS.get(flag)
 
-        if flag == 1:
-            kws = keyword.kwlist + ['self', 'cls']
-        elif flag == 2:
-            kws = __builtins__.keys()
-        else:
-            return None
 
-        return ' '.join(kws)
+class SymbolAPIs(QsciAbstractAPIs):
+    """Offer the names in a SymbolIndex for autocompletion."""
+    def __init__(self, lexer, index):
+        super().__init__(lexer)
+        self.index = index
+
+    def updateAutoCompletionList(self, context, options):
+        if not context:
+            return options
+        return options + self.index.completions(context[-1], COMPLETION_LIMIT)
+
+    def callTips(self, context, commas, style, shifts):
+        return []
 
 
 class EditorPane(QsciScintilla):
     """
     Represents the text editor.
+
+    A large file is shown without syntax highlighting or brace matching, as
+    these slow down editing a big document.
     """
 
-    def __init__(self, path, text):
+    #: Emitted when the text given to load_chunks() has all been added
+    loaded = pyqtSignal()
+
+    def __init__(self, path, text, large=False):
         super().__init__()
         self.path = path
+        self.large = large
+        self.syntax_problem = None
+        self.chunks = None
         self.setText(text)
         self.configure()
 
@@ -110,19 +179,190 @@ class EditorPane(QsciScintilla):
         self.setEdgeColumn(79)
         self.setMarginLineNumbers(0, True)
         self.setMarginWidth(0, 50)
-        self.setBraceMatching(QsciScintilla.SloppyBraceMatch)
+        if not self.large:
+            self.setBraceMatching(QsciScintilla.SloppyBraceMatch)
+        self.configure_syntax_markers()
         # Use the lexer defined above (and must save a reference to it)
         self.lexer = self.choose_lexer()
         self.setLexer(self.lexer)
         self.SendScintilla(QsciScintilla.SCI_SETHSCROLLBAR, 0)
 
+    def configure_syntax_markers(self):
+        """Set up the marker, underline and note used for syntax errors."""
+        color = QColor(SYNTAX_COLOR)
+        self.setMarginType(SYNTAX_MARGIN, QsciScintilla.SymbolMargin)
+        self.setMarginWidth(SYNTAX_MARGIN, 14)
+        self.setMarginMarkerMask(SYNTAX_MARGIN, 1 << SYNTAX_MARKER)
+        self.markerDefine(QsciScintilla.Circle, SYNTAX_MARKER)
+        self.setMarkerBackgroundColor(color, SYNTAX_MARKER)
+        self.setMarkerForegroundColor(color, SYNTAX_MARKER)
+        self.indicatorDefine(QsciScintilla.SquiggleIndicator, SYNTAX_INDICATOR)
+        self.setIndicatorForegroundColor(color, SYNTAX_INDICATOR)
+        self.setAnnotationDisplay(QsciScintilla.AnnotationBoxed)
+        self.syntax_style = QsciStyle(
+            -1, 'syntax error', color, QColor('#fff0f0'), self.font()
+        )
+
+    def show_syntax_problem(self, problem):
+        """Mark a SyntaxProblem in the text, or clear the mark if None."""
+        if problem == self.syntax_problem:
+            return
+        if self.syntax_problem:
+            self.markerDeleteAll(SYNTAX_MARKER)
+            self.clearIndicatorRange(
+                0, 0, self.lines(), 0, SYNTAX_INDICATOR
+            )
+            self.clearAnnotations()
+        self.syntax_problem = problem
+        if not problem:
+            return
+
+        line = min(problem.line, self.lines()) - 1
+        text = self.text(line).rstrip('\r\n')
+        length = len(text)
+        start = min(max((problem.column or 1) - 1, 0), length)
+        end = problem.end_column - 1 if problem.end_column else length
+        end = min(max(end, start + 1), length)
+        # Python counts characters, but QScintilla indexes lines in bytes
+        start, end = (len(text[:i].encode('utf8')) for i in (start, end))
+        self.markerAdd(line, SYNTAX_MARKER)
+        self.fillIndicatorRange(line, start, line, end, SYNTAX_INDICATOR)
+        self.annotate(line, problem.message, self.syntax_style)
+
     def choose_lexer(self):
+        # QScintilla ties each lexer to a single editor, so every pane needs
+        # its own; the theme's style table is shared between them.
         _, ext = os.path.splitext(self.path)
-        if ext == '.py':
+        if ext == '.py' and not self.large:
             lex = PythonLexer()
             PythonTheme.apply_to(lex)
             return lex
         return None
 
+    def load_chunks(self, chunks):
+        """Add the text from an iterable of strings, a chunk at a time.
+
+        Each chunk is added in a separate pass of the event loop, so that
+        Puppy stays responsive while a big file loads. The editor is
+        read-only until it has all been added.
+
+        """
+        self.chunks = iter(chunks)
+        self.setReadOnly(True)
+        self.setUndoCollection(False)
+        QTimer.singleShot(0, self.load_next_chunk)
+
+    def is_loading(self):
+        return self.chunks is not None
+
+    def load_next_chunk(self):
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.finish_loading()
+        except (OSError, ValueError) as e:
+            self.finish_loading(e)
+        else:
+            self.append(chunk)
+            QTimer.singleShot(0, self.load_next_chunk)
+
+    def finish_loading(self, error=None):
+        self.chunks = None
+        self.setUndoCollection(True)
+        self.setModified(False)
+        # Size the line number margin once, rather than as lines are added
+        self.setMarginWidth(0, '9' * (len(str(self.lines())) + 1))
+        if error:
+            # Don't let the user save what we could read over the file
+            self.annotate(
+                self.lines() - 1,
+                "Could not read the rest of this file: {}".format(error),
+                self.syntax_style
+            )
+        else:
+            self.setReadOnly(False)
+        self.loaded.emit()
+
+    def view_state(self):
+        """Get the cursor and scroll position, to restore later."""
+        return {
+            'cursor': self.getCursorPosition(),
+            'first_line': self.firstVisibleLine(),
+            'x_offset': self.SendScintilla(QsciScintilla.SCI_GETXOFFSET),
+        }
+
+    def restore_view_state(self, state):
+        """Restore a cursor and scroll position from view_state()."""
+        self.setCursorPosition(*state['cursor'])
+        self.setFirstVisibleLine(state['first_line'])
+        self.SendScintilla(QsciScintilla.SCI_SETXOFFSET, state['x_offset'])
+
+    def set_symbols(self, index):
+        """Complete names from a SymbolIndex as the user types."""
+        if not self.lexer:
+            return
+        self.apis = SymbolAPIs(self.lexer, index)
+        self.setAutoCompletionSource(QsciScintilla.AcsAPIs)
+        self.setAutoCompletionThreshold(2)
+        self.setAutoCompletionCaseSensitivity(True)
+
+    def word_at_cursor(self):
+        line, index = self.getCursorPosition()
+        return self.wordAtLineIndex(line, index)
+
     def needs_write(self):
         return self.isModified()
+
+
+class PagedPane(QWidget):
+    """Show a file too big to edit, read-only and a page at a time."""
+    def __init__(self, path, pager, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.pager = pager
+        self.page_num = 0
+
+        layout = QVBoxLayout(self)
+        bar = QHBoxLayout()
+        self.prev_button = QPushButton("Previous page")
+        self.prev_button.clicked.connect(
+            lambda: self.show_page(self.page_num - 1)
+        )
+        self.next_button = QPushButton("Next page")
+        self.next_button.clicked.connect(
+            lambda: self.show_page(self.page_num + 1)
+        )
+        self.label = QLabel()
+        bar.addWidget(self.prev_button)
+        bar.addWidget(self.label, 1)
+        bar.addWidget(self.next_button)
+        layout.addLayout(bar)
+
+        self.view = EditorPane(path, '', large=True)
+        # Line numbers would only count from the start of the page
+        self.view.setMarginLineNumbers(0, False)
+        self.view.setMarginWidth(0, 0)
+        self.view.setUndoCollection(False)
+        layout.addWidget(self.view)
+        self.show_page(0)
+
+    def show_page(self, num):
+        """Show page num of the file, reading it from disk."""
+        num = max(0, min(num, len(self.pager) - 1))
+        self.page_num = num
+        self.view.setReadOnly(False)
+        self.view.setText(self.pager.page(num))
+        self.view.setReadOnly(True)
+        self.label.setText(
+            "This file is too big to edit. Page {} of {}".format(
+                num + 1, len(self.pager)
+            )
+        )
+        self.prev_button.setEnabled(num > 0)
+        self.next_button.setEnabled(num < len(self.pager) - 1)
+
+    def release(self):
+        """Unmap and close the file, before the pane is destroyed."""
+        self.pager.close()
+        self.prev_button.setEnabled(False)
+        self.next_button.setEnabled(False)
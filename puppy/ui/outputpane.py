@@ -1,20 +1,249 @@
-from PyQt5.QtWidgets import QTextEdit
+import codecs
+from collections import deque
+from PyQt5.QtWidgets import QPlainTextEdit, QLineEdit
 from PyQt5.QtGui import QTextCursor
-from PyQt5.QtCore import QProcess, QProcessEnvironment, QIODevice
+from PyQt5.QtCore import QProcessEnvironment, QTimer, Qt, pyqtSignal
+from ..runner import get_runner
+from ..run_manager import RunManager, describe
+from ..terminal import PseudoTerminal, pty_available
+from ..output_log import OutputLog
+from .. import instrument
 
 # Encoding for the subprocess' output
 # We will request this (for Python processes) using PYTHONIOENCODING
 ENCODING = 'utf8'
 
+# The number of lines of output kept in the pane; older lines scroll away.
+DEFAULT_SCROLLBACK = 10000
 
-class OutputPane(QTextEdit):
-    def __init__(self, parent=None):
+# The number of lines we will hold waiting to be shown. If the child process
+# writes faster than we can display, the oldest waiting lines are dropped.
+DEFAULT_MAX_PENDING = 5000
+
+# How often buffered output is written to the pane, in milliseconds, and the
+# most lines written each time. Together these bound the time the GUI spends
+# painting output in each frame.
+FLUSH_INTERVAL = 40
+FLUSH_BATCH = 500
+
+# The number of lines of input remembered for the Up and Down keys
+DEFAULT_HISTORY = 100
+
+
+class OutputBuffer:
+    """A ring buffer of lines waiting to be displayed.
+
+    Text is accepted in arbitrary chunks from one or more streams, such as
+    stdout and stderr, and split into lines; once more than `maxlen` lines
+    are waiting the oldest are discarded, and the number discarded is counted
+    so that the user can be told.
+
+    Each stream's incomplete last line is kept back until it is finished, so
+    that lines written to different streams at once aren't run together.
+    Incomplete lines are only let out when nothing else is waiting, so that
+    prompts still appear; if another stream then writes, it starts on a new
+    line.
+
+    """
+    def __init__(self, maxlen=DEFAULT_MAX_PENDING):
+        # (stream, line) pairs
+        self.lines = deque(maxlen=maxlen)
+        # Stream -> its incomplete last line
+        self.partial = {}
+        # The stream whose incomplete line was taken last, and so is still
+        # open in the display, if any
+        self.open_stream = None
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.lines) + len(self.partial)
+
+    def push(self, text, stream=None):
+        """Add a chunk of text written to stream to the buffer."""
+        text = self.partial.pop(stream, '') + text
+        pieces = text.splitlines(keepends=True)
+        if pieces and not pieces[-1].endswith('\n'):
+            self.partial[stream] = pieces.pop()
+        for line in pieces:
+            self.append(stream, line)
+
+    def append(self, stream, line):
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append((stream, line))
+
+    def end_lines(self):
+        """Finish every stream's incomplete line, as the streams have ended."""
+        for stream, line in self.partial.items():
+            self.append(stream, line + '\n')
+        self.partial.clear()
+
+    def take(self, n):
+        """Remove and return the text of up to n lines, as a list of strings.
+
+        If lines were dropped, the text starts with a note of how many; the
+        dropped lines were all older than the lines returned.
+
+        """
+        taken = []
+        if self.dropped:
+            self.close_line(taken, None)
+            taken.append('[... {} lines dropped ...]\n'.format(self.dropped))
+            self.dropped = 0
+        lines = self.lines
+        count = min(n, len(lines))
+        for _ in range(count):
+            stream, line = lines.popleft()
+            self.close_line(taken, stream)
+            taken.append(line)
+        if not lines and count < n:
+            # Nothing else is waiting, so show any incomplete lines
+            for stream, line in self.partial.items():
+                self.close_line(taken, stream)
+                taken.append(line)
+                self.open_stream = stream
+            self.partial.clear()
+        return taken
+
+    def close_line(self, taken, stream):
+        """End the line open in the display if stream didn't write it."""
+        if self.open_stream is not None and self.open_stream != stream:
+            taken.append('\n')
+        self.open_stream = None
+
+    def clear(self):
+        self.lines.clear()
+        self.partial.clear()
+        self.open_stream = None
+        self.dropped = 0
+
+
+class ConsoleInput(QLineEdit):
+    """A line of input for a running program.
+
+    Enter sends the line, Up and Down recall earlier lines, and Ctrl+D on an
+    empty line ends the input.
+
+    """
+    submitted = pyqtSignal(str)
+    eof = pyqtSignal()
+
+    def __init__(self, parent=None, history_size=DEFAULT_HISTORY):
+        super().__init__(parent)
+        self.history = deque(maxlen=history_size)
+        # The line of history shown; len(history) means the line being typed
+        self.position = 0
+        self.draft = ''
+        self.setPlaceholderText("Input for the program")
+        self.returnPressed.connect(self.on_return)
+
+    def on_return(self):
+        line = self.text()
+        if line and (not self.history or self.history[-1] != line):
+            self.history.append(line)
+        self.position = len(self.history)
+        self.draft = ''
+        self.clear()
+        self.submitted.emit(line)
+
+    def recall(self, step):
+        position = self.position + step
+        if not 0 <= position <= len(self.history):
+            return
+        if self.position == len(self.history):
+            self.draft = self.text()
+        self.position = position
+        if position == len(self.history):
+            self.setText(self.draft)
+        else:
+            self.setText(self.history[position])
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        if key == Qt.Key_Up:
+            self.recall(-1)
+        elif key == Qt.Key_Down:
+            self.recall(1)
+        elif key == Qt.Key_D and event.modifiers() & Qt.ControlModifier \
+                and not self.text():
+            self.eof.emit()
+        else:
+            super().keyPressEvent(event)
+
+
+class OutputPane(QPlainTextEdit):
+    """Show the output of a program, and take input for it.
+
+    Only the last `scrollback` lines are kept. If log_path is given, all the
+    output is also written to a rotating log file there, until that fails.
+
+    Where possible, programs are run with a pseudo-terminal (see
+    terminal.py), so that their output arrives a line at a time; otherwise
+    they are asked not to buffer their output. While a program runs, a line
+    at the bottom of the pane takes input for it.
+
+    """
+    def __init__(self, parent=None, scrollback=DEFAULT_SCROLLBACK,
+                 max_pending=DEFAULT_MAX_PENDING, runner=None, log_path=None):
         super().__init__(parent)
         self.process = None
-        self.setAcceptRichText(False)
+        # Use a warm runner, if enabled, to run Python scripts
+        self.runner = runner or get_runner(self.get_subprocess_env())
+        # Only one run at a time; starting another kills the last
+        self.runs = RunManager(runner=self.runner, parent=self)
+        self.runs.finished.connect(self.on_process_end)
         self.setReadOnly(True)
-        self.setLineWrapMode(QTextEdit.NoWrap)
+        self.setLineWrapMode(QPlainTextEdit.NoWrap)
         self.setObjectName('outputpane')
+        self.set_scrollback(scrollback)
+        self.log = None
+        if log_path:
+            self.log = OutputLog(log_path, on_error=self.on_log_error)
+
+        self.buffer = OutputBuffer(max_pending)
+        # Times from starting a program to its first output, if instrumented
+        self.first_output = None
+        self.decoders = {}
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush)
+
+        self.terminal = None
+        self.input = ConsoleInput(self)
+        self.input.submitted.connect(self.on_input)
+        self.input.eof.connect(self.end_input)
+        self.input.hide()
+
+    def set_scrollback(self, lines):
+        """Set the maximum number of lines to keep; 0 means unlimited."""
+        self.setMaximumBlockCount(lines)
+
+    def show_input(self, visible):
+        """Show or hide the input line, below the output."""
+        self.input.setVisible(visible)
+        height = self.input.sizeHint().height() if visible else 0
+        self.setViewportMargins(0, 0, 0, height)
+        self.place_input()
+
+    def place_input(self):
+        viewport = self.viewport().geometry()
+        height = self.input.sizeHint().height()
+        self.input.setGeometry(
+            viewport.left(), viewport.bottom() + 1, viewport.width(), height
+        )
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.place_input()
+
+    def keyPressEvent(self, event):
+        # Typing in the output goes to the input line
+        if self.input.isVisible() and event.text().isprintable() \
+                and event.text():
+            self.input.setFocus()
+            self.input.keyPressEvent(event)
+        else:
+            super().keyPressEvent(event)
 
     def append(self, txt):
         tc = self.textCursor()
@@ -24,41 +253,150 @@ class OutputPane(QTextEdit):
         self.ensureCursorVisible()
 
     def clear(self):
-        self.setText('')
+        self.buffer.clear()
+        self.flush_timer.stop()
+        self.setPlainText('')
+
+    def write(self, text, stream=None):
+        """Queue text to be shown in the pane at the next flush.
+
+        stream names the stream the text came from, such as 'stdout'; text
+        from Puppy itself has None.
+
+        """
+        if not text:
+            return
+        if self.log:
+            self.log.write(text)
+        self.buffer.push(text, stream)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self, limit=FLUSH_BATCH):
+        """Write up to limit buffered lines to the pane."""
+        lines = self.buffer.take(limit)
+        if lines:
+            self.append(''.join(lines))
+        if not self.buffer:
+            self.flush_timer.stop()
+
+    def on_log_error(self, error):
+        self.write('[Stopped logging output: {}]\n'.format(error))
 
     def get_subprocess_env(self):
         """Get the environment variables for running the subprocess."""
         return {'PYTHONIOENCODING': ENCODING}
 
-    def run(self, *args, cwd=None):
+    def show_message(self, message):
+        """Show a message from Puppy, rather than from a program."""
+        self.kill()
+        self.clear()
+        self.write('[{}]\n'.format(message))
+        self.flush()
+
+    def run(self, *args, cwd=None, cpu_limit=None, memory_limit=None):
+        """Run a program, killing any program already running in the pane.
+
+        cpu_limit is in seconds of CPU time, memory_limit in bytes.
+
+        """
         env = QProcessEnvironment().systemEnvironment()
         for k, v in self.get_subprocess_env().items():
             env.insert(k, v)
 
-        self.process = QProcess(self)
-        self.process.setProcessEnvironment(env)
-        if cwd:
-            self.process.setWorkingDirectory(cwd)
-        # self.process.stateChanged.connect(self.stateChanged)
+        self.kill()
+        self.clear()
+        self.decoders = {
+            channel: codecs.getincrementaldecoder(ENCODING)('replace')
+            for channel in ('stdout', 'stderr', 'terminal')
+        }
+        tty = None
+        if pty_available():
+            self.terminal = PseudoTerminal(self)
+            self.terminal.readyRead.connect(self.on_terminal_read)
+            tty = self.terminal.slave_name
+        else:
+            # Pipes make Python buffer its output in blocks
+            env.insert('PYTHONUNBUFFERED', '1')
+        self.first_output = instrument.begin('OutputPane.run to first output')
+        self.process = self.runs.start(
+            args[0], args[1:], env, cwd=cwd,
+            cpu_limit=cpu_limit, memory_limit=memory_limit, tty=tty
+        )
         self.process.readyReadStandardOutput.connect(self.on_stdout_read)
         self.process.readyReadStandardError.connect(self.on_stderr_read)
-        self.process.finished.connect(self.on_process_end)
+        self.show_input(True)
 
-        self.clear()
-        self.process.start(args[0], args[1:], QIODevice.ReadWrite)
+    def read_channel(self, channel, data):
+        """Decode data read from the given channel of the process."""
+        if self.first_output and data:
+            instrument.end(self.first_output)
+            self.first_output = None
+        self.write(self.decoders[channel].decode(bytes(data)), channel)
 
     def on_stdout_read(self):
-        while self.process and self.process.canReadLine():
-            text = self.process.readLine().data().decode(ENCODING)
-            self.append(text)
+        # With a terminal, the output goes there rather than to the process
+        if self.process and not self.terminal:
+            self.read_channel('stdout', self.process.readAllStandardOutput())
 
     def on_stderr_read(self):
-        text = self.process.readAllStandardError().data().decode(ENCODING)
-        self.append(text)
+        if self.process and not self.terminal:
+            self.read_channel('stderr', self.process.readAllStandardError())
+
+    def on_terminal_read(self):
+        if self.terminal:
+            self.read_channel('terminal', self.terminal.read_all())
+
+    def on_input(self, line):
+        """Echo a line the user typed, and send it to the program."""
+        # Show it after the prompt, which the program wrote to its output
+        self.write(line + '\n', 'terminal' if self.terminal else 'stdout')
+        self.send_input(line + '\n')
+
+    def send_input(self, text):
+        """Write text to the program's stdin, without waiting."""
+        data = text.encode(ENCODING)
+        if self.terminal:
+            self.terminal.write(data)
+        elif self.process:
+            self.process.write(data)
+
+    def end_input(self):
+        """Tell the program there is no more input."""
+        if self.terminal:
+            self.terminal.send_eof()
+        elif self.process:
+            self.process.closeWriteChannel()
+
+    def close_terminal(self):
+        if self.terminal:
+            self.terminal.close()
+            self.terminal.deleteLater()
+            self.terminal = None
+        self.show_input(False)
 
     def kill(self):
-        if self.process:
-            self.process.kill()
+        """Kill the running program, and any processes it started."""
+        self.runs.stop()
+        self.process = None
+        # A run with no output has no time to first output
+        self.first_output = None
+        self.close_terminal()
 
-    def on_process_end(self):
+    def on_process_end(self, result):
+        # Pick up anything still unread and show all that is left
+        self.on_stdout_read()
+        self.on_stderr_read()
+        if self.terminal:
+            self.terminal.read_available()
+            self.on_terminal_read()
+        self.close_terminal()
+        self.first_output = None
+        for channel, decoder in self.decoders.items():
+            self.write(decoder.decode(b'', final=True), channel)
+        self.buffer.end_lines()
+        self.write(describe(result) + '\n')
+        self.flush(limit=len(self.buffer))
+        if self.log:
+            self.log.flush()
         self.process = None
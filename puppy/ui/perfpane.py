@@ -0,0 +1,147 @@
+"""A debug window showing the timings collected by puppy.instrument.
+
+It is only created when instrumentation is enabled, and is hidden until
+Ctrl+Shift+P is pressed. Stalls of the GUI event loop are also measured
+here, by a timer that records how late it fires.
+
+"""
+import os
+import time
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QPushButton, QFileDialog, QShortcut, QApplication, QHeaderView
+)
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtCore import QObject, QTimer, Qt
+
+from .. import instrument
+
+
+# How often the stall monitor's timer fires, in milliseconds
+STALL_INTERVAL = 20
+
+# A timer firing this much later than it should counts as a stall, in seconds
+STALL_THRESHOLD = 0.05
+
+# How often the debug window is refreshed while visible, in milliseconds
+REFRESH_INTERVAL = 1000
+
+STALL_SPAN = 'event loop stall'
+
+
+class StallMonitor(QObject):
+    """Record the times the event loop was too busy to run a timer."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.expected = None
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(STALL_INTERVAL)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        self.expected = time.perf_counter() + STALL_INTERVAL / 1000
+        self.timer.start()
+
+    def tick(self):
+        now = time.perf_counter()
+        late = now - self.expected
+        if late > STALL_THRESHOLD:
+            instrument.recorder.record(STALL_SPAN, self.expected, late)
+        self.expected = now + STALL_INTERVAL / 1000
+
+
+class PerfPane(QWidget):
+    """Show percentiles of the recorded spans, and save traces."""
+    COLUMNS = ['span', 'count'] + [
+        'p{}'.format(p) for p in instrument.PERCENTILES
+    ] + ['max']
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.Tool)
+        self.setWindowTitle("Puppy performance")
+        self.resize(640, 320)
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(
+            0, QHeaderView.Stretch
+        )
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        save = QPushButton("Save trace...")
+        save.clicked.connect(self.save_trace)
+        clear = QPushButton("Clear")
+        clear.clicked.connect(self.clear)
+        buttons.addStretch()
+        buttons.addWidget(clear)
+        buttons.addWidget(save)
+        layout.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def toggle(self):
+        self.setVisible(not self.isVisible())
+
+    def refresh(self):
+        recorder = instrument.recorder
+        rows = []
+        for name in recorder.names():
+            stats = recorder.stats(name)
+            if stats:
+                rows.append((name, stats))
+        self.table.setRowCount(len(rows))
+        for row, (name, stats) in enumerate(rows):
+            cells = [name, str(stats['count'])] + [
+                '{:.2f} ms'.format(stats[column] * 1000)
+                for column in self.COLUMNS[2:]
+            ]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def clear(self):
+        instrument.recorder.clear()
+        self.refresh()
+
+    def save_trace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save trace", 'puppy-trace.json', "Trace files (*.json)"
+        )
+        if path:
+            instrument.recorder.dump(path)
+
+
+def install(window):
+    """Start measuring stalls and add the debug window to window.
+
+    Return the PerfPane.
+
+    """
+    monitor = StallMonitor(window)
+    monitor.start()
+    pane = PerfPane(window)
+    QShortcut(QKeySequence('Ctrl+Shift+P'), window, pane.toggle)
+
+    trace_path = os.environ.get('PUPPY_TRACE')
+    if trace_path:
+        QApplication.instance().aboutToQuit.connect(
+            lambda: instrument.recorder.dump(trace_path)
+        )
+    return pane
@@ -1,14 +1,10 @@
 from functools import partial
-from jinja2 import Environment, PackageLoader
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QLabel, QPushButton,
-    QTabWidget, QInputDialog
+    QTabWidget, QInputDialog, QListWidgetItem
 )
 from ..projects import PROJECTS
-
-env = Environment(
-    loader=PackageLoader(__name__, 'templates')
-)
+from ..templating import render
 
 
 DEFAULT_DETAILS = """<html>
@@ -40,7 +36,8 @@ class ProjectManagerPane(QWidget):
         self.templates = QListWidget()
         self.templates.currentItemChanged.connect(self.selected_template)
 
-        if any(projlist):
+        project_names = list(projlist)
+        if project_names:
             self.tabs.addTab(self.projects, "Existing Project")
         self.tabs.addTab(self.templates, "New Project")
         self.tabs.currentChanged.connect(self.tab_changed)
@@ -58,14 +55,52 @@ class ProjectManagerPane(QWidget):
         self.action = None
         self.main_window = main_window
         self.projlist = projlist
-        self.update_choices()
-
-    def update_choices(self):
+        self.project_items = {}
+        # Rendered details of projects, as (ini mtime, html)
+        self.details_cache = {}
+        # Rendered details of templates
+        self.template_details = {}
+        self.update_choices(project_names)
+
+        self.watcher = projlist.watch(self)
+        self.watcher.project_added.connect(self.on_project_added)
+        self.watcher.project_removed.connect(self.on_project_removed)
+        self.watcher.project_changed.connect(self.on_project_changed)
+
+    def update_choices(self, project_names):
         for p in PROJECTS:
             self.templates.addItem(p.NAME)
 
-        for name in self.projlist:
-            self.projects.addItem(name)
+        for name in project_names:
+            self.project_items[name] = QListWidgetItem(name, self.projects)
+
+    def on_project_added(self, name):
+        """Called when a project appears on disk."""
+        if name in self.project_items:
+            return
+        self.project_items[name] = QListWidgetItem(name, self.projects)
+        self.projects.sortItems()
+        if self.tabs.indexOf(self.projects) == -1:
+            self.tabs.insertTab(0, self.projects, "Existing Project")
+
+    def on_project_removed(self, name):
+        """Called when a project is deleted from disk."""
+        self.details_cache.pop(name, None)
+        item = self.project_items.pop(name, None)
+        if item is None:
+            return
+        if item is self.projects.currentItem() and \
+                self.tabs.currentWidget() is self.projects:
+            self.deselected()
+        self.projects.takeItem(self.projects.row(item))
+
+    def on_project_changed(self, name):
+        """Called when a project's details are changed on disk."""
+        self.details_cache.pop(name, None)
+        item = self.project_items.get(name)
+        if item is not None and item is self.projects.currentItem() and \
+                self.tabs.currentWidget() is self.projects:
+            self.selected_project()
 
     def tab_changed(self, index):
         """Called when the active tab is changed."""
@@ -84,20 +119,35 @@ class ProjectManagerPane(QWidget):
         if not current:
             return
         key = current.text()
-        project = self.projlist[key]
-        tmpl = env.get_template('project_details.html')
-        self.details.setText(tmpl.render(project=project))
+        mtime = self.projlist.ini_mtime(key)
+        cached = self.details_cache.get(key)
+        if cached and cached[0] == mtime:
+            html = cached[1]
+        else:
+            try:
+                project = self.projlist[key]
+            except KeyError:
+                # It has been deleted; the watcher will remove it shortly
+                self.deselected()
+                return
+            html = render('project_details.html', project=project)
+            self.details_cache[key] = mtime, html
+        self.details.setText(html)
         self.go.setDisabled(False)
-        self.action = partial(self.open_project, project)
+        self.action = partial(self.open_project, key)
 
     def selected_template(self, *args):
         current = self.templates.currentItem()
         if not current:
             return
         key = current.text()
-        tmpl = env.get_template('template_details.html')
         project = next(p for p in PROJECTS if p.NAME == key)
-        self.details.setText(tmpl.render(project=project))
+        try:
+            html = self.template_details[key]
+        except KeyError:
+            html = render('template_details.html', project=project)
+            self.template_details[key] = html
+        self.details.setText(html)
         self.go.setDisabled(False)
         self.action = partial(self.new_project, project)
 
@@ -117,5 +167,12 @@ class ProjectManagerPane(QWidget):
         proj = self.projlist.init_project(name, project)
         self.main_window.add_project(proj)
 
-    def open_project(self, proj):
+    def open_project(self, name):
+        # Each open project gets its own Project, rather than sharing one
+        # with the details shown here
+        try:
+            proj = self.projlist[name]
+        except KeyError:
+            self.deselected()
+            return
         self.main_window.add_project(proj)
@@ -1,60 +1,214 @@
-from PyQt5.QtWidgets import QTextEdit
-from PyQt5.QtGui import QTextCursor
+import os.path
+from PyQt5.QtWidgets import QPlainTextEdit, QMessageBox
+from PyQt5.QtGui import QTextCursor, QKeySequence
 from PyQt5.QtCore import QIODevice
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSlot
 from PyQt5.QtSerialPort import QSerialPort, QSerialPortInfo
+from .vt100 import VT100Parser, TEXT, DELETE
+from ..device_monitor import is_microbit
+from ..serial_writer import SerialWriter
+from ..output_log import OutputLog
+from ..instrument import timed
+
+# The number of lines kept in the pane
+DEFAULT_SCROLLBACK = 5000
+
+# How often to try again to open ports that couldn't be opened, in
+# milliseconds
+RETRY_INTERVAL = 2000
 
 # TODO:
 #   - shutdown serial port cleanly on exit
 #   - use monospace font
 #   - get backspace and arrow keys working
 
-MICROBIT_PID = 516
-MICROBIT_VID = 3368
-
 
 def find_microbit():
     """
     Returns the port for the first microbit it finds connected to the host
     computer. If no microbit is found, returns None.
+
+    This blocks while the serial ports are enumerated; the user interface
+    uses a DeviceMonitor instead.
     """
     available_ports = QSerialPortInfo.availablePorts()
     for port in available_ports:
-        pid = port.productIdentifier()
-        vid = port.vendorIdentifier()
-        if pid == MICROBIT_PID and vid == MICROBIT_VID:
+        if is_microbit(port):
             return port.portName()
     return None
 
 
-class REPLPane(QTextEdit):
+class MicrobitConnector(QObject):
+    """Add a REPLPane to an editor for each micro:bit that is plugged in.
+
+    A serial port can only be opened by one project at a time, so only the
+    project being shown connects to micro:bits. Its editor's connector is
+    activated when it is shown and deactivated when another project is, which
+    hands the ports over. Ports that can't be opened straight away, perhaps
+    because a copy to the micro:bit is still finishing in another project, are
+    tried again every so often.
+
+    The pane is removed again when the micro:bit is unplugged.
+
+    """
+    def __init__(self, editor, monitor):
+        super().__init__(editor)
+        self.editor = editor
+        self.monitor = monitor
+        self.panes = {}
+        self.active = False
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setInterval(RETRY_INTERVAL)
+        self.retry_timer.timeout.connect(self.connect_all)
+        monitor.attached.connect(self.on_attached)
+        monitor.detached.connect(self.on_detached)
+
+    def set_active(self, active):
+        """Connect to every micro:bit, or release their ports."""
+        self.active = active
+        if active:
+            for port in self.monitor.devices():
+                self.on_attached(port)
+            self.connect_all()
+        else:
+            self.retry_timer.stop()
+            for pane in self.panes.values():
+                pane.release()
+
+    def connect_all(self):
+        """Open the ports of any panes that aren't connected."""
+        if not self.active:
+            return
+        for pane in self.panes.values():
+            if not pane.is_connected():
+                pane.open_port()
+        if all(pane.is_connected() for pane in self.panes.values()):
+            self.retry_timer.stop()
+        elif not self.retry_timer.isActive():
+            self.retry_timer.start()
+
+    @pyqtSlot(str)
+    def on_attached(self, port):
+        if not self.active or port in self.panes:
+            return
+        log_name = 'repl-' + os.path.basename(port)
+        pane = REPLPane(
+            port=port, parent=self.editor,
+            log_path=self.editor.project.log_path(log_name)
+        )
+        self.panes[port] = pane
+        self.editor.add_pane(pane)
+        self.connect_all()
+
+    def busy(self):
+        """Return True if code is being run on any micro:bit."""
+        return any(pane.busy() for pane in self.panes.values())
+
+    def connected_panes(self):
+        """Get the panes whose micro:bits are connected."""
+        return [pane for pane in self.panes.values() if pane.is_connected()]
+
+    @pyqtSlot(str)
+    def on_detached(self, port):
+        pane = self.panes.pop(port, None)
+        if pane:
+            pane.kill()
+            pane.deleteLater()
+
+
+class REPLPane(QPlainTextEdit):
     """
     REPL = Read, Evaluate, Print, Loop.
 
     This widget represents a REPL client connected to a BBC micro:bit.
+
+    Only the last `scrollback` lines are kept. If log_path is given, all the
+    output is also written to a rotating log file there, until that fails.
     """
-    def __init__(self, port, parent=None):
+    def __init__(self, port, parent=None, scrollback=DEFAULT_SCROLLBACK,
+                 log_path=None):
         super().__init__(parent)
-        self.setAcceptRichText(False)
         self.setReadOnly(False)
-        self.setLineWrapMode(QTextEdit.NoWrap)
+        self.setLineWrapMode(QPlainTextEdit.NoWrap)
         self.setObjectName('replpane')
+        self.setMaximumBlockCount(scrollback)
+        self.log = None
+        if log_path:
+            self.log = OutputLog(log_path, on_error=self.on_log_error)
 
-        # open the serial port
         self.serial = QSerialPort(self)
         self.serial.setPortName(port)
         self.serial.setBaudRate(115200)
-        print(self.serial.open(QIODevice.ReadWrite))
         self.serial.readyRead.connect(self.on_serial_read)
-        self.serial_input_buffer = b''
+        self.writer = SerialWriter(self.serial, parent=self)
+        self.writer.idle.connect(self.on_writer_idle)
+        self.parser = VT100Parser()
+        # Whether to close the port once the writer's jobs are done
+        self.release_pending = False
+        # The last error opening the port, so as to only show it once
+        self.open_error = None
 
         # clear the text
         self.clear()
 
+    def open_port(self):
+        """Open the serial port, returning whether that worked."""
+        self.release_pending = False
+        if self.serial.isOpen():
+            return True
+        if self.serial.open(QIODevice.ReadWrite):
+            self.open_error = None
+            return True
+        error = self.serial.errorString()
+        if error != self.open_error:
+            self.open_error = error
+            self.append('[Could not connect to the micro:bit: {}]\n'.format(
+                error
+            ))
+        return False
+
+    def release(self):
+        """Close the serial port, once any jobs using it have finished."""
+        if self.writer.busy():
+            self.release_pending = True
+        else:
+            self.close_port()
+
+    def close_port(self):
+        self.release_pending = False
+        if self.serial.isOpen():
+            self.serial.close()
+        self.parser.reset()
+
+    def on_writer_idle(self):
+        if self.release_pending:
+            self.close_port()
+
     def on_serial_read(self):
-        self.process_bytes(bytes(self.serial.readAll()))
+        data = self.writer.receive(bytes(self.serial.readAll()))
+        if data:
+            self.process_bytes(data)
+
+    def on_log_error(self, error):
+        QMessageBox.warning(
+            self,
+            "Stopped logging",
+            "The micro:bit's output could not be logged:\n\n{}".format(error)
+        )
+
+    def execute(self, code):
+        """Run code on the micro:bit, returning a RawREPLJob to follow."""
+        return self.writer.execute(code.encode('utf8'))
+
+    def insertFromMimeData(self, source):
+        """Send pasted text to the micro:bit rather than into the pane."""
+        if source.hasText():
+            self.writer.paste(source.text())
 
     def keyPressEvent(self, data):
+        if data.matches(QKeySequence.Paste):
+            self.paste()
+            return
         text = data.text()
         msg = bytes(text, 'utf8')
         key = data.key()
@@ -68,44 +222,30 @@ class REPLPane(QTextEdit):
             msg = b'\x1B[C'
         elif key == Qt.Key_Left:
             msg = b'\x1B[D'
-        self.serial.write(msg)
+        self.writer.write(msg)
 
+    @timed('REPLPane.process_bytes')
     def process_bytes(self, bs):
-        bs = self.serial_input_buffer + bs
-        while len(bs):
-            num_use = 0
-            if bs[0] == 8: # backspace
-                self.delete()
-                num_use = 1
-            elif bs[0] == 13: # \r
-                # ignore
-                num_use = 1
-            elif bs[0] == 27: # escape
-                if bs.startswith(b'\x1b[K'):
-                    # kill to end of line
-                    num_use = 3
-                elif bs.startswith(b'\x1b[') and len(bs) >= 3 and chr(bs[2]).isdigit():
-                    n = bs[2] - ord('0')
-                    cmd_idx = 3
-                    if len(bs) >= 4 and chr(bs[3]).isdigit():
-                        n = 10 * n + bs[3] - ord('0')
-                        cmd_idx = 4
-                    if cmd_idx < len(bs):
-                        if bs[cmd_idx] == ord('D'):
-                            # backspace n chars
-                            for i in range(n):
-                                self.delete()
-                            num_use = cmd_idx + 1
-                if num_use == 0:
-                    # unknown or incomplete escape sequence
-                    print(bs)
-            else:
-                self.append(chr(bs[0]))
-                num_use = 1
-            if num_use == 0:
-                break
-            bs = bs[num_use:]
-        self.serial_input_buffer = bs
+        ops = self.parser.feed(bs)
+        if not ops:
+            return
+        tc = self.textCursor()
+        tc.movePosition(QTextCursor.End)
+        tc.beginEditBlock()
+        for op, arg in ops:
+            if op == TEXT:
+                tc.insertText(arg)
+                if self.log:
+                    self.log.write(arg)
+            elif op == DELETE:
+                tc.movePosition(
+                    QTextCursor.PreviousCharacter, QTextCursor.KeepAnchor,
+                    min(arg, tc.position())
+                )
+                tc.removeSelectedText()
+        tc.endEditBlock()
+        self.setTextCursor(tc)
+        self.ensureCursorVisible()
 
     def append(self, txt):
         tc = self.textCursor()
@@ -119,8 +259,16 @@ class REPLPane(QTextEdit):
         tc.deletePreviousChar()
 
     def clear(self):
-        self.setText('')
+        self.setPlainText('')
+
+    def is_connected(self):
+        return self.serial.isOpen()
+
+    def busy(self):
+        """Return True if code is being run on the micro:bit."""
+        return self.writer.busy()
 
     def kill(self):
-        if self.serial.isOpen():
-            self.serial.close()
+        self.close_port()
+        if self.log:
+            self.log.close()
@@ -0,0 +1,144 @@
+"""An incremental parser for the terminal output of the MicroPython REPL.
+
+The parser accepts bytes in whatever chunks they arrive from the serial port
+and turns them into a list of simple editing operations for the REPL pane to
+apply. Runs of printable text are collected and decoded as UTF-8 in one go,
+and parser state carries over between chunks, so escape sequences and
+multi-byte characters may be split anywhere.
+
+"""
+import re
+import codecs
+
+# Operations produced by the parser. Each is a tuple whose first element is
+# one of these; TEXT is followed by a string and DELETE by a count.
+TEXT = 'text'
+DELETE = 'delete'
+
+# Parser states
+GROUND = 0
+ESCAPE = 1
+CSI = 2
+# In a control sequence whose parameters are too long; it is dropped
+CSI_IGNORE = 3
+
+ESC = 0x1b
+BACKSPACE = 0x08
+LF = 0x0a
+SEMICOLON = 0x3b
+
+# Limits on the parameters of a control sequence. A sequence with more
+# parameters, or a longer one, is dropped, so that a stream of garbage can't
+# build up a huge parameter string or a huge count.
+MAX_PARAMS = 16
+MAX_PARAM_LENGTH = 4
+
+# Matches a run of bytes that are not control characters. Control bytes never
+# occur inside a UTF-8 multi-byte sequence, so these runs can be fed straight
+# to the decoder.
+PRINTABLE = re.compile(rb'[^\x00-\x1f\x7f]+')
+
+
+class VT100Parser:
+    """Parse a stream of bytes containing VT100 escape sequences."""
+    def __init__(self, encoding='utf8'):
+        self.decoder = codecs.getincrementaldecoder(encoding)('replace')
+        self.state = GROUND
+        self.params = bytearray()
+
+    def reset(self):
+        self.decoder.reset()
+        self.state = GROUND
+        self.params = bytearray()
+
+    def feed(self, bs):
+        """Parse the bytes bs, returning a list of operations."""
+        ops = []
+        text = []
+
+        def flush_text():
+            if text:
+                ops.append((TEXT, ''.join(text)))
+                text.clear()
+
+        pos = 0
+        end = len(bs)
+        while pos < end:
+            if self.state == GROUND:
+                mo = PRINTABLE.match(bs, pos)
+                if mo:
+                    s = self.decoder.decode(mo.group())
+                    if s:
+                        text.append(s)
+                    pos = mo.end()
+                    continue
+
+                b = bs[pos]
+                pos += 1
+                if b == LF:
+                    text.append('\n')
+                elif b == BACKSPACE:
+                    flush_text()
+                    self.delete(ops, 1)
+                elif b == ESC:
+                    self.state = ESCAPE
+                # Anything else, including \r, is ignored
+            elif self.state == ESCAPE:
+                b = bs[pos]
+                pos += 1
+                if b == ord('['):
+                    self.state = CSI
+                    self.params.clear()
+                else:
+                    # Not a sequence we know; drop it
+                    self.state = GROUND
+            elif self.state == CSI:
+                b = bs[pos]
+                pos += 1
+                if 0x40 <= b <= 0x7e:
+                    # Final byte of a control sequence
+                    flush_text()
+                    self.dispatch(ops, b, bytes(self.params))
+                    self.state = GROUND
+                elif self.too_long(b):
+                    self.state = CSI_IGNORE
+                    self.params.clear()
+                else:
+                    self.params.append(b)
+            else:
+                # Skip to the end of a sequence that was too long
+                b = bs[pos]
+                pos += 1
+                if 0x40 <= b <= 0x7e:
+                    self.state = GROUND
+        flush_text()
+        return ops
+
+    def too_long(self, b):
+        """Return True if adding b would take the parameters over a limit."""
+        params = self.params
+        if b == SEMICOLON:
+            return params.count(SEMICOLON) + 1 >= MAX_PARAMS
+        return len(params) - params.rfind(SEMICOLON) > MAX_PARAM_LENGTH
+
+    def delete(self, ops, n):
+        """Add an operation to delete n characters before the cursor."""
+        if ops and ops[-1][0] == DELETE:
+            ops[-1] = (DELETE, ops[-1][1] + n)
+        else:
+            ops.append((DELETE, n))
+
+    def dispatch(self, ops, cmd, params):
+        """Handle a control sequence.
+
+        The REPL only ever writes at the end of the pane, so moving the cursor
+        back is treated as deleting, and erasing to the end of the line has
+        nothing to do.
+
+        """
+        if cmd == ord('D'):
+            try:
+                n = int(params or b'1')
+            except ValueError:
+                return
+            self.delete(ops, n)
@@ -0,0 +1,161 @@
+"""Keep track of the projects open in Puppy's window.
+
+Only the project being shown needs its widgets. A project that has been in
+the background for a while is suspended: its files are saved, the state of
+its editor (open tabs, cursor and scroll positions, zoom) is kept in a small
+snapshot, and its widgets are destroyed, which frees its documents and
+closes its REPL panes. When the user switches back, the project's UI is built
+again, reconnecting to any micro:bits, and the snapshot restored. Tabs other
+than the current one are only read from disk when they are next shown.
+
+Projects running a program, or putting one onto a micro:bit, are not
+suspended, so that the job isn't killed behind the user's back. Nor is a
+project whose files could not be saved, so that no edits are lost.
+
+"""
+import time
+from PyQt5.QtCore import QObject, QTimer
+
+
+# How long a project must be in the background before it is suspended, in
+# seconds
+SUSPEND_AFTER = 300
+
+# How often to look for projects to suspend, in milliseconds
+CHECK_INTERVAL = 30000
+
+
+class OpenProject:
+    """A project open in the workspace, live or suspended."""
+    def __init__(self, project):
+        self.project = project
+        self.ui = None
+        self.snapshot = None
+        self.last_active = time.monotonic()
+
+    @property
+    def suspended(self):
+        return self.ui is None
+
+    def set_active(self, active):
+        """Tell a live project whether it is being shown.
+
+        Only the project being shown connects to micro:bits, so that it can
+        open their serial ports.
+
+        """
+        microbits = getattr(self.project, 'microbits', None)
+        if microbits is not None and not self.suspended:
+            microbits.set_active(active)
+
+    def busy(self):
+        """Return True if the project is running a program, or flashing or
+        copying one to a micro:bit."""
+        outputpane = getattr(self.project, 'outputpane', None)
+        if outputpane is not None and outputpane.runs.is_running():
+            return True
+        microbits = getattr(self.project, 'microbits', None)
+        if microbits is not None and microbits.busy():
+            return True
+        flasher = getattr(self.project, 'flasher', None)
+        return flasher is not None and flasher.busy()
+
+
+class Workspace(QObject):
+    """Open, switch between, suspend and close projects in a window.
+
+    window is the QStackedWidget in which the projects' UIs are shown.
+
+    """
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        # Project name -> OpenProject, in the order they were opened
+        self.projects = {}
+        self.current = None
+        window.currentChanged.connect(self.on_current_changed)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(CHECK_INTERVAL)
+        self.timer.timeout.connect(self.suspend_idle)
+        self.timer.start()
+
+    def __iter__(self):
+        return iter(self.projects.values())
+
+    def open(self, project):
+        """Show a project, opening or resuming it as necessary."""
+        entry = self.projects.get(project.name)
+        if entry is None:
+            entry = self.projects[project.name] = OpenProject(project)
+        if entry.suspended:
+            self.resume(entry)
+        self.window.setCurrentWidget(entry.ui)
+
+    def switch_to(self, name):
+        self.open(self.projects[name].project)
+
+    def resume(self, entry):
+        """Build the UI for a project, restoring its snapshot if it has one."""
+        entry.ui = entry.project.build_ui(self.window)
+        self.window.addWidget(entry.ui)
+        if entry.snapshot:
+            entry.ui.restore(entry.snapshot)
+            entry.snapshot = None
+
+    def suspend(self, entry):
+        """Save a project and destroy its UI, keeping a snapshot.
+
+        Return False, leaving the project open, if its files could not be
+        saved.
+
+        """
+        if entry.suspended:
+            return True
+        ui = entry.ui
+        snapshot = ui.snapshot()
+        if not ui.shutdown():
+            return False
+        entry.snapshot = snapshot
+        entry.ui = None
+        self.window.removeWidget(ui)
+        ui.deleteLater()
+        return True
+
+    def suspend_idle(self):
+        """Suspend background projects that have been idle for a while."""
+        now = time.monotonic()
+        for entry in self.projects.values():
+            if entry is self.current or entry.suspended or entry.busy():
+                continue
+            if now - entry.last_active > SUSPEND_AFTER:
+                if not self.suspend(entry):
+                    # Don't try again, and complain again, until it has been
+                    # idle for another while
+                    entry.last_active = now
+
+    def close(self, project):
+        """Remove a project from the workspace; its UI is already shut down."""
+        entry = self.projects.pop(project.name, None)
+        if entry is None or entry.suspended:
+            return
+        self.window.removeWidget(entry.ui)
+        entry.ui.deleteLater()
+
+    def on_current_changed(self, index):
+        widget = self.window.widget(index)
+        now = time.monotonic()
+        if self.current:
+            # It has been active until now
+            self.current.last_active = now
+            # Release its serial ports before the next project takes them
+            self.current.set_active(False)
+        self.current = next(
+            (e for e in self.projects.values() if e.ui is widget), None
+        )
+        if self.current:
+            self.current.last_active = now
+            self.current.set_active(True)
+            self.window.update_title(self.current.project)
+        else:
+            self.window.update_title()
@@ -0,0 +1,239 @@
+"""A warm Python process that forks a fresh child for each script run.
+
+Starting a new interpreter and importing modules takes a noticeable time on
+slow machines. This process does that once, then waits on a Unix socket for
+requests to run a script. Each request is handled by forking, so the script
+runs in a clean child process that has all the preloaded modules but shares
+nothing else with other runs.
+
+A request is a JSON object with "argv", "cwd" and "env" keys, and optionally
+"limits" giving the "cpu" seconds and "memory" bytes the script may use, sent
+with three file descriptors to use as the child's stdin, stdout and stderr.
+The reply is a line of JSON giving the child's "pid", followed, when the child
+ends, by a line giving its "exit" code and peak memory use, "max_rss".
+
+This file is run as a script rather than imported from the puppy package, so
+that neither Puppy nor Qt is loaded into the children.
+
+"""
+import io
+import os
+import sys
+import json
+import runpy
+import select
+import signal
+import socket
+import resource
+import traceback
+
+
+# Modules imported up front so that scripts don't have to wait for them
+PRELOAD = [
+    'collections', 'datetime', 'functools', 'itertools', 'json', 'math',
+    'random', 're', 'string', 'textwrap', 'time',
+]
+
+# The largest request we accept, in bytes
+MAX_REQUEST = 1024 * 1024
+
+
+def reopen_streams(env):
+    """Set up sys.stdin, stdout and stderr as a new interpreter would.
+
+    The streams we inherit from the zygote were made for its pipe from Puppy,
+    so their buffering and encoding don't suit the terminal or pipes the
+    child has been given. Make new ones around the same file descriptors,
+    choosing buffering by whether each is a terminal and by the
+    PYTHONUNBUFFERED and PYTHONIOENCODING variables in env.
+
+    """
+    encoding, _, errors = env.get('PYTHONIOENCODING', '').partition(':')
+    unbuffered = bool(env.get('PYTHONUNBUFFERED'))
+    for fd, name in enumerate(['stdin', 'stdout', 'stderr']):
+        old = getattr(sys, name)
+        writing = fd > 0
+        if old is None:
+            raw = io.FileIO(fd, 'wb' if writing else 'rb', closefd=False)
+        else:
+            # Take the raw file from the old stream, so that the old stream
+            # doesn't close it when it is thrown away
+            old.flush()
+            raw = old.detach()
+            if isinstance(raw, io.BufferedIOBase):
+                raw = raw.detach()
+        if not writing:
+            buffer = io.BufferedReader(raw)
+        elif unbuffered:
+            buffer = raw
+        else:
+            buffer = io.BufferedWriter(raw)
+        if name == 'stderr':
+            # As in CPython, whatever PYTHONIOENCODING says
+            stream_errors = 'backslashreplace'
+        else:
+            stream_errors = errors or None
+        stream = io.TextIOWrapper(
+            buffer,
+            encoding=encoding or None,
+            errors=stream_errors,
+            line_buffering=writing and (name == 'stderr' or raw.isatty()),
+            write_through=writing and unbuffered
+        )
+        setattr(sys, name, stream)
+        setattr(sys, '__{}__'.format(name), stream)
+
+
+def run_child(request, fds):
+    """Run the requested script in this (forked) process; never returns."""
+    os.setsid()
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    reopen_streams(request['env'])
+
+    limits = request.get('limits') or {}
+    try:
+        if limits.get('cpu') is not None:
+            resource.setrlimit(
+                resource.RLIMIT_CPU, (limits['cpu'], limits['cpu'] + 1)
+            )
+        if limits.get('memory') is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (limits['memory'],) * 2)
+    except (OSError, ValueError) as e:
+        print("Could not set resource limits:", e, file=sys.stderr)
+
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    argv = request['argv']
+    sys.argv = argv
+    sys.path.insert(0, os.path.dirname(os.path.abspath(argv[0])))
+
+    code = 0
+    try:
+        runpy.run_path(argv[0], run_name='__main__')
+    except SystemExit as e:
+        code = e.code
+    except BaseException as e:
+        # Report the error as `python3 script.py` would, without the frames
+        # from this file and runpy.
+        tb = e.__traceback__
+        while tb and (
+                tb.tb_frame.f_code.co_filename == __file__ or
+                tb.tb_frame.f_globals.get('__name__') == 'runpy'):
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        code = 1
+    # Leave through the usual interpreter shutdown, so that atexit handlers
+    # run and output is flushed.
+    sys.exit(code)
+
+
+def max_rss(rusage):
+    """Get the peak memory use from rusage, in bytes."""
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss
+    return rusage.ru_maxrss * 1024
+
+
+def reply(conn, **msg):
+    try:
+        conn.sendall(json.dumps(msg).encode('ascii') + b'\n')
+    except OSError:
+        pass
+
+
+def serve(sock_path):
+    """Handle requests until our stdin is closed."""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(sock_path)
+    listener.listen(5)
+
+    # Wake up from select() when a child exits
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda *args: None)
+
+    zygote_pid = os.getpid()
+    children = {}
+    try:
+        while True:
+            try:
+                readable, _, _ = select.select(
+                    [listener, wake_r, sys.stdin], [], []
+                )
+            except InterruptedError:
+                continue
+
+            if sys.stdin in readable and not os.read(sys.stdin.fileno(), 1):
+                # Puppy has gone away
+                break
+
+            if wake_r in readable:
+                os.read(wake_r, 1024)
+                while children:
+                    pid, status, rusage = os.wait4(-1, os.WNOHANG)
+                    if not pid:
+                        break
+                    conn = children.pop(pid, None)
+                    if conn:
+                        reply(
+                            conn,
+                            exit=os.waitstatus_to_exitcode(status),
+                            max_rss=max_rss(rusage)
+                        )
+                        conn.close()
+
+            if listener in readable:
+                conn, _ = listener.accept()
+                try:
+                    msg, fds, _, _ = socket.recv_fds(conn, MAX_REQUEST, 3)
+                    request = json.loads(msg.decode('utf8'))
+                except (OSError, ValueError):
+                    conn.close()
+                    continue
+
+                pid = os.fork()
+                if pid == 0:
+                    listener.close()
+                    conn.close()
+                    for c in children.values():
+                        c.close()
+                    os.close(wake_r)
+                    os.close(wake_w)
+                    run_child(request, fds)
+
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                reply(conn, pid=pid)
+    finally:
+        if os.getpid() == zygote_pid:
+            for pid in children:
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            listener.close()
+            try:
+                os.unlink(sock_path)
+            except OSError:
+                pass
+
+
+def main():
+    # Don't let scripts import modules that happen to sit beside this file
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or '.') != here]
+
+    for name in PRELOAD:
+        __import__(name)
+    serve(sys.argv[1])
+
+
+if __name__ == '__main__':
+    main()
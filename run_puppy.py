@@ -1,3 +1,5 @@
-from puppy.__main__ import main
-
-main()
+# Guarded, as the indexer's child process imports this module (see
+# puppy/parsing.py), and it shouldn't start another Puppy.
+if __name__ == '__main__':
+    from puppy.__main__ import main
+    main()
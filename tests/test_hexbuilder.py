@@ -0,0 +1,58 @@
+import binascii
+import struct
+
+import pytest
+
+from puppy.hexbuilder import (
+    hexlify, check_records, HexError, SCRIPT_ADDR, MAX_SCRIPT_SIZE
+)
+
+
+def decode(records):
+    """Return the address and data of each data record."""
+    found = []
+    for line in records.split()[1:]:
+        record = binascii.unhexlify(line[1:])
+        length, addr, kind = struct.unpack('>BHB', record[:4])
+        assert kind == 0
+        assert len(record) == length + 5
+        found.append((addr, record[4:-1]))
+    return found
+
+
+def test_records_are_valid():
+    records = hexlify(b'from microbit import *\ndisplay.scroll("hi")\n')
+    check_records(records)
+    assert records.startswith(b':020000040003F7\n')
+    assert records.endswith(b'\n')
+
+
+def test_script_layout():
+    script = b'x = 1\n' * 10
+    found = decode(hexlify(script))
+    addrs = [addr for addr, data in found]
+    assert addrs[0] == SCRIPT_ADDR & 0xffff
+    assert addrs == list(range(addrs[0], addrs[0] + 16 * len(addrs), 16))
+    data = b''.join(data for addr, data in found)
+    assert data[:4] == b'MP' + struct.pack('<H', len(script))
+    assert data[4:4 + len(script)] == script
+    assert data[4 + len(script):].strip(b'\x00') == b''
+
+
+def test_line_endings_normalised():
+    assert hexlify(b'a\r\nb\rc\n') == hexlify(b'a\nb\nc\n')
+
+
+def test_too_big():
+    hexlify(b'#' * (MAX_SCRIPT_SIZE - 20))
+    with pytest.raises(HexError):
+        hexlify(b'#' * MAX_SCRIPT_SIZE)
+
+
+def test_bad_records():
+    with pytest.raises(HexError):
+        check_records(b'020000040003F7\n')
+    with pytest.raises(HexError):
+        check_records(b':0200000400ZZF7\n')
+    with pytest.raises(HexError):
+        check_records(b':020000040003F8\n')
@@ -0,0 +1,99 @@
+import os
+
+from puppy.history import History, FileIndex, RECORD
+
+
+def make_history(tmp_path):
+    return History(str(tmp_path / 'history'))
+
+
+def objects(history):
+    found = []
+    for dirpath, dirnames, filenames in os.walk(
+            os.path.join(history.root, 'objects')):
+        found.extend(filenames)
+    return found
+
+
+def test_restore_versions(tmp_path):
+    history = make_history(tmp_path)
+    for text in ['one', 'two', 'three']:
+        assert history.record('a.py', text)
+    assert len(history.versions('a.py')) == 3
+    assert history.restore('a.py') == 'three'
+    assert history.restore('a.py', 0) == 'one'
+    assert history.restore('a.py', 1) == 'two'
+
+
+def test_unchanged_version_not_recorded(tmp_path):
+    history = make_history(tmp_path)
+    assert history.record('a.py', 'same')
+    assert not history.record('a.py', 'same')
+    assert len(history.versions('a.py')) == 1
+
+
+def test_contents_stored_once(tmp_path):
+    history = make_history(tmp_path)
+    history.record('a.py', 'shared')
+    history.record('b.py', 'shared')
+    history.record('a.py', 'changed')
+    history.record('a.py', 'shared')
+    assert len(objects(history)) == 2
+    assert history.restore('b.py') == 'shared'
+    assert history.paths() == ['a.py', 'b.py']
+
+
+def test_find_by_timestamp(tmp_path):
+    history = make_history(tmp_path)
+    history.record('a.py', 'one')
+    history.record('a.py', 'two')
+    (first, _), (second, _) = history.versions('a.py')
+    assert first < second
+    assert history.find('a.py', first - 1) == -1
+    assert history.find('a.py', first) == 0
+    assert history.find('a.py', second - 1) == 0
+    assert history.find('a.py', second + 1) == 1
+    assert history.find('missing.py', second) == -1
+
+
+def test_history_survives_reopening(tmp_path):
+    make_history(tmp_path).record('a.py', 'kept')
+    assert make_history(tmp_path).restore('a.py') == 'kept'
+
+
+def test_torn_record_is_dropped(tmp_path):
+    history = make_history(tmp_path)
+    history.record('a.py', 'one')
+    history.record('a.py', 'two')
+    index = history.index('a.py')
+    # Simulate a crash part way through appending a record
+    with open(index.path, 'ab') as f:
+        f.write(b'\x01' * (RECORD.size // 2))
+    assert len(list(index)) == 2
+
+    history.record('a.py', 'three')
+    assert os.path.getsize(index.path) == 3 * RECORD.size
+    assert [history.restore('a.py', i) for i in range(3)] == [
+        'one', 'two', 'three'
+    ]
+    assert history.find('a.py', history.versions('a.py')[-1][0]) == 2
+
+
+def test_empty_index(tmp_path):
+    index = FileIndex(str(tmp_path / 'missing.idx'))
+    assert len(index) == 0
+    assert list(index) == []
+    assert index.find(0) == -1
+
+
+def test_failures_are_kept_not_raised(tmp_path):
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('a file where the history directory should be')
+    history = History(str(blocker / 'history'))
+    assert not history.safe_record('a.py', 'text')
+    assert not history.safe_record('b.py', 'text')
+    path, error = history.take_error()
+    assert path == 'a.py'
+    assert isinstance(error, OSError)
+    # Only the first of a run of failures is reported
+    assert history.take_error() is None
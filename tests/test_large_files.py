@@ -0,0 +1,56 @@
+import hashlib
+
+from puppy.large_files import read_chunks, FilePager
+
+
+def write(tmp_path, data):
+    path = tmp_path / 'big.txt'
+    path.write_bytes(data)
+    return str(path)
+
+
+def read_text(path):
+    with open(path, encoding='utf8') as f:
+        return f.read()
+
+
+def test_chunks_match_text_mode(tmp_path):
+    data = ('línea {}\r\n'.format(i) for i in range(2000))
+    path = write(tmp_path, ''.join(data).encode('utf8') + b'end\rlast\n')
+    digests = []
+    # A small odd size splits multibyte characters and \r\n pairs
+    chunks = list(read_chunks(path, 'utf8', digests.append, size=97))
+    text = ''.join(chunks)
+    assert len(chunks) > 1
+    assert text == read_text(path)
+    assert digests == [hashlib.sha1(text.encode('utf8')).digest()]
+
+
+def test_empty_file(tmp_path):
+    digests = []
+    assert list(read_chunks(write(tmp_path, b''), 'utf8', digests.append)) \
+        == []
+    assert digests == [hashlib.sha1(b'').digest()]
+
+
+def test_pages_cover_file(tmp_path):
+    lines = ['line {}\n'.format(i) for i in range(1000)]
+    path = write(tmp_path, ''.join(lines).encode('utf8'))
+    pager = FilePager(path, 'utf8', page_size=256)
+    try:
+        pages = [pager.page(n) for n in range(len(pager))]
+    finally:
+        pager.close()
+    assert ''.join(pages) == ''.join(lines)
+    # Pages break between lines
+    assert all(page.endswith('\n') for page in pages if page)
+
+
+def test_page_past_end(tmp_path):
+    pager = FilePager(write(tmp_path, b'short\n'), 'utf8', page_size=256)
+    try:
+        assert len(pager) == 1
+        assert pager.page(0) == 'short\n'
+        assert pager.page(5) == ''
+    finally:
+        pager.close()
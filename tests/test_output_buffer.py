@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from puppy.ui.outputpane import OutputBuffer  # noqa: E402
+
+
+def test_lines_in_chunks():
+    buffer = OutputBuffer()
+    buffer.push('one\ntw')
+    buffer.push('o\nthree\n')
+    assert len(buffer) == 3
+    assert buffer.take(10) == ['one\n', 'two\n', 'three\n']
+    assert len(buffer) == 0
+
+
+def test_batches():
+    buffer = OutputBuffer()
+    buffer.push(''.join('{}\n'.format(i) for i in range(5)))
+    assert buffer.take(2) == ['0\n', '1\n']
+    assert buffer.take(2) == ['2\n', '3\n']
+    assert buffer.take(2) == ['4\n']
+    assert buffer.take(2) == []
+
+
+def test_overflow_is_counted():
+    buffer = OutputBuffer(maxlen=3)
+    buffer.push(''.join('{}\n'.format(i) for i in range(10)))
+    assert len(buffer) == 3
+    assert buffer.dropped == 7
+    assert buffer.take(2) == ['[... 7 lines dropped ...]\n', '7\n', '8\n']
+    # The count is only reported once
+    assert buffer.take(2) == ['9\n']
+
+
+def test_incomplete_line_shown_when_idle():
+    buffer = OutputBuffer()
+    buffer.push('done\nName: ', 'stdout')
+    assert buffer.take(1) == ['done\n']
+    # A prompt is shown once nothing else is waiting
+    assert buffer.take(1) == ['Name: ']
+    buffer.push('Bob\n', 'stdout')
+    assert buffer.take(10) == ['Bob\n']
+
+
+def test_streams_are_not_run_together():
+    buffer = OutputBuffer()
+    buffer.push('abc', 'stdout')
+    buffer.push('error\n', 'stderr')
+    buffer.push('def\n', 'stdout')
+    assert ''.join(buffer.take(10)) == 'error\nabcdef\n'
+
+
+def test_shown_prompt_is_ended_by_other_streams():
+    buffer = OutputBuffer()
+    buffer.push('Name: ', 'stdout')
+    assert buffer.take(10) == ['Name: ']
+    buffer.push('warning\n', 'stderr')
+    assert ''.join(buffer.take(10)) == '\nwarning\n'
+
+
+def test_dropped_note_starts_a_line():
+    buffer = OutputBuffer(maxlen=1)
+    buffer.push('> ', 'stdout')
+    buffer.take(10)
+    buffer.push('a\nb\n', 'stderr')
+    assert ''.join(buffer.take(10)) == '\n[... 1 lines dropped ...]\nb\n'
+
+
+def test_end_lines():
+    buffer = OutputBuffer()
+    buffer.push('no newline', 'stdout')
+    buffer.end_lines()
+    buffer.push('[Exited with code 0]\n')
+    assert buffer.take(10) == ['no newline\n', '[Exited with code 0]\n']
+
+
+def test_clear():
+    buffer = OutputBuffer(maxlen=1)
+    buffer.push('a\nb\nc')
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.take(10) == []
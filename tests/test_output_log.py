@@ -0,0 +1,63 @@
+import os
+
+from puppy.output_log import OutputLog
+
+
+def read(path):
+    with open(path, encoding='utf8') as f:
+        return f.read()
+
+
+def test_writes_text(tmp_path):
+    path = str(tmp_path / 'logs' / 'output.log')
+    log = OutputLog(path)
+    log.write('hello ')
+    log.write('')
+    log.write('wörld\n')
+    log.close()
+    assert read(path) == 'hello wörld\n'
+
+
+def test_appends_to_existing_log(tmp_path):
+    path = str(tmp_path / 'output.log')
+    for text in ['one\n', 'two\n']:
+        log = OutputLog(path)
+        log.write(text)
+        log.close()
+    assert read(path) == 'one\ntwo\n'
+
+
+def test_rotation(tmp_path):
+    path = str(tmp_path / 'output.log')
+    log = OutputLog(path, max_bytes=10, backups=2)
+    for i in range(5):
+        log.write('line {:04}\n'.format(i))
+    log.close()
+    assert read(path) == 'line 0004\n'
+    assert read(path + '.1') == 'line 0003\n'
+    assert read(path + '.2') == 'line 0002\n'
+    assert not os.path.exists(path + '.3')
+
+
+def test_rotation_without_backups(tmp_path):
+    path = str(tmp_path / 'output.log')
+    log = OutputLog(path, max_bytes=10, backups=0)
+    log.write('0123456789')
+    log.write('new\n')
+    log.close()
+    assert read(path) == 'new\n'
+    assert os.listdir(str(tmp_path)) == ['output.log']
+
+
+def test_errors_turn_logging_off(tmp_path):
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('a file where the log directory should be')
+    errors = []
+    log = OutputLog(str(blocker / 'output.log'), on_error=errors.append)
+    log.write('one\n')
+    log.write('two\n')
+    log.flush()
+    log.close()
+    assert len(errors) == 1
+    assert isinstance(errors[0], OSError)
+    assert log.error is errors[0]
@@ -0,0 +1,115 @@
+import os
+
+from puppy import project_index
+from puppy.project_index import (
+    ProjectIndex, INI_FILENAME, INDEX_DIR, ADDED, REMOVED, CHANGED,
+    ignored_dir
+)
+
+
+def write_project(root, name, template='Python Script', mtime_ns=None,
+                  **metadata):
+    directory = root / name
+    directory.mkdir(exist_ok=True)
+    lines = ['[puppy]', 'template = ' + template, '[metadata]']
+    lines += ['{} = {}'.format(k, v) for k, v in metadata.items()]
+    ini = directory / INI_FILENAME
+    ini.write_text('\n'.join(lines) + '\n', encoding='utf8')
+    if mtime_ns is not None:
+        os.utime(str(ini), ns=(mtime_ns, mtime_ns))
+
+
+def count_reads(monkeypatch):
+    reads = []
+    real = project_index.read_ini
+
+    def read_ini(path):
+        reads.append(os.path.basename(os.path.dirname(path)))
+        return real(path)
+    monkeypatch.setattr(project_index, 'read_ini', read_ini)
+    return reads
+
+
+def test_lists_projects(tmp_path):
+    write_project(tmp_path, 'one')
+    write_project(tmp_path, 'two', template='Hello World')
+    (tmp_path / 'not a project').mkdir()
+    index = ProjectIndex(str(tmp_path))
+    assert index.names() == ['one', 'two']
+    assert index.get('two')['template'] == 'Hello World'
+
+
+def test_index_is_reused(tmp_path, monkeypatch):
+    write_project(tmp_path, 'one', colour='red')
+    ProjectIndex(str(tmp_path)).names()
+    assert os.path.exists(str(tmp_path / INDEX_DIR))
+
+    reads = count_reads(monkeypatch)
+    index = ProjectIndex(str(tmp_path))
+    assert index.names() == ['one']
+    assert index.get('one')['metadata'] == {'colour': 'red'}
+    assert reads == []
+
+
+def test_changed_ini_is_reread(tmp_path, monkeypatch):
+    write_project(tmp_path, 'one', mtime_ns=10 ** 18, colour='red')
+    write_project(tmp_path, 'two', mtime_ns=10 ** 18)
+    ProjectIndex(str(tmp_path)).names()
+
+    write_project(tmp_path, 'one', mtime_ns=2 * 10 ** 18, colour='blue')
+    reads = count_reads(monkeypatch)
+    index = ProjectIndex(str(tmp_path))
+    assert index.get('one')['metadata'] == {'colour': 'blue'}
+    assert index.get('two')
+    assert reads == ['one']
+
+
+def test_stale_index_is_ignored(tmp_path):
+    write_project(tmp_path, 'one')
+    index = ProjectIndex(str(tmp_path))
+    index.names()
+    with open(index.path, 'w', encoding='utf8') as f:
+        f.write('{"version": -1}')
+    assert ProjectIndex(str(tmp_path)).entries == {}
+    with open(index.path, 'w', encoding='utf8') as f:
+        f.write('not json')
+    assert ProjectIndex(str(tmp_path)).names() == ['one']
+
+
+def test_refresh(tmp_path):
+    write_project(tmp_path, 'kept', mtime_ns=10 ** 18)
+    write_project(tmp_path, 'edited', mtime_ns=10 ** 18)
+    write_project(tmp_path, 'deleted', mtime_ns=10 ** 18)
+    index = ProjectIndex(str(tmp_path))
+    index.names()
+
+    write_project(tmp_path, 'edited', mtime_ns=2 * 10 ** 18)
+    os.unlink(str(tmp_path / 'deleted' / INI_FILENAME))
+    write_project(tmp_path, 'new')
+    added, removed, changed = index.refresh()
+    assert (added, removed, changed) == ({'new'}, {'deleted'}, {'edited'})
+    assert index.refresh() == (set(), set(), set())
+
+
+def test_refresh_project(tmp_path):
+    index = ProjectIndex(str(tmp_path))
+    assert index.refresh_project('one') is None
+    write_project(tmp_path, 'one', mtime_ns=10 ** 18)
+    assert index.refresh_project('one') == ADDED
+    assert index.refresh_project('one') is None
+    write_project(tmp_path, 'one', mtime_ns=2 * 10 ** 18)
+    assert index.refresh_project('one') == CHANGED
+    os.unlink(str(tmp_path / 'one' / INI_FILENAME))
+    assert index.refresh_project('one') == REMOVED
+    assert 'one' not in index.names()
+
+
+def test_ignored_dirs(tmp_path):
+    (tmp_path / 'project').mkdir()
+    (tmp_path / '.puppy').mkdir()
+    (tmp_path / 'venv').mkdir()
+    (tmp_path / 'venv' / 'pyvenv.cfg').write_text('home = /usr/bin\n')
+    root = str(tmp_path)
+    assert not ignored_dir(root, 'project')
+    assert ignored_dir(root, '.puppy')
+    assert ignored_dir(root, 'venv')
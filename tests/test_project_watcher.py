@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from PyQt5.QtCore import QCoreApplication  # noqa: E402
+
+from puppy import project_watcher  # noqa: E402
+from puppy.project_manager import ProjectManager  # noqa: E402
+from puppy.project_index import INI_FILENAME  # noqa: E402
+from .test_project_index import write_project  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def make_watcher(tmp_path, monkeypatch, count, max_watches):
+    for i in range(count):
+        write_project(tmp_path, 'p{}'.format(i), mtime_ns=10 ** 18)
+    monkeypatch.setattr(project_watcher, 'MAX_WATCHES', max_watches)
+    manager = ProjectManager(str(tmp_path))
+    list(manager)
+    watcher = manager.watch()
+    events = []
+    for kind in ('added', 'removed', 'changed'):
+        getattr(watcher, 'project_' + kind).connect(
+            lambda name, kind=kind: events.append((kind, name))
+        )
+    return watcher, events
+
+
+def test_directories_are_watched_first(app, tmp_path, monkeypatch):
+    watcher, _ = make_watcher(tmp_path, monkeypatch, 4, 7)
+    root = str(tmp_path)
+    assert watcher.root_watched
+    for i in range(4):
+        assert os.path.join(root, 'p{}'.format(i)) in watcher.watched
+    # Only two of the ini files fit
+    assert watcher.polled == {'p2', 'p3'}
+    assert watcher.poll_timer.isActive()
+
+
+def test_no_polling_when_everything_is_watched(app, tmp_path, monkeypatch):
+    watcher, _ = make_watcher(tmp_path, monkeypatch, 4, 100)
+    assert watcher.polled == set()
+    assert not watcher.poll_timer.isActive()
+
+
+def test_polling_is_incremental(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(project_watcher, 'POLL_BATCH', 2)
+    watcher, events = make_watcher(tmp_path, monkeypatch, 6, 8)
+    assert watcher.polled == {'p1', 'p2', 'p3', 'p4', 'p5'}
+
+    checked = []
+    real_check = watcher.check
+    monkeypatch.setattr(
+        watcher, 'check', lambda name: (checked.append(name), real_check(name))
+    )
+    write_project(tmp_path, 'p4', mtime_ns=2 * 10 ** 18, colour='red')
+    os.unlink(str(tmp_path / 'p5' / INI_FILENAME))
+    for _ in range(3):
+        watcher.poll()
+    # No project is checked twice before all of them have been checked once
+    assert checked == ['p1', 'p2', 'p3', 'p4', 'p5']
+    assert events == [('changed', 'p4'), ('removed', 'p5')]
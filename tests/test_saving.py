@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from puppy import projects  # noqa: E402
+from puppy.projects import Project  # noqa: E402
+from puppy.saving import SavePipeline  # noqa: E402
+
+
+def make_pipeline(tmp_path):
+    root = tmp_path / 'project'
+    root.mkdir()
+    return SavePipeline(Project(str(root), {}))
+
+
+def test_saves_in_background(tmp_path):
+    saver = make_pipeline(tmp_path)
+    assert saver.submit('a.py', 'one')
+    saver.wait()
+    assert saver.project.read_file('a.py') == 'one'
+    assert not saver.submit('a.py', 'one')
+    saver.close()
+    with pytest.raises(RuntimeError):
+        saver.submit('a.py', 'two')
+
+
+def test_failures_are_per_file(tmp_path, monkeypatch):
+    saver = make_pipeline(tmp_path)
+    real_replace = projects.os.replace
+
+    def replace(src, dest):
+        if dest.endswith('b.py'):
+            raise OSError("disk full")
+        real_replace(src, dest)
+    monkeypatch.setattr(projects.os, 'replace', replace)
+
+    saver.submit('a.py', 'one')
+    saver.submit('b.py', 'two')
+    saver.wait()
+    # a.py was replaced before b.py failed, whether or not they were saved
+    # in the same batch
+    assert saver.failures() == {'b.py': 'disk full'}
+    assert saver.project.read_file('a.py') == 'one'
+
+    monkeypatch.undo()
+    saver.submit('b.py', 'two')
+    saver.wait()
+    assert saver.failures() == {}
+    saver.close()
@@ -0,0 +1,108 @@
+import pytest
+
+from puppy.symbol_index import extract_symbols, SymbolIndex, Symbol
+from puppy.parsing import Parser
+
+
+SOURCE = '''\
+import os.path
+from sys import argv as args, path
+from json import *
+
+class Thing(Base):
+    def method(self, x, *rest, key=None):
+        self.size = x
+        async def inner():
+            pass
+
+def method():
+    pass
+
+count = 0
+for i, item in enumerate(args):
+    count += 1
+'''
+
+
+def test_extract_symbols():
+    symbols = extract_symbols(SOURCE)
+    assert symbols == {
+        'os': Symbol('os', 'import', 1),
+        'args': Symbol('args', 'import', 2),
+        'path': Symbol('path', 'import', 2),
+        'Thing': Symbol('Thing', 'class', 5),
+        'method': Symbol('method', 'function', 6),
+        'self': Symbol('self', 'argument', 6),
+        'x': Symbol('x', 'argument', 6),
+        'rest': Symbol('rest', 'argument', 6),
+        'key': Symbol('key', 'argument', 6),
+        'size': Symbol('size', 'attribute', 7),
+        'inner': Symbol('inner', 'function', 8),
+        'count': Symbol('count', 'variable', 14),
+        'i': Symbol('i', 'variable', 15),
+        'item': Symbol('item', 'variable', 15),
+    }
+
+
+def test_extract_symbols_syntax_error():
+    with pytest.raises(SyntaxError):
+        extract_symbols('def f(:\n')
+
+
+def test_completions():
+    index = SymbolIndex(extra=['print'])
+    assert index.update('a.py', 'value = 1\nvalid = 2\n')
+    assert index.update('b.py', 'def values(): pass\n')
+    assert index.completions('val') == ['valid', 'value', 'values']
+    assert index.completions('val', limit=2) == ['valid', 'value']
+    # The prefix itself isn't a completion
+    assert index.completions('value') == ['values']
+    assert index.completions('pr') == ['print']
+    assert index.completions('z') == []
+
+
+def test_update_and_remove():
+    index = SymbolIndex(extra=[])
+    index.update('a.py', 'x = 1\n')
+    index.update('b.py', 'x = 2\ny = 3\n')
+    assert index.is_current('a.py', 'x = 1\n')
+    assert not index.update('a.py', 'x = 1\n')
+    assert index.definitions('x') == [
+        ('a.py', Symbol('x', 'variable', 1)),
+        ('b.py', Symbol('x', 'variable', 1)),
+    ]
+    index.update('b.py', 'z = 2\n')
+    assert index.names == ['x', 'z']
+    index.remove('a.py')
+    assert 'a.py' not in index
+    assert index.names == ['z']
+    assert index.definitions('x') == []
+
+
+def test_syntax_error_keeps_old_symbols():
+    index = SymbolIndex(extra=[])
+    index.update('a.py', 'def first(): pass\n')
+    assert not index.update('a.py', 'def first(): pass\ndef sec(\n')
+    assert index.completions('f') == ['first']
+    assert index.update('a.py', 'def second(): pass\n')
+    assert index.completions('') == ['second']
+
+
+def test_parser_uses_child_process():
+    parser = Parser(small=100)
+    source = SOURCE * 10
+    try:
+        assert parser.extract_symbols(source) == extract_symbols(source)
+        assert parser.executor is not None
+        with pytest.raises(SyntaxError):
+            parser.extract_symbols(source + 'def f(:\n')
+        problem = parser.find_problem(source + 'def f(:\n', 'big.py')
+        assert problem.line == SOURCE.count('\n') * 10 + 1
+        assert parser.find_problem(source) is None
+        # Small sources are parsed here
+        assert parser.extract_symbols('x = 1') == {
+            'x': Symbol('x', 'variable', 1)
+        }
+    finally:
+        parser.close()
+    assert parser.executor is None
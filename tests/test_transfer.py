@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from puppy.transfer import FileTransfer, CHUNK_SIZE  # noqa: E402
+
+
+def run_blocks(transfer, capsys):
+    """Run the blocks as the device would, checking each reply."""
+    namespace = {}
+    for index, block in enumerate(transfer.blocks()):
+        exec(block.decode(), namespace)
+        output = capsys.readouterr().out.encode()
+        expected = transfer.expected(index)
+        if expected is not None:
+            assert output.strip() == expected
+    return namespace
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('size', [0, 1, CHUNK_SIZE, 3 * CHUNK_SIZE + 7])
+def test_copy(tmp_path, monkeypatch, capsys, size):
+    monkeypatch.chdir(tmp_path)
+    data = bytes(i % 251 for i in range(size))
+    transfer = FileTransfer(None, 'main.py', data)
+    namespace = run_blocks(transfer, capsys)
+    assert read('main.py') == data
+    assert os.listdir('.') == ['main.py']
+    # Only the names from the import are left behind on the device
+    assert set(namespace) <= {'__builtins__', 'os'}
+
+
+def test_copy_without_rename(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'main.py').write_bytes(b'old' * 1000)
+    data = b'x = 1\n' * 300
+    monkeypatch.delattr(os, 'rename')
+    namespace = run_blocks(FileTransfer(None, 'main.py', data), capsys)
+    monkeypatch.undo()
+    assert read(str(tmp_path / 'main.py')) == data
+    assert os.listdir(str(tmp_path)) == ['main.py']
+    assert set(namespace) <= {'__builtins__', 'os'}
+
+
+def test_expected_replies():
+    data = b'a' * (CHUNK_SIZE + 1)
+    transfer = FileTransfer(None, 'main.py', data)
+    blocks = transfer.blocks()
+    assert len(blocks) == 5
+    assert transfer.expected(0) is None
+    assert transfer.expected(1) == '{} {}'.format(
+        CHUNK_SIZE, CHUNK_SIZE * ord('a') & 0xffff
+    ).encode()
+    assert transfer.expected(2) == '1 {}'.format(ord('a')).encode()
+    assert transfer.expected(3) == '{} {}'.format(
+        len(data), len(data) * ord('a') & 0xffff
+    ).encode()
+    assert transfer.expected(4) is None
+
+
+def test_reads_back_in_chunks():
+    transfer = FileTransfer(None, 'main.py', b'a' * 10000)
+    verify = transfer.blocks()[-2]
+    assert b'read()' not in verify
+    assert 'r({})'.format(CHUNK_SIZE).encode() in verify
@@ -0,0 +1,57 @@
+from puppy.ui.vt100 import VT100Parser, TEXT, DELETE
+
+
+def feed_all(parser, chunks):
+    ops = []
+    for chunk in chunks:
+        ops.extend(parser.feed(chunk))
+    return ops
+
+
+def test_text_in_one_run():
+    parser = VT100Parser()
+    assert parser.feed(b'>>> print(1)\r\n1\r\n') == [
+        (TEXT, '>>> print(1)\n1\n')
+    ]
+
+
+def test_backspace_and_cursor_left():
+    parser = VT100Parser()
+    assert parser.feed(b'abc\x08\x08\x1b[3Dx\x1b[D\x1b[K') == [
+        (TEXT, 'abc'), (DELETE, 5), (TEXT, 'x'), (DELETE, 1)
+    ]
+
+
+def test_unknown_sequences_dropped():
+    parser = VT100Parser()
+    assert parser.feed(b'a\x1b[2Jb\x1bcc\x07') == [
+        (TEXT, 'a'), (TEXT, 'bc')
+    ]
+
+
+def test_split_sequences():
+    parser = VT100Parser()
+    data = 'héllo ☃\x08!'.encode('utf8') + b'\x1b[12D'
+    ops = feed_all(parser, [data[i:i + 1] for i in range(len(data))])
+    assert ''.join(arg for op, arg in ops if op == TEXT) == 'héllo ☃!'
+    assert [arg for op, arg in ops if op == DELETE] == [1, 12]
+
+
+def test_reset():
+    parser = VT100Parser()
+    parser.feed(b'\xe2\x98\x1b[')
+    parser.reset()
+    assert parser.feed(b'ok') == [(TEXT, 'ok')]
+
+
+def test_long_sequences_dropped():
+    parser = VT100Parser()
+    assert parser.feed(b'ab\x1b[9999D') == [(TEXT, 'ab'), (DELETE, 9999)]
+    # Too long a parameter, or too many, and the sequence is skipped
+    assert parser.feed(b'c\x1b[12345Dd') == [(TEXT, 'cd')]
+    assert parser.feed(b'\x1b[' + b'1;' * 16 + b'1De') == [(TEXT, 'e')]
+    assert parser.feed(b'\x1b[' + b'1;' * 15 + b'1Kf') == [(TEXT, 'f')]
+    # However it is split up
+    data = b'\x1b[' + b'9' * 1000 + b'Dg'
+    ops = feed_all(parser, [data[i:i + 7] for i in range(0, len(data), 7)])
+    assert ops == [(TEXT, 'g')]
@@ -0,0 +1,90 @@
+import os
+import stat
+
+import pytest
+
+from puppy import projects
+from puppy.projects import Project
+
+
+def make_project(tmp_path):
+    root = tmp_path / 'project'
+    root.mkdir()
+    return Project(str(root), {})
+
+
+def leftovers(project):
+    return [name for name in os.listdir(project.root) if name.endswith('.tmp')]
+
+
+def test_write_and_read(tmp_path):
+    project = make_project(tmp_path)
+    project.write_files([('a.py', 'print(1)\n'), ('b.txt', 'héllo\n')])
+    assert project.read_file('a.py') == 'print(1)\n'
+    assert project.read_file('b.txt') == 'héllo\n'
+    assert leftovers(project) == []
+
+
+def test_skip_unchanged(tmp_path):
+    project = make_project(tmp_path)
+    project.write_file('a.py', 'one')
+    assert not project.needs_write('a.py', 'one')
+    assert project.needs_write('a.py', 'two')
+    assert project.needs_write('new.py', '')
+
+
+def test_read_counts_as_written(tmp_path):
+    project = make_project(tmp_path)
+    with open(project.abspath('a.py'), 'w', encoding='utf8') as f:
+        f.write('on disk')
+    project.read_file('a.py')
+    assert not project.needs_write('a.py', 'on disk')
+
+
+def test_replace_is_atomic(tmp_path, monkeypatch):
+    project = make_project(tmp_path)
+    project.write_files([('a.py', 'old a'), ('b.py', 'old b')])
+
+    def fail(src, dest):
+        raise OSError("disk went away")
+    monkeypatch.setattr(projects.os, 'replace', fail)
+    with pytest.raises(OSError):
+        project.write_files([('a.py', 'new a'), ('b.py', 'new b')])
+    monkeypatch.undo()
+
+    assert project.read_file('a.py') == 'old a'
+    assert project.read_file('b.py') == 'old b'
+    assert leftovers(project) == []
+    # What we failed to write still needs writing
+    assert project.needs_write('a.py', 'new a')
+
+
+def test_temp_file_removed_if_it_cannot_be_opened(tmp_path, monkeypatch):
+    project = make_project(tmp_path)
+
+    def fail(*args, **kwargs):
+        raise OSError("no")
+    monkeypatch.setattr(projects, 'open', fail, raising=False)
+    with pytest.raises(OSError):
+        project.write_file('a.py', 'text')
+    monkeypatch.undo()
+    assert os.listdir(project.root) == []
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="POSIX permissions")
+def test_mode_is_kept(tmp_path):
+    project = make_project(tmp_path)
+    path = project.abspath('script.py')
+    project.write_file('script.py', 'one')
+    assert stat.S_IMODE(os.stat(path).st_mode) == projects.NEW_FILE_MODE
+    os.chmod(path, 0o750)
+    project.write_file('script.py', 'two')
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o750
+
+
+def test_history_is_recorded(tmp_path):
+    project = make_project(tmp_path)
+    project.write_file('a.py', 'one')
+    project.write_file('a.py', 'two')
+    assert project.history.restore('a.py', 0) == 'one'
+    assert project.history.restore('a.py') == 'two'
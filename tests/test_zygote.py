@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+PUPPY_DIR = os.path.join(os.path.dirname(__file__), os.pardir, 'puppy')
+
+# Sets up the streams as the zygote's child does, then describes them
+SCRIPT = '''
+import sys, json, zygote
+zygote.reopen_streams(json.loads(sys.argv[1]))
+streams = {
+    name: [s.line_buffering, s.write_through, s.encoding, s.errors]
+    for name, s in [('stdout', sys.stdout), ('stderr', sys.stderr)]
+}
+print(json.dumps(streams))
+'''
+
+
+def describe(env, stdout=subprocess.PIPE):
+    """Get the settings of the child's streams, given env."""
+    # Start from a clean environment, so that only env has any effect
+    clean = {'PATH': os.environ.get('PATH', ''), 'LC_ALL': 'C.UTF-8'}
+    proc = subprocess.run(
+        [sys.executable, '-c', SCRIPT, json.dumps(env)],
+        cwd=PUPPY_DIR, env=clean, stdout=stdout, check=True
+    )
+    return proc.stdout
+
+
+def test_pipe_is_block_buffered():
+    streams = json.loads(describe({}))
+    # The encoding is the locale's
+    assert streams['stdout'][2].lower() == 'utf-8'
+    assert streams['stdout'][:2] + streams['stdout'][3:] == [
+        False, False, 'strict'
+    ]
+    # stderr is always line buffered
+    assert streams['stderr'][:2] + streams['stderr'][3:] == [
+        True, False, 'backslashreplace'
+    ]
+
+
+def test_environment_is_followed():
+    streams = json.loads(describe({
+        'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'latin-1:replace'
+    }))
+    assert streams['stdout'] == [False, True, 'latin-1', 'replace']
+    assert streams['stderr'] == [True, True, 'latin-1', 'backslashreplace']
+
+
+@pytest.mark.skipif(not hasattr(os, 'openpty'), reason="needs a pty")
+def test_terminal_is_line_buffered():
+    master, slave = os.openpty()
+    try:
+        describe({}, stdout=slave)
+        os.close(slave)
+        output = b''
+        while True:
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                break
+            if not data:
+                break
+            output += data
+    finally:
+        os.close(master)
+    streams = json.loads(output.decode().strip())
+    assert streams['stdout'][0] is True